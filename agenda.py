@@ -0,0 +1,178 @@
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from config import AGENDA_PAGE_EVENTS
+from message_format import format_event
+
+# Ограничение Telegram на длину текста сообщения
+MESSAGE_LIMIT = 4096
+
+# Заголовки списков событий (MarkdownV2)
+AGENDA_TITLES = {
+    'today': "📅 *Встречи на сегодня*",
+    'tomorrow': "📅 *Встречи на завтра*",
+}
+
+# Запас под заголовок, номер страницы и пометку об устаревших данных
+_HEADER_RESERVE = 192
+
+# Разделитель между событиями
+_SEPARATOR = "\n"
+
+
+def _open_entities(text, end):
+    """
+    Сущности MarkdownV2 из шаблонов событий, не закрытые к позиции end:
+    начало жирного текста *...*, начало ссылки [...](...) и начало её адреса
+    (None — сущность закрыта). Экранированные символы пропускаются.
+    """
+    bold = link = address = None
+    i = 0
+    while i < end:
+        char = text[i]
+        if char == '\\':
+            i += 2
+            continue
+        if address is not None:
+            if char == ')':
+                link = address = None
+        elif char == '*':
+            bold = i if bold is None else None
+        elif char == '[':
+            link = i
+        elif char == ']' and link is not None and text[i + 1:i + 2] == '(':
+            address = i + 2
+            i += 1
+        i += 1
+    return bold, link, address
+
+
+def _link_address(text, start):
+    """Адрес ссылки, текст которой продолжается с позиции start (или None)."""
+    i = start
+    while i < len(text):
+        if text[i] == '\\':
+            i += 2
+            continue
+        if text[i] == ']' and text[i + 1:i + 2] == '(':
+            end = i + 2
+            while end < len(text) and text[end] != ')':
+                end += 2 if text[end] == '\\' else 1
+            return text[i + 2:end]
+        i += 1
+    return None
+
+
+def _escape_safe_cut(text, limit):
+    """Позиция разреза не дальше limit, не между '\\' и экранируемым символом."""
+    cut = limit
+    # Нечётное число '\' перед разрезом означает, что мы разрезали экранирование
+    while cut > 0 and (cut - len(text[:cut].rstrip('\\'))) % 2 == 1:
+        cut -= 1
+    return cut
+
+
+def _safe_cut(text, limit):
+    """
+    Позиция разреза не дальше limit: по возможности по переводу строки,
+    никогда между обратной косой чертой и экранируемым ею символом
+    и по возможности не внутри жирного текста или ссылки.
+    """
+    cut = text.rfind('\n', 0, limit)
+    if cut <= 0:
+        cut = _escape_safe_cut(text, limit)
+
+    # Сущность целиком переносим в следующую часть, если перед ней что-то есть
+    bold, link, address = _open_entities(text, cut)
+    start = min((position for position in (bold, link) if position is not None), default=0)
+    if start > 0:
+        cut = start
+    elif address is not None:
+        cut = address - 2  # Адрес ссылки не делим: режем её текст перед ']'
+    return cut
+
+
+def _close_entities(text, cut):
+    """
+    Что дописать в конец части и в начало следующей, если разрез пришёлся внутрь
+    сущности длиннее целой части: жирный текст и текст ссылки закрываются
+    и открываются заново, обе половины ссылки ведут на один адрес.
+    """
+    bold, link, address = _open_entities(text, cut)
+    close = reopen = ""
+    if link is not None and address is None:
+        url = _link_address(text, cut)
+        if url is not None:
+            close, reopen = f"]({url})", "["
+    if bold is not None:
+        close, reopen = close + "*", "*" + reopen
+    return close, reopen
+
+
+def split_text(text, limit=MESSAGE_LIMIT):
+    """
+    Делит текст MarkdownV2 на части не длиннее limit, не разрывая экранирование
+    и не оставляя незакрытых сущностей.
+    """
+    parts = []
+    while len(text) > limit:
+        cut = _safe_cut(text, limit)
+        close, reopen = _close_entities(text, cut)
+        if close:
+            # Оставляем место под закрывающие символы
+            cut = _safe_cut(text, limit - len(close))
+            close, reopen = _close_entities(text, cut)
+            if cut <= len(reopen):
+                # Адрес ссылки сам почти с целую часть: закрыть сущность негде
+                cut, close, reopen = _escape_safe_cut(text, limit), "", ""
+        parts.append(text[:cut] + close)
+        text = reopen + text[cut:].lstrip('\n')
+    if text:
+        parts.append(text)
+    return parts
+
+
+def paginate(blocks, limit=MESSAGE_LIMIT - _HEADER_RESERVE, per_page=AGENDA_PAGE_EVENTS):
+    """
+    Упаковывает блоки событий в как можно меньшее число страниц:
+    не длиннее limit символов и не больше per_page событий на странице.
+    Слишком длинный блок сам делится на части.
+    """
+    pages = []
+    current, length, count = [], 0, 0
+    for block in blocks:
+        for part in split_text(block, limit):
+            extra = len(part) + (len(_SEPARATOR) if current else 0)
+            if current and (length + extra > limit or count >= per_page):
+                pages.append(_SEPARATOR.join(current))
+                current, length, count = [], 0, 0
+                extra = len(part)
+            current.append(part)
+            length += extra
+        count += 1
+    if current:
+        pages.append(_SEPARATOR.join(current))
+    return pages
+
+
+def render_agenda(day, events, note=""):
+    """
+    Готовые страницы списка событий с заголовком и номером страницы.
+    note — уже экранированная пометка в конце каждой страницы.
+    """
+    pages = paginate([format_event(event)[0] for event in events])
+    title = AGENDA_TITLES[day]
+    if len(pages) == 1:
+        return [f"{title}\n\n{pages[0]}{note}"]
+    return [f"{title} \\({number}/{len(pages)}\\)\n\n{page}{note}" for number, page in enumerate(pages, 1)]
+
+
+def agenda_keyboard(day, page, total):
+    """Кнопки перелистывания страниц (None, если страница одна)."""
+    if total <= 1:
+        return None
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(text="◀ Назад", callback_data=f"agenda:{day}:{page - 1}"))
+    if page < total - 1:
+        buttons.append(InlineKeyboardButton(text="Ещё ▶", callback_data=f"agenda:{day}:{page + 1}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+import async_calendar
+import metrics
+from config import AGENDA_CACHE_TTL, AGENDA_CACHE_MAX_STALE, AGENDA_CACHE_SIZE, TIMEZONE
+from google_calendar import day_window
+
+logger = logging.getLogger(__name__)
+
+# Результат чтения: данные, признак устаревших данных (Google недоступен) и время загрузки
+Agenda = namedtuple('Agenda', ('value', 'stale', 'fetched_at'))
+
+
+class _Entry:
+    __slots__ = ('value', 'fetched_at', 'failed', 'invalidated')
+
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.failed = False  # Последнее обновление не удалось
+        self.invalidated = False  # Данные точно изменились, нужна загрузка
+
+
+class AgendaCache:
+    """
+    Кэш списков событий для команд пользователя (stale-while-revalidate).
+
+    Свежие данные (моложе AGENDA_CACHE_TTL) отдаются из памяти. Устаревшие,
+    но не старше AGENDA_CACHE_MAX_STALE, отдаются сразу, а в фоне запускается
+    одно обновление. Если Google недоступен, отдаются последние известные данные
+    с пометкой stale.
+
+    invalidate() увеличивает номер сброса пользователя: загрузка, начатая до сброса,
+    отдаётся ждавшему её вызову, но в кэш не попадает.
+    """
+
+    def __init__(self, ttl=AGENDA_CACHE_TTL, max_stale=AGENDA_CACHE_MAX_STALE, size=AGENDA_CACHE_SIZE):
+        self._ttl = ttl
+        self._max_stale = max_stale
+        self._size = size
+        self._entries = OrderedDict()  # (user_id, вид, начало суток) -> _Entry
+        self._refreshing = set()  # Ключи, для которых уже идёт фоновое обновление
+        self._generations = {}  # user_id -> номер последнего сброса
+        self._lock = threading.Lock()
+
+    def _remember(self, key, value, generation):
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return  # Пока шла загрузка, календарь изменился: данные уже неактуальны
+            self._entries[key] = _Entry(value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    async def _load(self, key, loader):
+        generation = self._generations.get(key[0], 0)
+        value = await loader()
+        if value is not None:  # None — пользователь не авторизован, такой ответ не запоминаем
+            self._remember(key, value, generation)
+        return value
+
+    def _revalidate(self, key, loader):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                await self._load(key, loader)
+            except Exception as e:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.failed = True
+                logger.warning(f"Не удалось обновить кэш событий {key}: {str(e)}")
+            finally:
+                self._refreshing.discard(key)
+
+        asyncio.create_task(refresh())
+
+    async def get(self, key, loader, still_valid=None):
+        """
+        Возвращает Agenda для ключа (user_id, вид, начало суток).
+        loader — корутина загрузки из Google, still_valid(value) — не устарели ли данные по смыслу
+        (например, снимок не покрывает текущий момент).
+        """
+        entry = self._entries.get(key)
+        now = time.time()
+        if entry is not None and not entry.invalidated and (still_valid is None or still_valid(entry.value)):
+            self._entries.move_to_end(key)
+            age = now - entry.fetched_at
+            if age < self._ttl:
+                metrics.cache_requests.inc(cache='agenda', result='hit')
+                return Agenda(entry.value, entry.failed, entry.fetched_at)
+            if age < self._max_stale:
+                metrics.cache_requests.inc(cache='agenda', result='stale')
+                self._revalidate(key, loader)
+                return Agenda(entry.value, entry.failed, entry.fetched_at)
+
+        metrics.cache_requests.inc(cache='agenda', result='miss')
+
+        try:
+            value = await self._load(key, loader)
+            return Agenda(value, False, time.time())
+        except Exception as e:
+            if entry is None:
+                raise
+            # Google недоступен: показываем последние известные данные
+            logger.warning(f"Google недоступен, отдаём устаревшие данные {key}: {str(e)}")
+            entry.failed = True
+            return Agenda(entry.value, True, entry.fetched_at)
+
+    def invalidate(self, user_id):
+        """Сбрасывает свежесть данных пользователя (например, после создания события)."""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key, entry in self._entries.items():
+                if key[0] == user_id:
+                    entry.invalidated = True  # Остаются как запасной вариант, если Google недоступен
+
+
+# Общий кэш процесса
+agenda_cache = AgendaCache()
+
+
+def _snapshot_covers(snapshot):
+    return snapshot is not None and snapshot.covers(datetime.now(timezone.utc))
+
+
+async def get_agenda_snapshot(user_id):
+    """
+    Снимок событий пользователя (Agenda со значением AgendaSnapshot или None).
+    Один элемент кэша на пользователя и локальные сутки отвечает на все четыре команды.
+    """
+    key = (user_id, 'agenda', day_window(0)[0])
+    return await agenda_cache.get(key, lambda: async_calendar.get_agenda_snapshot(user_id), _snapshot_covers)
+
+
+async def _from_snapshot(user_id, part):
+    agenda = await get_agenda_snapshot(user_id)
+    value = None if agenda.value is None else part(agenda.value)
+    return agenda._replace(value=value)
+
+
+async def get_todays_events(user_id):
+    """События на сегодня (Agenda)."""
+    return await _from_snapshot(user_id, lambda snapshot: snapshot.today())
+
+
+async def get_tomorrows_events(user_id):
+    """События на завтра (Agenda)."""
+    return await _from_snapshot(user_id, lambda snapshot: snapshot.tomorrow())
+
+
+async def get_current_event(user_id):
+    """Текущая встреча (Agenda)."""
+    return await _from_snapshot(user_id, lambda snapshot: snapshot.current(datetime.now(timezone.utc)))
+
+
+async def get_next_event(user_id):
+    """Следующая встреча (Agenda)."""
+    return await _from_snapshot(user_id, lambda snapshot: snapshot.next(datetime.now(timezone.utc)))
+
+
+def stale_note(agenda):
+    """Пометка для устаревших данных (пустая строка, если данные актуальны). Текст без разметки."""
+    if not agenda.stale:
+        return ""
+    fetched_at = datetime.fromtimestamp(agenda.fetched_at, TIMEZONE).strftime("%d.%m %H:%M")
+    return f"\n⚠️ Google Calendar недоступен, показаны данные на {fetched_at}"
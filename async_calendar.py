@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+
+import metrics
+from config import ASYNC_CALENDAR_POOL_SIZE, ASYNC_CALENDAR_TIMEOUT
+from credential_store import credential_store
+from event_model import AgendaSnapshot
+from event_store import get_event_store
+from google_calendar import day_window, load_credentials, save_credentials
+from singleflight import SingleFlight
+from sweep_trace import add_span
+
+logger = logging.getLogger(__name__)
+
+API_BASE = "https://www.googleapis.com/calendar/v3"
+DEFAULT_TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+# Склейка одинаковых запросов по ключу (user_id, операция, окно)
+flights = SingleFlight()
+
+
+class CalendarApiError(Exception):
+    """Ошибка ответа Google Calendar API (статус и текст ответа)."""
+
+    def __init__(self, status, message):
+        super().__init__(f"Google Calendar API {status}: {message}")
+        self.status = status
+
+
+def _encode_params(params):
+    """aiohttp не принимает bool в query-параметрах, Google ожидает true/false."""
+    if not params:
+        return None
+    return {key: ('true' if value else 'false') if isinstance(value, bool) else str(value)
+            for key, value in params.items() if value is not None}
+
+
+class AsyncCalendarClient:
+    """
+    Асинхронный клиент Google Calendar на aiohttp с общим пулом соединений.
+    Сотни запросов разных пользователей могут выполняться на одном цикле событий без потоков.
+    """
+
+    def __init__(self):
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=ASYNC_CALENDAR_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(total=ASYNC_CALENDAR_TIMEOUT),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def refresh_token(self, creds, user_id=None):
+        """
+        Обновляет access-токен по refresh_token.
+        Если передан user_id, обновлённые учетные данные сохраняются,
+        а одновременные обновления одного токена склеиваются в одно.
+        Новый токен копируется и в переданный объект, даже если обновлял другой вызов.
+        """
+        if user_id is None:
+            return await self._refresh_token(creds, None)
+        refreshed = await flights.do((user_id, 'refresh', None), lambda: self._refresh_token(creds, user_id), ttl=0)
+        if refreshed is not creds:
+            creds.token = refreshed.token
+            creds.expiry = refreshed.expiry
+        return creds
+
+    async def _refresh_token(self, creds, user_id):
+        data = {
+            'grant_type': 'refresh_token',
+            'refresh_token': creds.refresh_token,
+            'client_id': creds.client_id,
+            'client_secret': creds.client_secret,
+        }
+        session = self._get_session()
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            async with session.post(creds.token_uri or DEFAULT_TOKEN_URI, data=data) as response:
+                status = response.status
+                if response.status >= 400:
+                    raise CalendarApiError(response.status, await response.text())
+                payload = await response.json()
+        finally:
+            metrics.time_google_api('oauth.token', started, status)
+            add_span('oauth.token', time.perf_counter() - started)
+
+        creds.token = payload['access_token']
+        # google-auth хранит expiry как наивное время в UTC
+        expires_in = int(payload.get('expires_in', 3600))
+        creds.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=expires_in)
+
+        if user_id is not None:
+            await asyncio.to_thread(save_credentials, user_id, creds)
+        return creds
+
+    async def _request(self, operation, method, path, creds, params=None, body=None, user_id=None):
+        """operation — имя метода API для метрик (events.list, events.insert и т.д.)."""
+        if not creds.valid and creds.refresh_token:
+            creds = await self.refresh_token(creds, user_id)
+
+        for attempt in range(2):
+            session = self._get_session()
+            headers = {'Authorization': f'Bearer {creds.token}'}
+            started = time.perf_counter()
+            status = 'error'  # Статус для метрик, если ответа не было (таймаут, обрыв)
+            try:
+                async with session.request(method, API_BASE + path, params=_encode_params(params),
+                                           json=body, headers=headers) as response:
+                    status = response.status
+                    if not (response.status == 401 and attempt == 0 and creds.refresh_token):
+                        if response.status >= 400:
+                            raise CalendarApiError(response.status, await response.text())
+                        return None if response.status == 204 else await response.json()
+            finally:
+                metrics.time_google_api(operation, started, status)
+                add_span(operation, time.perf_counter() - started)
+            # Токен отозван или истёк раньше срока: обновляем и повторяем один раз
+            creds = await self.refresh_token(creds, user_id)
+
+    async def list_events(self, creds, calendar_id='primary', user_id=None, **params):
+        return await self._request('events.list', 'GET', f'/calendars/{calendar_id}/events', creds,
+                                   params=params, user_id=user_id)
+
+    async def insert_event(self, creds, body, calendar_id='primary', user_id=None, **params):
+        return await self._request('events.insert', 'POST', f'/calendars/{calendar_id}/events', creds,
+                                   params=params, body=body, user_id=user_id)
+
+    async def delete_event(self, creds, event_id, calendar_id='primary', user_id=None):
+        return await self._request('events.delete', 'DELETE', f'/calendars/{calendar_id}/events/{event_id}', creds,
+                                   user_id=user_id)
+
+    async def watch_events(self, creds, body, calendar_id='primary', user_id=None):
+        return await self._request('events.watch', 'POST', f'/calendars/{calendar_id}/events/watch', creds,
+                                   body=body, user_id=user_id)
+
+    async def stop_channel(self, creds, channel_id, resource_id, user_id=None):
+        body = {'id': channel_id, 'resourceId': resource_id}
+        return await self._request('channels.stop', 'POST', '/channels/stop', creds, body=body, user_id=user_id)
+
+    async def freebusy(self, creds, time_min, time_max, calendar_ids=('primary',), user_id=None):
+        body = {
+            'timeMin': time_min.isoformat(),
+            'timeMax': time_max.isoformat(),
+            'items': [{'id': calendar_id} for calendar_id in calendar_ids],
+        }
+        return await self._request('freebusy.query', 'POST', '/freeBusy', creds, body=body, user_id=user_id)
+
+
+# Общий клиент процесса
+client = AsyncCalendarClient()
+
+
+# ===== Асинхронные аналоги функций google_calendar ===== #
+
+async def authenticate_google_calendar(user_id):
+    """
+    Аутентификация для Google Calendar API без блокирующего обновления токена.
+    """
+    from token_refresher import token_refresher  # token_refresher сам импортирует этот модуль
+
+    creds = credential_store.cached(user_id)  # Из LRU-кэша в памяти, без обращения к диску
+    if creds is None:
+        # Промах кэша или пора сверить запись с базой: чтение SQLite — в потоке
+        creds = await asyncio.to_thread(load_credentials, user_id)
+    if creds and creds.valid:
+        return creds
+
+    if creds and creds.expired and creds.refresh_token:
+        # Этот refresh_token уже отклонён: не тратим запрос, пока пользователь не войдёт снова
+        if token_refresher.has_failed(user_id, creds):
+            return None
+        try:
+            return await client.refresh_token(creds, user_id)
+        except Exception as e:
+            if isinstance(e, CalendarApiError) and e.status in (400, 401):
+                # invalid_grant: доступ отозван
+                token_refresher.mark_failed(user_id, str(e), creds.refresh_token)
+            logger.warning(f"Не удалось обновить токен пользователя {user_id}: {str(e)}")
+
+    # Если токена нет или он недействителен, возвращаем None
+    return None
+
+
+async def _synced_store(user_id, creds):
+    """Синхронизирует локальное хранилище событий через асинхронный клиент."""
+    store = get_event_store(user_id)
+    if store.needs_sync():
+        async def fetch(params):
+            params = dict(params)
+            calendar_id = params.pop('calendarId', 'primary')
+            return await client.list_events(creds, calendar_id=calendar_id, user_id=user_id, **params)
+
+        # Проверка напоминаний и команда пользователя в одно время делают одну синхронизацию
+        await flights.do((user_id, 'sync', None), lambda: store.async_sync(fetch))
+    return store
+
+
+async def _store_for(user_id):
+    """Авторизует пользователя и возвращает его синхронизированное хранилище (или None)."""
+    creds = await authenticate_google_calendar(user_id)
+    if not creds:
+        return None
+    return await _synced_store(user_id, creds)
+
+
+async def get_upcoming_events(creds, user_id=None):
+    """Получает предстоящие события из календаря."""
+    now = datetime.now(timezone.utc)
+    if user_id is not None:
+        store = await _synced_store(user_id, creds)
+        return store.upcoming(now, limit=10)
+
+    events_result = await client.list_events(
+        creds, timeMin=now.isoformat(), maxResults=10, singleEvents=True, orderBy='startTime'
+    )
+    return events_result.get('items', [])
+
+
+async def get_agenda_snapshot(user_id):
+    """
+    Снимок событий на сегодня и завтра (по локальным суткам) и ближайшей встречи.
+    Одно чтение календаря отвечает на /today, /tomorrow, /now и /next.
+    """
+    today, tomorrow = day_window(0), day_window(1)
+
+    async def load():
+        store = await _store_for(user_id)
+        if store is None:
+            return None
+        now = datetime.now(timezone.utc)
+        return AgendaSnapshot(today, tomorrow, store.between(today[0], tomorrow[1]), store.next(now), now)
+
+    return await flights.do((user_id, 'agenda', today[0]), load)
+
+
+async def get_todays_events(user_id):
+    """Получает встречи только на сегодня."""
+    snapshot = await get_agenda_snapshot(user_id)
+    return None if snapshot is None else snapshot.today()
+
+
+async def get_tomorrows_events(user_id):
+    """Получает встречи только на завтра."""
+    snapshot = await get_agenda_snapshot(user_id)
+    return None if snapshot is None else snapshot.tomorrow()
+
+
+async def get_current_event(user_id):
+    """Получает текущую встречу, если она сейчас активна."""
+    snapshot = await get_agenda_snapshot(user_id)
+    return None if snapshot is None else snapshot.current(datetime.now(timezone.utc))
+
+
+async def get_next_event(user_id):
+    """Получает следующую встречу."""
+    snapshot = await get_agenda_snapshot(user_id)
+    return None if snapshot is None else snapshot.next(datetime.now(timezone.utc))
+
+
+async def create_event(user_id, event, conference=False):
+    """Создаёт событие в основном календаре пользователя."""
+    creds = await authenticate_google_calendar(user_id)
+    if not creds:
+        return None
+    created_event = await client.insert_event(
+        creds, event, user_id=user_id, conferenceDataVersion=1 if conference else 0
+    )
+    get_event_store(user_id).mark_dirty()  # Новое событие подтянется при следующем чтении
+    flights.forget(user_id)
+    return created_event
+
+
+async def get_freebusy(user_id, time_min, time_max):
+    """Возвращает занятые интервалы основного календаря."""
+    creds = await authenticate_google_calendar(user_id)
+    if not creds:
+        return None
+    result = await client.freebusy(creds, time_min, time_max, user_id=user_id)
+    return result.get('calendars', {}).get('primary', {}).get('busy', [])
+
+
+async def generate_google_meet_link(user_id):
+    """
+    Генерирует ссылку на Google Meet без создания события в календаре.
+    """
+    creds = await authenticate_google_calendar(user_id)
+    if not creds:
+        raise Exception("Пользователь не аутентифицирован. Пожалуйста, авторизуйтесь через команду /relogin.")
+
+    now = datetime.now(timezone.utc)
+    event = {
+        "summary": "Google Meet Conference",
+        "start": {"dateTime": (now + timedelta(minutes=15)).isoformat(), "timeZone": "Europe/Moscow"},
+        "end": {"dateTime": (now + timedelta(minutes=45)).isoformat(), "timeZone": "Europe/Moscow"},
+        "conferenceData": {
+            "createRequest": {
+                "conferenceSolutionKey": {"type": "hangoutsMeet"},
+                "requestId": uuid.uuid4().hex  # Уникальный id, иначе Google может вернуть старую конференцию
+            }
+        },
+        "visibility": "private"
+    }
+    created_event = await client.insert_event(creds, event, user_id=user_id, conferenceDataVersion=1)
+    meet_link = created_event.get("hangoutLink", "Ссылка не создана")
+
+    # Удаляем событие, чтобы оно не появилось в календаре
+    await client.delete_event(creds, created_event['id'], user_id=user_id)
+    return meet_link
@@ -0,0 +1,105 @@
+# bench_message_format.py
+# Микробенчмарк и проверка экранирования MarkdownV2: python bench_message_format.py [повторов]
+import re
+import sys
+import timeit
+
+from event_model import EventRecord
+from message_format import escape_markdown, escape_url, format_event, format_reminder, _MARKDOWN_SPECIAL
+
+
+def legacy_escape_markdown(text):
+    """Прежний вариант из message_format: два прохода re.sub с lookbehind."""
+    escape_chars = r'_*[]()~`>#+-=|{}!'
+    text = re.sub(r'(?<!\\)([{}])'.format(re.escape(escape_chars)), r'\\\1', text)
+    text = re.sub(r'(?<!\\)\.', r'\\.', text)
+    return text
+
+
+def legacy_escape_markdown_v2(text):
+    """Прежний вариант из c_about: один re.sub на каждый вызов."""
+    escape_chars = r"\_*[]()~`>#+-=|{}.!"
+    return re.sub(f"([{re.escape(escape_chars)}])", r"\\\1", text)
+
+
+def unescape(text):
+    """Обратное преобразование: по нему проверяем, что экранирование обратимо."""
+    return re.sub(r'\\(.)', r'\1', text, flags=re.S)
+
+
+def is_safe(text):
+    """Каждый спецсимвол MarkdownV2 экранирован (чётное число '\\' перед ним)."""
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            if index + 1 >= len(text) or text[index + 1] not in _MARKDOWN_SPECIAL:
+                return False
+            index += 2
+            continue
+        if char in _MARKDOWN_SPECIAL:
+            return False
+        index += 1
+    return True
+
+
+EDGE_CASES = [
+    '',
+    'Обычный текст без спецсимволов',
+    _MARKDOWN_SPECIAL,
+    'C:\\Users\\meeting\\notes.txt',
+    'Уже экранировано\\. и \\! ещё',
+    'trailing backslash\\',
+    '1+1=2 (a-b) [c] {d} <e> #tag |pipe| ~tilde~ `code` >quote',
+    '😀 эмодзи и 🗓 календарь! ✅',
+    '\\\\\\',
+    'https://meet.google.com/abc-defg-hij?authuser=0',
+]
+
+SAMPLE_EVENT = {
+    'id': 'abc123',
+    'etag': '"3181161784712000"',
+    'summary': 'Планёрка (отдел R&D) — итоги Q3 + планы!',
+    'start': {'dateTime': '2030-01-01T10:00:00+03:00'},
+    'end': {'dateTime': '2030-01-01T11:00:00+03:00'},
+    'location': 'Переговорная #3, ул. Ленина, д. 1',
+    'description': 'Повестка: 1) отчёт; 2) бюджет [черновик]; 3) разное. https://meet.google.com/abc-defg-hij',
+    'attendees': [{'email': f'user.{i}@example.com'} for i in range(5)],
+}
+
+
+def check():
+    for text in EDGE_CASES:
+        escaped = escape_markdown(text)
+        assert is_safe(escaped), f"Неэкранированный символ: {text!r} -> {escaped!r}"
+        assert unescape(escaped) == text, f"Экранирование необратимо: {text!r}"
+    assert escape_url('https://x.ru/a_(b)\\c') == 'https://x.ru/a_(b\\)\\\\c'
+
+    # Прежние экранеры ошибались именно на крайних случаях
+    assert not is_safe(legacy_escape_markdown('C:\\Users')), "старый вариант не экранирует '\\'"
+
+    text, _ = format_event(SAMPLE_EVENT)
+    assert '*[Планёрка \\(отдел R&D\\) — итоги Q3 \\+ планы\\!]' in text
+    reminder, _ = format_reminder(SAMPLE_EVENT, 5)
+    assert reminder.count('Планёрка \\(отдел') == 2, "summary экранирован один раз в обоих местах"
+    assert '\\\\(' not in reminder, "нет двойного экранирования"
+    print("Проверки крайних случаев пройдены")
+
+
+def bench(number):
+    field = SAMPLE_EVENT['description']
+    results = {
+        'legacy escape_markdown (2x re.sub)': timeit.timeit(lambda: legacy_escape_markdown(field), number=number),
+        'legacy escape_markdown_v2 (re.sub)': timeit.timeit(lambda: legacy_escape_markdown_v2(field), number=number),
+        'escape_markdown (str.translate)': timeit.timeit(lambda: escape_markdown(field), number=number),
+        'EventRecord (разбор события без кэша)': timeit.timeit(lambda: EventRecord(SAMPLE_EVENT), number=number),
+        'format_event': timeit.timeit(lambda: format_event(SAMPLE_EVENT), number=number),
+        'format_reminder': timeit.timeit(lambda: format_reminder(SAMPLE_EVENT, 5), number=number),
+    }
+    for name, seconds in results.items():
+        print(f"{name:40s} {seconds / number * 1e6:8.2f} мкс/вызов")
+
+
+if __name__ == '__main__':
+    check()
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
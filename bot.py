@@ -3,8 +3,6 @@
 # Модули и пакеты
 import asyncio
 import logging
-import os
-import re
 
 # Библиотеки и модули
 from aiocron import crontab
@@ -12,7 +10,6 @@ from aiogram import Bot, Dispatcher, F, Router, types
 from aiogram.enums import ParseMode
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.filters import Command
 from aiogram.types import (
     CallbackQuery,
@@ -22,9 +19,27 @@ from aiogram.types import (
 )
 
 # Пользовательские модули
+from agenda import render_agenda, agenda_keyboard
+from agenda_cache import agenda_cache, stale_note
+import calendar_facade
+import metrics
+from meet_pool import meet_pool
 from c_about import send_about_info
-from config import active_users, user_settings, TIMEZONE, API_TOKEN
-from event_checker import check_and_notify_events
+from calendar_push import push_channels
+from config import (
+    active_users,
+    API_TOKEN,
+    REMINDER_REFRESH_MINUTES,
+    PUSH_ENABLED,
+    REMINDER_WORKER_MODE,
+    WEBHOOK_ENABLED,
+)
+from event_checker import check_and_notify_events, list_user_ids, refresh_user
+from reminder_scheduler import scheduler
+import send_queue
+from settings_store import reminder_settings
+from token_refresher import token_refresher
+from webhook_server import create_app, run_webhook
 from event_creation import (
     create_google_calendar_event,
     normalize_date,
@@ -45,21 +60,17 @@ from event_keyboards import (
 )
 
 from event_states import EventCreationStates
-
-from google_calendar import (
-    authenticate_google_calendar,
-    complete_authentication,
-    generate_google_meet_link,
-    get_auth_url,
-    get_calendar_service,
-    get_current_event,
-    get_next_event,
-    get_todays_events,
-    get_tomorrows_events,
-    get_upcoming_events,
-    reauthenticate_google_calendar,
+from fsm_storage import create_storage
+
+import async_calendar
+from credential_store import credential_store
+from message_format import (
+    escape_markdown,
+    format_event,
+    format_event_draft,
+    EVENT_SUMMARY_TEMPLATE,
+    EVENT_CONFIRMATION_TEMPLATE,
 )
-from message_format import format_event
 
 logging.basicConfig(
     level=logging.INFO,  # Уровень логирования (INFO, DEBUG, WARNING, ERROR, CRITICAL)
@@ -74,27 +85,31 @@ logger = logging.getLogger(__name__)
 logger.info("✅ Логирование успешно настроено!")
 
 # Инициализация бота и диспетчера
-bot = Bot(token=API_TOKEN)
-storage = MemoryStorage()
+bot = send_queue.install(Bot(token=API_TOKEN))  # Все исходящие сообщения идут через общую очередь
+storage = create_storage()
 dp = Dispatcher(storage=storage)
 router = Router()  # Создаём роутер
 dp.include_router(router)  # Подключаем роутер к диспетчеру
+metrics.install(router)  # Время работы каждого обработчика
 
 async def check_auth(user_id: int, message: Message = None) -> bool:
     """Проверяет аутентификацию пользователя"""
+    # Фоновое обновление токена уже провалилось — сразу просим войти заново
+    if token_refresher.has_failed(user_id):
+        active_users.pop(user_id, None)
     # Сначала проверяем активных пользователей
-    if user_id in active_users:
-        return True
-        
-    # Затем пробуем загрузить токен из файла
-    creds = authenticate_google_calendar(user_id)
-    if creds:
-        active_users[user_id] = creds
+    elif user_id in active_users:
         return True
+    else:
+        # Затем пробуем загрузить токен из хранилища
+        creds = await calendar_facade.authenticate(user_id)
+        if creds:
+            active_users[user_id] = creds
+            return True
         
     # Если не авторизован и передан message - показываем кнопку авторизации
     if message:
-        auth_url, _ = get_auth_url(user_id)
+        auth_url, _ = await calendar_facade.get_auth_url(user_id)
         await message.answer(
             "🔒 Требуется авторизация\n\n"
             f"Пожалуйста, авторизуйтесь через [Google Authorization]({auth_url})",
@@ -110,19 +125,6 @@ async def is_in_event_creation(state: FSMContext) -> bool:
     current_state = await state.get_state()
     return current_state is not None and current_state.startswith("EventCreationStates")
 
-async def periodic_check():
-    """Периодически вызывает check_and_notify_events каждые 60 секунд."""
-    while True:
-        try:
-            await asyncio.sleep(60)
-            await check_and_notify_events(bot)
-        except Exception as e:
-            logging.error(f"Ошибка в periodic_check: {str(e)}")
-
-def escape_markdown_v2(text: str) -> str:
-    # Экранируем специальные символы для MarkdownV2
-    return re.sub(r'([_*[\]()~`>#+-=|{}.!])', r'\\\1', text)
-
 class AuthStates(StatesGroup):
     waiting_for_code = State()
 
@@ -134,7 +136,7 @@ async def send_welcome(message: types.Message, state: FSMContext):
     try:
         logger.info(f"Пользователь {user_id} запустил команду /start")
         # Проверяем аутентификацию
-        is_auth = check_auth(user_id)
+        is_auth = await check_auth(user_id)
         # Если пользователь уже аутентифицирован, просто показываем клавиатуру
         if is_auth:
             await message.answer(
@@ -150,14 +152,13 @@ async def send_welcome(message: types.Message, state: FSMContext):
         if code:
             logger.info(f"Получен код авторизации: {code}")
             data = await state.get_data()
-            flow = data.get("flow")
             
-            if not flow:
+            if "code_verifier" not in data:
                 await message.reply("❌ Ошибка. Начните с команды /start без параметров.")
                 return
             
             try:
-                creds = complete_authentication(user_id, code)
+                creds = await calendar_facade.complete_authentication(user_id, code, data["code_verifier"])
                 active_users[user_id] = creds
                 await state.clear()
                 await message.reply("✅ Авторизация успешна!")
@@ -167,11 +168,11 @@ async def send_welcome(message: types.Message, state: FSMContext):
                 await message.reply(f"❌ Ошибка: {str(e)}")
                 return
         
-        creds = authenticate_google_calendar(user_id)
+        creds = await calendar_facade.authenticate(user_id)
         # Если токен отсутствует или недействителен
         if not creds:
-            auth_url, flow = get_auth_url(user_id)  # Получаем URL и flow
-            await state.update_data(flow=flow)  # Сохраняем flow в состоянии
+            auth_url, code_verifier = await calendar_facade.get_auth_url(user_id)  # Получаем URL и code_verifier
+            await state.update_data(code_verifier=code_verifier)  # Сохраняем code_verifier в состоянии
             await state.set_state(AuthStates.waiting_for_code)  # Устанавливаем состояние ожидания кода
             await message.reply(
                 f"Привет\! Я очень рад Вас видеть\!\n\n 🔑 Для начала работы необходимо авторизоваться через [Google Authorization]({auth_url})\.\n\n"
@@ -197,6 +198,44 @@ async def send_welcome(message: types.Message, state: FSMContext):
         logger.error(f"Ошибка в /start: {str(e)}")
         await message.reply(f"❌ Ошибка аутентификации: {str(e)}")
 
+async def send_agenda(message: types.Message, day: str, agenda):
+    """Отправляет первую страницу списка событий; остальные — по кнопке «Ещё»."""
+    pages = render_agenda(day, agenda.value, escape_markdown(stale_note(agenda)))
+    await message.reply(
+        text=pages[0],
+        parse_mode=ParseMode.MARKDOWN_V2,
+        reply_markup=agenda_keyboard(day, 0, len(pages)) or get_main_keyboard()
+    )
+
+@router.callback_query(F.data.startswith("agenda:"))
+async def agenda_page_callback(callback: CallbackQuery):
+    """Перелистывание списка событий: редактируем то же сообщение"""
+    user_id = callback.from_user.id
+    try:
+        _, day, page = callback.data.split(":")
+        page = int(page)
+        if day == 'today':
+            agenda = await calendar_facade.get_todays_events(user_id)
+        else:
+            agenda = await calendar_facade.get_tomorrows_events(user_id)
+        if not agenda.value:
+            await callback.answer("Встреч больше нет", show_alert=True)
+            return
+
+        pages = render_agenda(day, agenda.value, escape_markdown(stale_note(agenda)))
+        page = min(page, len(pages) - 1)  # Список мог сократиться
+        # Листание не срочное: ответы на команды и напоминания уходят раньше
+        with send_queue.send_priority(send_queue.PRIORITY_BULK):
+            await callback.message.edit_text(
+                text=pages[page],
+                parse_mode=ParseMode.MARKDOWN_V2,
+                reply_markup=agenda_keyboard(day, page, len(pages))
+            )
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка при перелистывании списка событий: {str(e)}")
+        await callback.answer("❌ Произошла ошибка", show_alert=True)
+
 @router.message(Command('today'))
 async def send_todays_events(message: types.Message):
     """Команда для получения событий на сегодня"""
@@ -204,20 +243,14 @@ async def send_todays_events(message: types.Message):
     try:
         if not await check_auth(user_id, message):
             return
-        events = get_todays_events(user_id)  # Получение событий
+        agenda = await calendar_facade.get_todays_events(user_id)  # Из кэша; при недоступности Google — последние данные
         # Если событий нет
-        if not events:
-            await message.reply("Сегодня встреч нет.")
+        if not agenda.value:
+            await message.reply(f"Сегодня встреч нет.{stale_note(agenda)}")
             return
 
-        # Отправка каждого события пользователю
-        for event in events:
-            formatted_message, keyboard = format_event(event)  # Форматируем событие
-            await message.reply(
-                text=formatted_message,
-                parse_mode=ParseMode.MARKDOWN_V2,
-                reply_markup=get_main_keyboard()
-            )
+        # Все события одним сообщением (длинный список — по страницам)
+        await send_agenda(message, 'today', agenda)
     except Exception as e:
         await message.reply(f"❌ Ошибка: {str(e)}", reply_markup=get_main_keyboard())
 
@@ -228,21 +261,15 @@ async def send_tomorrows_events(message: types.Message):
     try:
         if not await check_auth(user_id, message):
             return        
-        events = get_tomorrows_events(user_id)  # Получение событий на завтра
+        agenda = await calendar_facade.get_tomorrows_events(user_id)  # Из кэша; при недоступности Google — последние данные
 
         # Если событий нет
-        if not events:
-            await message.reply("Завтра встреч нет.")
+        if not agenda.value:
+            await message.reply(f"Завтра встреч нет.{stale_note(agenda)}")
             return
 
-        # Отправка каждого события пользователю
-        for event in events:
-            formatted_message, keyboard = format_event(event)  # Форматируем событие
-            await message.reply(
-                text=formatted_message,
-                parse_mode=ParseMode.MARKDOWN_V2,
-                reply_markup=get_main_keyboard()
-            )
+        # Все события одним сообщением (длинный список — по страницам)
+        await send_agenda(message, 'tomorrow', agenda)
     except Exception as e:
         await message.reply(f"Ошибка: {str(e)}", reply_markup=get_main_keyboard())
 
@@ -253,13 +280,11 @@ async def relogin(message: types.Message, state: FSMContext):
         user_id = message.from_user.id
         
         # Удаляем старый токен
-        token_path = f'user_tokens/token_{user_id}.pickle'
-        if os.path.exists(token_path):
-            os.remove(token_path)
+        await calendar_facade.delete_credentials(user_id)
         
         # Запускаем процесс повторной авторизации
-        auth_url, flow = get_auth_url(user_id)  # Получаем URL и flow
-        await state.update_data(flow=flow)  # Сохраняем flow в состоянии
+        auth_url, code_verifier = await calendar_facade.get_auth_url(user_id)  # Получаем URL и code_verifier
+        await state.update_data(code_verifier=code_verifier)  # Сохраняем code_verifier в состоянии
         await state.set_state(AuthStates.waiting_for_code)  # Устанавливаем состояние ожидания кода
         
         await message.reply(
@@ -278,18 +303,19 @@ async def send_current_event(message: types.Message):
     try:
         if not await check_auth(user_id, message):
             return
-        current_event = get_current_event(user_id)  # Получение текущей встречи
+        agenda = await calendar_facade.get_current_event(user_id)  # Получение текущей встречи
+        current_event = agenda.value
 
         # Если встреча есть
         if current_event:
             formatted_message, keyboard = format_event(current_event)
             await message.reply(
-                text=f"_Текущая встреча:_\n{formatted_message}",
+                text=f"_Текущая встреча:_\n{formatted_message}{escape_markdown(stale_note(agenda))}",
                 parse_mode=ParseMode.MARKDOWN_V2,
                 reply_markup=get_main_keyboard()
             )
         else:
-            await message.reply("Сейчас встреч нет.", reply_markup=get_main_keyboard())
+            await message.reply(f"Сейчас встреч нет.{stale_note(agenda)}", reply_markup=get_main_keyboard())
     except Exception as e:
         await message.reply(f"Ошибка: {str(e)}", reply_markup=get_main_keyboard())
 
@@ -299,18 +325,19 @@ async def send_next_event(message: types.Message):
     try:
         if not await check_auth(user_id, message):
             return
-        next_event = get_next_event(user_id)  # Получение следующей встречи
+        agenda = await calendar_facade.get_next_event(user_id)  # Получение следующей встречи
+        next_event = agenda.value
 
         # Если встреча есть
         if next_event:
             formatted_message, keyboard = format_event(next_event)
             await message.reply(
-                text=f"_Следующая встреча_:\n{formatted_message}",
+                text=f"_Следующая встреча_:\n{formatted_message}{escape_markdown(stale_note(agenda))}",
                 parse_mode=ParseMode.MARKDOWN_V2,
                 reply_markup=get_main_keyboard()
             )
         else:
-            await message.reply("Следующих встреч не запланировано.", reply_markup=get_main_keyboard())
+            await message.reply(f"Следующих встреч не запланировано.{stale_note(agenda)}", reply_markup=get_main_keyboard())
     except Exception as e:
         await message.reply(f"Ошибка: {str(e)}", reply_markup=get_main_keyboard())
 
@@ -320,68 +347,58 @@ async def generate_meet_link_command(message: types.Message):
     try:
         if not await check_auth(user_id, message):
             return
-        meet_link = generate_google_meet_link(user_id)
-        if meet_link != "Ссылка на звонок не найдена":
+        meet_link = await calendar_facade.generate_meet_link(user_id)  # Готовая ссылка из пула, пул пополняется в фоне
+        if meet_link.startswith("https://"):
             await message.reply(f"Ваша ссылка на Google Meet: {meet_link}")
         else:
             await message.reply("Не удалось создать ссылку. Проверьте настройки календаря.")
     except Exception as e:
         await message.reply(f"Ошибка: {str(e)}")
 
+async def toggle_reminder(message: types.Message, minutes: int):
+    """Включает/выключает напоминание за указанное число минут (можно несколько одновременно)"""
+    user_id = message.from_user.id
+    if reminder_settings.toggle(user_id, minutes):
+        await message.reply(f"Вы включили напоминания за {minutes} минут до начала встречи.")
+    else:
+        await message.reply(f"Вы отключили напоминания за {minutes} минут до начала встречи.")
+    # Перепланируем напоминания пользователя с новыми настройками
+    # (в режиме воркеров их подхватит воркер при следующем обновлении)
+    if not REMINDER_WORKER_MODE:
+        asyncio.create_task(refresh_user(user_id))
+
 @router.message(Command('set_reminder_15'))
 async def set_reminder_15(message: types.Message):
     """Команда для включения/выключения напоминания за 15 минут"""
-    user_id = message.from_user.id
-    if user_settings.get(user_id) == 15:
-        user_settings.pop(user_id)  # Удаляем настройку
-        await message.reply("Вы отключили напоминания за 15 минут до начала встречи.")
-    else:
-        user_settings[user_id] = 15  # Включаем настройку
-        await message.reply("Вы включили напоминания за 15 минут до начала встречи.")
+    await toggle_reminder(message, 15)
 
 @router.message(Command('set_reminder_10'))
 async def set_reminder_10(message: types.Message):
     """Команда для включения/выключения напоминания за 10 минут"""
-    user_id = message.from_user.id
-    if user_settings.get(user_id) == 10:
-        user_settings.pop(user_id)  # Удаляем настройку
-        await message.reply("Вы отключили напоминания за 10 минут до начала встречи.")
-    else:
-        user_settings[user_id] = 10  # Включаем настройку
-        await message.reply("Вы включили напоминания за 10 минут до начала встречи.")
+    await toggle_reminder(message, 10)
 
 @router.message(Command('set_reminder_5'))
 async def set_reminder_5(message: types.Message):
     """Команда для включения/выключения напоминания за 5 минут"""
-    user_id = message.from_user.id
-    if user_settings.get(user_id) == 5:
-        user_settings.pop(user_id)  # Удаляем настройку
-        await message.reply("Вы отключили напоминания за 5 минут до начала встречи.")
-    else:
-        user_settings[user_id] = 5  # Включаем настройку
-        await message.reply("Вы включили напоминания за 5 минут до начала встречи.")
+    await toggle_reminder(message, 5)
 
 @router.message(Command('set_reminder_0'))
 async def set_reminder_0(message: types.Message):
     """Команда для включения/выключения напоминания за 0 минут"""
-    user_id = message.from_user.id
-    if user_settings.get(user_id) == 0:
-        user_settings.pop(user_id)  # Удаляем настройку
-        await message.reply("Вы отключили напоминания за 0 минут до начала встречи.")
-    else:
-        user_settings[user_id] = 0  # Включаем настройку
-        await message.reply("Вы включили напоминания за 0 минут до начала встречи.")
+    await toggle_reminder(message, 0)
 
 @router.message(Command('logout'))
 async def logout(message: types.Message):
     """Команда для выхода из аккаунта Google"""
     user_id = message.from_user.id
-    token_path = f'user_tokens/token_{user_id}.pickle'
     
-    if os.path.exists(token_path):
-        os.remove(token_path)
+    if await calendar_facade.has_credentials(user_id):
+        if PUSH_ENABLED:
+            await push_channels.unregister(user_id)  # Канал закрываем, пока токен ещё есть
+        await calendar_facade.delete_credentials(user_id)
         if user_id in active_users:
             del active_users[user_id]
+        scheduler.forget(user_id)
         await message.reply("Вы успешно вышли из аккаунта Google.")
     else:
         await message.reply("Вы не были авторизованы.")
@@ -395,15 +412,14 @@ async def process_auth_code(message: Message, state: FSMContext):
     user_id = message.from_user.id
     try:
         data = await state.get_data()
-        flow = data.get("flow")
         
-        if not flow:
+        if "code_verifier" not in data:
             await message.reply("❌ Ошибка. Начните с команды /start")
             await state.clear()
             return
         
         # Завершаем аутентификацию
-        creds = complete_authentication(user_id, message.text.strip())  # Исправлено
+        creds = await calendar_facade.complete_authentication(user_id, message.text.strip(), data["code_verifier"])
         active_users[user_id] = creds
         
         await state.clear()
@@ -586,31 +602,11 @@ async def process_event_description(message: Message, state: FSMContext):
 
 async def show_event_summary(message: Message, state: FSMContext):
     """Показывает сводку события перед подтверждением"""
-    from datetime import datetime, timedelta  # Добавляем импорт
     from event_keyboards import get_meet_link_keyboard  # Добавляем импорт клавиатуры
     
     data = await state.get_data()
     
-    # Формируем время окончания
-    time_str = data['time']
-    if ':' not in time_str:
-        time_str += ':00'
-    start_datetime = datetime.strptime(f"{data['date']} {time_str}", "%d.%m.%Y %H:%M")
-    end_datetime = start_datetime + timedelta(hours=float(data['duration']))
-    time_range = f"{time_str} - {end_datetime.strftime('%H:%M')}"
-    
-    summary = (
-        "📌 *Название:* {title}\n\n"
-        "📅 *Дата:* {date}\n"
-        "⌚ *Время:* {time_range}\n"
-        "📝 *Описание:* {description}\n\n"
-        "Создать ссылку на Google Meet?"
-    ).format(
-        title=escape_markdown_v2(data.get('title', 'не указано')),
-        date=escape_markdown_v2(data.get('date', 'не указана')),
-        time_range=escape_markdown_v2(time_range),
-        description=escape_markdown_v2(data.get('description', 'нет описания'))
-    )
+    summary = format_event_draft(data, EVENT_SUMMARY_TEMPLATE)
     
     await state.set_state(EventCreationStates.meet_link_choice)
     await message.answer(
@@ -711,34 +707,9 @@ async def process_meet_link_choice(callback: CallbackQuery, state: FSMContext):
 
 async def show_confirmation(message: Message, state: FSMContext):
     """Показывает финальное подтверждение перед созданием события"""
-    from datetime import datetime, timedelta
-    
     data = await state.get_data()
     
-    # Формируем время окончания
-    time_str = data['time']
-    if ':' not in time_str:
-        time_str += ':00'
-    start_datetime = datetime.strptime(f"{data['date']} {time_str}", "%d.%m.%Y %H:%M")
-    end_datetime = start_datetime + timedelta(hours=float(data['duration']))
-    time_range = f"{time_str} - {end_datetime.strftime('%H:%M')}"
-    
-    meet_status = "Да" if data.get('create_meet_link', False) else "Нет"
-    
-    summary = (
-        "📌 *Название:* {title}\n\n"
-        "📅 *Дата:* {date}\n"
-        "⌚ *Время:* {time_range}\n"
-        "📝 *Описание:* {description}\n"
-        "🔗 *Google Meet:* {meet_status}\n\n"
-        "Подтверждаете создание события?"
-    ).format(
-        title=escape_markdown_v2(data.get('title', 'не указано')),
-        date=escape_markdown_v2(data.get('date', 'не указана')),
-        time_range=escape_markdown_v2(time_range),
-        description=escape_markdown_v2(data.get('description', 'нет описания')),
-        meet_status=escape_markdown_v2(meet_status)
-    )
+    summary = format_event_draft(data, EVENT_CONFIRMATION_TEMPLATE)
     
     await state.set_state(EventCreationStates.confirmation)
     await message.answer(
@@ -759,7 +730,7 @@ async def next_event_callback(callback: CallbackQuery):
     try:
         # Проверяем аутентификацию без отправки сообщения
         if user_id not in active_users:
-            creds = authenticate_google_calendar(user_id)
+            creds = await calendar_facade.authenticate(user_id)
             if creds:
                 active_users[user_id] = creds
             else:
@@ -779,7 +750,7 @@ async def today_events_callback(callback: CallbackQuery):
     try:
         # Проверяем аутентификацию без отправки сообщения
         if user_id not in active_users:
-            creds = authenticate_google_calendar(user_id)
+            creds = await calendar_facade.authenticate(user_id)
             if creds:
                 active_users[user_id] = creds
             else:
@@ -798,7 +769,7 @@ async def tomorrow_events_callback(callback: CallbackQuery):
     try:
         # Проверяем аутентификацию без отправки сообщения
         if user_id not in active_users:
-            creds = authenticate_google_calendar(user_id)
+            creds = await calendar_facade.authenticate(user_id)
             if creds:
                 active_users[user_id] = creds
             else:
@@ -817,7 +788,7 @@ async def generate_meet_callback(callback: CallbackQuery):
     try:
         # Проверяем аутентификацию без отправки сообщения
         if user_id not in active_users:
-            creds = authenticate_google_calendar(user_id)
+            creds = await calendar_facade.authenticate(user_id)
             if creds:
                 active_users[user_id] = creds
             else:
@@ -841,14 +812,53 @@ async def handle_other_messages(message: Message, state: FSMContext):
             )
 
 async def main():
-    await bot.delete_webhook(drop_pending_updates=True)
+    # В режиме webhook обновления приходят на наш сервер, иначе забираем их через getUpdates
+    app = create_app(dp, bot) if WEBHOOK_ENABLED else None
+    if not WEBHOOK_ENABLED:
+        await bot.delete_webhook(drop_pending_updates=True)
+
+    # Метрики Prometheus на localhost
+    metrics_runner = await metrics.start()
+
+    # Однократный перенос старых pickle-токенов в хранилище учетных данных
+    await asyncio.to_thread(credential_store.migrate_from_pickle_dir)
+
+    # Токены обновляются заранее в фоне, а не в момент запроса пользователя
+    token_refresher.start()
+    reminder_settings.start()
+    meet_pool.start()
+
+    # Напоминания отправляет планировщик, а Google опрашивается редко, только для обновления событий.
+    # В режиме воркеров этим занимаются процессы reminder_worker.py
+    if not REMINDER_WORKER_MODE:
+        scheduler.start(bot)
+        asyncio.create_task(check_and_notify_events())
+
+        # Переносим cron job внутрь main
+        @crontab(f'*/{REMINDER_REFRESH_MINUTES} * * * *')
+        async def cron_job():
+            await check_and_notify_events()
+
+    # В режиме push Google сам сообщает об изменениях календаря (на том же сервере, что и webhook)
+    if PUSH_ENABLED:
+        async def on_change(user_id):
+            agenda_cache.invalidate(user_id)  # Календарь изменился: кэш команд больше не свежий
+            if not REMINDER_WORKER_MODE:
+                await refresh_user(user_id)
+
+        await push_channels.start(list_user_ids, on_change=on_change, app=app)
     
-    # Переносим cron job внутрь main
-    @crontab('*/1 * * * *')  # Каждую минуту
-    async def cron_job():
-        await check_and_notify_events(bot)
-    
-    await dp.start_polling(bot)
+    try:
+        if WEBHOOK_ENABLED:
+            await run_webhook(app, dp, bot)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        await reminder_settings.stop()
+        await async_calendar.client.close()
+        await storage.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import agenda_cache
+import async_calendar
+import google_calendar
+import metrics
+from config import CALENDAR_SLOW_SECONDS, CALENDAR_LATENCY_SAMPLES
+from credential_store import credential_store
+from meet_pool import meet_pool
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyStats:
+    """
+    Задержки операций с календарём: число вызовов, ошибок, сумма, максимум
+    и последние CALENDAR_LATENCY_SAMPLES замеров для перцентилей.
+    """
+
+    def __init__(self, samples=CALENDAR_LATENCY_SAMPLES):
+        self._samples = samples
+        self._stats = {}  # операция -> [вызовов, ошибок, сумма, максимум, deque последних замеров]
+
+    def record(self, operation, seconds, ok=True):
+        stats = self._stats.get(operation)
+        if stats is None:
+            stats = self._stats[operation] = [0, 0, 0.0, 0.0, deque(maxlen=self._samples)]
+        stats[0] += 1
+        if not ok:
+            stats[1] += 1
+        stats[2] += seconds
+        stats[3] = max(stats[3], seconds)
+        stats[4].append(seconds)
+        metrics.calendar_operation_seconds.observe(seconds, operation=operation)
+        if seconds >= CALENDAR_SLOW_SECONDS:
+            logger.warning(f"Медленная операция календаря {operation}: {seconds:.2f} с")
+
+    def summary(self):
+        """Сводка по операциям: count, errors, total, max, p50, p95 (в секундах)."""
+        result = {}
+        for operation, (count, errors, total, maximum, recent) in self._stats.items():
+            ordered = sorted(recent)
+            result[operation] = {
+                'count': count,
+                'errors': errors,
+                'total': total,
+                'max': maximum,
+                'p50': ordered[len(ordered) // 2] if ordered else 0.0,
+                'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0,
+            }
+        return result
+
+
+# Общая статистика процесса
+latency = LatencyStats()
+
+
+async def _timed(operation, awaitable):
+    started = time.perf_counter()
+    ok = False
+    try:
+        result = await awaitable
+        ok = True
+        return result
+    finally:
+        latency.record(operation, time.perf_counter() - started, ok)
+
+
+async def run_blocking(operation, func, *args, **kwargs):
+    """
+    Выполняет блокирующую функцию в потоке с замером задержки.
+    Блокирующими остались только редкие операции входа и выхода (OAuth, SQLite токенов).
+    """
+    return await _timed(operation, asyncio.to_thread(func, *args, **kwargs))
+
+
+# ===== Операции для обработчиков bot.py ===== #
+
+async def authenticate(user_id):
+    """Учетные данные пользователя (или None), токен обновляется без блокировки."""
+    return await _timed('authenticate', async_calendar.authenticate_google_calendar(user_id))
+
+
+async def get_auth_url(user_id):
+    """Ссылка авторизации и code_verifier (чтение credentials.json — в потоке)."""
+    return await run_blocking('auth_url', google_calendar.get_auth_url, user_id)
+
+
+async def complete_authentication(user_id, code, code_verifier=None):
+    """
+    Обмен кода авторизации на токен (блокирующий сетевой запрос OAuth — в потоке).
+    Сразу после входа в фоне готовятся ссылки Meet, чтобы первая из них не ждала Google.
+    """
+    creds = await run_blocking('complete_auth', google_calendar.complete_authentication, user_id, code, code_verifier)
+    meet_pool.drop(user_id)  # Ссылки прежнего аккаунта не выдаём
+    meet_pool.fill(user_id)
+    return creds
+
+
+async def delete_credentials(user_id):
+    """Удаляет учетные данные пользователя. True, если он был авторизован."""
+    return await run_blocking('delete_credentials', google_calendar.delete_credentials, user_id)
+
+
+async def has_credentials(user_id):
+    return await run_blocking('has_credentials', credential_store.has, user_id)
+
+
+async def get_todays_events(user_id):
+    return await _timed('today', agenda_cache.get_todays_events(user_id))
+
+
+async def get_tomorrows_events(user_id):
+    return await _timed('tomorrow', agenda_cache.get_tomorrows_events(user_id))
+
+
+async def get_current_event(user_id):
+    return await _timed('current', agenda_cache.get_current_event(user_id))
+
+
+async def get_next_event(user_id):
+    return await _timed('next', agenda_cache.get_next_event(user_id))
+
+
+async def generate_meet_link(user_id):
+    return await _timed('meet_link', meet_pool.take(user_id))
+
+
+async def create_event(user_id, event, conference=False):
+    """Создаёт событие; новое событие сразу видно в /today, /next и т.д."""
+    created_event = await _timed('create_event', async_calendar.create_event(user_id, event, conference=conference))
+    if created_event:
+        agenda_cache.agenda_cache.invalidate(user_id)
+    return created_event
@@ -0,0 +1,328 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from aiohttp import ClientSession, web
+
+from config import (
+    PUSH_WEBHOOK_URL,
+    PUSH_HOST,
+    PUSH_PORT,
+    PUSH_PATH,
+    PUSH_SECRET,
+    PUSH_CHANNEL_TTL_HOURS,
+    PUSH_RENEW_BEFORE_MINUTES,
+    PUSH_RETRY_MAX_HOURS,
+    PUSH_DB,
+    SWEEP_CONCURRENCY,
+)
+import async_calendar
+from credential_store import credential_store
+from event_store import get_event_store
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверяем, не пора ли продлить каналы и нет ли новых пользователей
+RENEW_CHECK_INTERVAL = 60
+
+
+def channel_token(channel_id):
+    """Подпись канала: Google возвращает её в заголовке X-Goog-Channel-Token."""
+    return hmac.new(PUSH_SECRET.encode(), channel_id.encode(), hashlib.sha256).hexdigest()
+
+
+def user_from_channel(channel_id):
+    """Извлекает user_id из id канала вида schedio-<user_id>-<uuid>."""
+    parts = channel_id.split('-')
+    if len(parts) != 3 or parts[0] != 'schedio':
+        return None
+    try:
+        return int(parts[1])
+    except ValueError:
+        return None
+
+
+class PushChannels:
+    """
+    Каналы events.watch для календарей пользователей и приёмник уведомлений.
+
+    Уведомление помечает устаревшим только хранилище событий этого пользователя,
+    поэтому обращения к Google пропорциональны изменениям в календарях, а не числу пользователей.
+    Открытые каналы хранятся в SQLite: после перезапуска они продлеваются и закрываются
+    как обычно, а не остаются жить у Google до истечения срока.
+    После ошибки регистрации попытки для пользователя повторяются с растущей паузой,
+    а после постоянной ошибки (4xx: доступ отозван, домен не подтверждён) —
+    только когда пользователь авторизуется заново.
+    """
+
+    def __init__(self, path=PUSH_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS push_channels ("
+            " user_id INTEGER PRIMARY KEY,"
+            " channel_id TEXT NOT NULL,"
+            " resource_id TEXT NOT NULL,"
+            " expiration REAL NOT NULL)"
+        )
+        # Истёкшие каналы Google закрыл сам
+        self._conn.execute("DELETE FROM push_channels WHERE expiration <= ?", (time.time(),))
+        self._channels = {  # user_id -> {'id', 'resourceId', 'expiration'}
+            user_id: {'id': channel_id, 'resourceId': resource_id, 'expiration': expiration}
+            for user_id, channel_id, resource_id, expiration in self._conn.execute(
+                "SELECT user_id, channel_id, resource_id, expiration FROM push_channels"
+            )
+        }
+        self._failures = {}  # user_id -> (число ошибок подряд, когда повторить, refresh_token при ошибке)
+        self._pending = set()  # Пользователи, для которых уже запущено обновление
+        self._on_change = None
+        self._runner = None
+        self._task = None
+
+    # ===== Работа с каналами Google ===== #
+
+    def _save(self, user_id, channel):
+        with self._lock:
+            self._channels[user_id] = channel
+            self._conn.execute(
+                "INSERT OR REPLACE INTO push_channels (user_id, channel_id, resource_id, expiration) VALUES (?, ?, ?, ?)",
+                (user_id, channel['id'], channel['resourceId'], channel['expiration']),
+            )
+
+    def _forget(self, user_id):
+        with self._lock:
+            channel = self._channels.pop(user_id, None)
+            self._conn.execute("DELETE FROM push_channels WHERE user_id = ?", (user_id,))
+        return channel
+
+    async def _watch(self, user_id):
+        """Регистрирует новый канал и закрывает старый."""
+        creds = await async_calendar.authenticate_google_calendar(user_id)
+        if not creds:
+            return False
+
+        channel_id = f"schedio-{user_id}-{uuid.uuid4().hex}"
+        body = {
+            'id': channel_id,
+            'type': 'web_hook',
+            'address': PUSH_WEBHOOK_URL,
+            'token': channel_token(channel_id),
+            'params': {'ttl': str(PUSH_CHANNEL_TTL_HOURS * 3600)},
+        }
+        response = await async_calendar.client.watch_events(creds, body, user_id=user_id)
+
+        # Google возвращает срок действия в миллисекундах
+        expiration = int(response.get('expiration', 0)) / 1000 or time.time() + PUSH_CHANNEL_TTL_HOURS * 3600
+        old = self._channels.get(user_id)
+        await asyncio.to_thread(self._save, user_id, {
+            'id': channel_id,
+            'resourceId': response['resourceId'],
+            'expiration': expiration,
+        })
+        get_event_store(user_id).watch(expiration)
+        logger.info(f"Push-канал {channel_id} зарегистрирован до {time.ctime(expiration)}")
+
+        if old:
+            await self._stop_channel(creds, user_id, old)
+        return True
+
+    async def _stop_channel(self, creds, user_id, channel):
+        try:
+            await async_calendar.client.stop_channel(creds, channel['id'], channel['resourceId'], user_id=user_id)
+        except Exception as e:
+            logger.warning(f"Не удалось закрыть push-канал {channel['id']}: {str(e)}")
+
+    async def _unwatch(self, user_id):
+        """Закрывает канал пользователя."""
+        channel = await asyncio.to_thread(self._forget, user_id)
+        get_event_store(user_id).unwatch()
+        if not channel:
+            return
+        creds = await async_calendar.authenticate_google_calendar(user_id)
+        if creds:
+            await self._stop_channel(creds, user_id, channel)
+
+    async def register(self, user_id):
+        """Регистрирует (или продлевает) канал пользователя."""
+        try:
+            registered = await self._watch(user_id)
+        except Exception as e:
+            self._record_failure(user_id, e)
+            return False
+        if registered:
+            self._failures.pop(user_id, None)
+        else:
+            self._record_failure(user_id, None)  # Токен недействителен или не обновился
+        return registered
+
+    def _record_failure(self, user_id, error):
+        attempts = self._failures.get(user_id, (0,))[0] + 1
+        creds = credential_store.cached(user_id)
+        refresh_token = creds.refresh_token if creds else None
+        status = getattr(error, 'status', None)
+        if status is not None and 400 <= status < 500 and status not in (408, 429):
+            self._failures[user_id] = (attempts, float('inf'), refresh_token)
+            logger.warning(f"Push-канал для {user_id} не регистрируется до повторной авторизации: {str(error)}")
+            return
+        delay = min(RENEW_CHECK_INTERVAL * 2 ** (attempts - 1), PUSH_RETRY_MAX_HOURS * 3600)
+        self._failures[user_id] = (attempts, time.time() + delay, refresh_token)
+        reason = str(error) if error is not None else "нет действующего токена"
+        logger.error(f"Ошибка регистрации push-канала для {user_id} (повтор через {delay:.0f} сек.): {reason}")
+
+    async def _may_retry(self, user_id, now):
+        """Пора ли снова пытаться открыть канал после ошибки."""
+        failure = self._failures.get(user_id)
+        if failure is None or now >= failure[1]:
+            return True
+        if failure[1] != float('inf'):
+            return False
+        # После постоянной ошибки — только если пользователь авторизовался заново (новый refresh_token)
+        creds = credential_store.cached(user_id) or await asyncio.to_thread(credential_store.get, user_id)
+        return creds is not None and creds.refresh_token != failure[2]
+
+    async def unregister(self, user_id):
+        """Закрывает канал пользователя, например при /logout."""
+        self._failures.pop(user_id, None)
+        try:
+            await self._unwatch(user_id)
+        except Exception as e:
+            logger.error(f"Ошибка закрытия push-канала для {user_id}: {str(e)}")
+
+    async def _renew_loop(self, list_users):
+        """Продлевает каналы до истечения и заводит каналы для новых пользователей."""
+        semaphore = asyncio.Semaphore(SWEEP_CONCURRENCY)
+
+        async def renew(user_id):
+            async with semaphore:
+                await self.register(user_id)
+
+        while True:
+            try:
+                user_ids = await asyncio.to_thread(list_users)
+                # Пользователь вышел, пока бот был остановлен: канал больше не нужен
+                known = set(user_ids)
+                for user_id in [user_id for user_id in self._channels if user_id not in known]:
+                    await self.unregister(user_id)
+                for user_id in [user_id for user_id in self._failures if user_id not in known]:
+                    del self._failures[user_id]
+                now = time.time()
+                border = now + PUSH_RENEW_BEFORE_MINUTES * 60
+                due = [
+                    user_id for user_id in user_ids
+                    if (user_id not in self._channels or self._channels[user_id]['expiration'] <= border)
+                    and await self._may_retry(user_id, now)
+                ]
+                if due:
+                    await asyncio.gather(*(renew(user_id) for user_id in due))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при продлении push-каналов: {str(e)}")
+            await asyncio.sleep(RENEW_CHECK_INTERVAL)
+
+    # ===== Приём уведомлений ===== #
+
+    async def handle_notification(self, request):
+        """Обработчик POST-запросов от Google (или локальной заглушки)."""
+        channel_id = request.headers.get('X-Goog-Channel-ID', '')
+        token = request.headers.get('X-Goog-Channel-Token', '')
+        state = request.headers.get('X-Goog-Resource-State', '')
+
+        user_id = user_from_channel(channel_id)
+        if user_id is None or not hmac.compare_digest(token, channel_token(channel_id)):
+            logger.warning(f"Отклонено push-уведомление с неверным каналом {channel_id}")
+            return web.Response(status=403)
+
+        # Первое уведомление 'sync' лишь подтверждает создание канала
+        if state != 'sync':
+            get_event_store(user_id).mark_dirty()
+            self._schedule_refresh(user_id)
+        return web.Response(status=200)
+
+    def _schedule_refresh(self, user_id):
+        """Запускает обновление пользователя, склеивая серию уведомлений в одно."""
+        if self._on_change is None or user_id in self._pending:
+            return
+        self._pending.add(user_id)
+
+        async def refresh():
+            try:
+                await self._on_change(user_id)
+            except Exception as e:
+                logger.error(f"Ошибка обновления после push-уведомления для {user_id}: {str(e)}")
+            finally:
+                self._pending.discard(user_id)
+
+        asyncio.create_task(refresh())
+
+    def setup_routes(self, app):
+        """Подключает обработчик уведомлений к aiohttp-приложению."""
+        app.router.add_post(PUSH_PATH, self.handle_notification)
+
+    async def start(self, list_users, on_change=None, app=None):
+        """
+        Запускает приёмник уведомлений и фоновое продление каналов.
+        list_users — функция, возвращающая id авторизованных пользователей,
+        on_change — корутина, вызываемая при изменении календаря пользователя,
+        app — готовое aiohttp-приложение (например, webhook бота); без него поднимается свой сервер.
+        """
+        self._on_change = on_change
+
+        # Каналы, открытые до перезапуска, продолжают присылать уведомления
+        for user_id, channel in self._channels.items():
+            get_event_store(user_id).watch(channel['expiration'])
+
+        if app is not None:
+            self.setup_routes(app)
+        else:
+            app = web.Application()
+            self.setup_routes(app)
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, PUSH_HOST, PUSH_PORT).start()
+            logger.info(f"Приёмник push-уведомлений слушает http://{PUSH_HOST}:{PUSH_PORT}{PUSH_PATH}")
+
+        self._task = asyncio.create_task(self._renew_loop(list_users))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+# Общий набор каналов процесса
+push_channels = PushChannels()
+
+
+async def _simulate_notification(user_id, state='exists'):
+    """
+    Локальная заглушка Google: отправляет уведомление о канале так же, как это делает Calendar API.
+    """
+    channel_id = f"schedio-{user_id}-{uuid.uuid4().hex}"
+    headers = {
+        'X-Goog-Channel-ID': channel_id,
+        'X-Goog-Channel-Token': channel_token(channel_id),
+        'X-Goog-Resource-State': state,
+        'X-Goog-Message-Number': '1',
+    }
+    async with ClientSession() as session:
+        async with session.post(f"http://{PUSH_HOST}:{PUSH_PORT}{PUSH_PATH}", headers=headers) as response:
+            print(f"{response.status} {await response.text()}")
+
+
+if __name__ == '__main__':
+    # Использование: python calendar_push.py <user_id> [exists|sync|not_exists]
+    if len(sys.argv) < 2:
+        print("Использование: python calendar_push.py <user_id> [exists|sync|not_exists]")
+        sys.exit(1)
+    asyncio.run(_simulate_notification(int(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else 'exists'))
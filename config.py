@@ -1,5 +1,5 @@
+import hashlib
 import pytz
-from collections import defaultdict
 import os
 
 # Токен бота
@@ -15,4 +15,115 @@ if not os.path.exists(TOKENS_DIR):
 
 # Словари для управления состоянием
 active_users = {}  # Хранит активных пользователей и их креды
-user_settings = defaultdict(int)  # Напоминания по пользователю (в минутах)
\ No newline at end of file
+
+# Параметры проверки событий (sweep)
+SWEEP_CONCURRENCY = int(os.getenv('SWEEP_CONCURRENCY', '32'))  # Сколько пользователей обрабатываем параллельно
+SWEEP_USER_TIMEOUT = float(os.getenv('SWEEP_USER_TIMEOUT', '20'))  # Таймаут на одного пользователя (в секундах)
+
+# Параметры планировщика напоминаний
+REMINDER_REFRESH_MINUTES = int(os.getenv('REMINDER_REFRESH_MINUTES', '5'))  # Как часто обновляем события из Google
+REMINDER_HORIZON_MINUTES = int(os.getenv('REMINDER_HORIZON_MINUTES', '120'))  # Насколько вперёд планируем напоминания
+REMINDER_GRACE_SECONDS = int(os.getenv('REMINDER_GRACE_SECONDS', '120'))  # Допустимое опоздание напоминания
+REMINDER_RETRY_SECONDS = int(os.getenv('REMINDER_RETRY_SECONDS', '15'))  # Пауза перед повторной отправкой после ошибки
+
+# Локальное хранилище событий (синхронизация через syncToken)
+EVENT_STORE_LOOKBACK_DAYS = int(os.getenv('EVENT_STORE_LOOKBACK_DAYS', '1'))  # Сколько дней прошлого держим в памяти
+EVENT_STORE_WINDOW_DAYS = int(os.getenv('EVENT_STORE_WINDOW_DAYS', '14'))  # На сколько дней вперёд загружаем события (/next дальше не видит)
+
+# Push-уведомления Google Calendar (events.watch) вместо постоянного опроса
+PUSH_ENABLED = os.getenv('PUSH_ENABLED', '0') == '1'
+PUSH_WEBHOOK_URL = os.getenv('PUSH_WEBHOOK_URL', 'https://schedio.ru/calendar-push')  # Публичный HTTPS-адрес для Google
+PUSH_HOST = os.getenv('PUSH_HOST', '127.0.0.1')
+PUSH_PORT = int(os.getenv('PUSH_PORT', '8081'))
+PUSH_PATH = os.getenv('PUSH_PATH', '/calendar-push')
+PUSH_SECRET = os.getenv('PUSH_SECRET', API_TOKEN)  # Ключ для подписи токенов каналов
+PUSH_CHANNEL_TTL_HOURS = int(os.getenv('PUSH_CHANNEL_TTL_HOURS', '168'))  # Запрашиваемый срок жизни канала
+PUSH_RENEW_BEFORE_MINUTES = int(os.getenv('PUSH_RENEW_BEFORE_MINUTES', '60'))  # За сколько до истечения продлеваем канал
+PUSH_RETRY_MAX_HOURS = float(os.getenv('PUSH_RETRY_MAX_HOURS', '6'))  # Наибольшая пауза между попытками открыть канал после ошибок
+
+# Асинхронный клиент Google Calendar (aiohttp)
+ASYNC_CALENDAR_POOL_SIZE = int(os.getenv('ASYNC_CALENDAR_POOL_SIZE', '100'))  # Общий пул соединений
+ASYNC_CALENDAR_TIMEOUT = float(os.getenv('ASYNC_CALENDAR_TIMEOUT', '15'))  # Таймаут одного запроса (в секундах)
+
+# Хранилище учетных данных Google (SQLite вместо pickle-файлов)
+CREDENTIALS_DB = os.getenv('CREDENTIALS_DB', 'schedio.db')
+CREDENTIAL_CACHE_SIZE = int(os.getenv('CREDENTIAL_CACHE_SIZE', '1024'))  # Сколько учетных данных держим в памяти
+CREDENTIAL_CACHE_TTL = float(os.getenv('CREDENTIAL_CACHE_TTL', '30'))  # Через сколько секунд сверяем кэш с базой (её меняют и другие процессы)
+PUSH_DB = os.getenv('PUSH_DB', CREDENTIALS_DB)  # Открытые push-каналы Google (переживают перезапуск бота)
+
+# Фоновое обновление токенов Google
+TOKEN_REFRESH_AHEAD_SECONDS = int(os.getenv('TOKEN_REFRESH_AHEAD_SECONDS', '300'))  # За сколько до истечения обновляем
+TOKEN_REFRESH_JITTER_SECONDS = int(os.getenv('TOKEN_REFRESH_JITTER_SECONDS', '60'))  # Случайный разброс, чтобы не обновлять всех разом
+TOKEN_REFRESH_CONCURRENCY = int(os.getenv('TOKEN_REFRESH_CONCURRENCY', '10'))
+TOKEN_REFRESH_RETRY_SECONDS = int(os.getenv('TOKEN_REFRESH_RETRY_SECONDS', '60'))  # Повтор после временной ошибки
+
+# Склейка одинаковых запросов к Google (single-flight)
+COALESCE_WINDOW_SECONDS = float(os.getenv('COALESCE_WINDOW_SECONDS', '2'))  # Сколько секунд переиспользуем общий результат
+
+# Настройки напоминаний пользователей
+SETTINGS_DB = os.getenv('SETTINGS_DB', CREDENTIALS_DB)
+SETTINGS_FLUSH_SECONDS = float(os.getenv('SETTINGS_FLUSH_SECONDS', '5'))  # Как часто записываем изменения на диск
+DEFAULT_REMINDER_OFFSETS = (0,)  # Напоминания по умолчанию (в минутах до начала)
+
+# Журнал отправленных напоминаний
+LEDGER_DB = os.getenv('LEDGER_DB', CREDENTIALS_DB)
+LEDGER_RETENTION_HOURS = int(os.getenv('LEDGER_RETENTION_HOURS', '48'))  # Сколько храним записи после начала события
+
+# Хранилище состояний FSM: 'memory', 'sqlite' или адрес Redis (redis://host:6379/0)
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite')
+FSM_DB = os.getenv('FSM_DB', CREDENTIALS_DB)
+
+# Отправка напоминаний отдельными процессами (python reminder_worker.py)
+REMINDER_WORKER_MODE = os.getenv('REMINDER_WORKER_MODE', '0') == '1'  # 1 — бот сам напоминания не отправляет
+REMINDER_SHARDS = int(os.getenv('REMINDER_SHARDS', '64'))  # На сколько частей делим пользователей
+WORKER_DB = os.getenv('WORKER_DB', CREDENTIALS_DB)  # Общая база аренды частей
+WORKER_LEASE_SECONDS = int(os.getenv('WORKER_LEASE_SECONDS', '30'))  # Срок аренды части
+WORKER_HEARTBEAT_SECONDS = int(os.getenv('WORKER_HEARTBEAT_SECONDS', '10'))  # Как часто продлеваем аренду
+
+# Очередь исходящих сообщений Telegram (ограничения частоты)
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', '30'))  # Сообщений в секунду на бота
+SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', '1'))  # Сообщений в секунду на чат
+SEND_CHAT_BURST = int(os.getenv('SEND_CHAT_BURST', '3'))  # Сколько сообщений в чат можно отправить подряд
+
+# Список событий (/today, /tomorrow)
+AGENDA_PAGE_EVENTS = int(os.getenv('AGENDA_PAGE_EVENTS', '10'))  # Сколько событий на одной странице
+
+# Приём обновлений Telegram через webhook вместо long polling
+WEBHOOK_ENABLED = os.getenv('WEBHOOK_ENABLED', '0') == '1'
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', 'https://schedio.ru/telegram-webhook')  # Публичный HTTPS-адрес для Telegram
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram-webhook')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', PUSH_HOST)  # Тот же сервер, что и для push-уведомлений Google
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', str(PUSH_PORT)))
+# Секрет из заголовка X-Telegram-Bot-Api-Secret-Token (допустимы только A-Z, a-z, 0-9, _ и -)
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or hashlib.sha256(f"webhook:{API_TOKEN}".encode()).hexdigest()
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv('WEBHOOK_MAX_CONCURRENCY', '64'))  # Сколько обновлений обрабатываем одновременно
+WEBHOOK_SHUTDOWN_TIMEOUT = float(os.getenv('WEBHOOK_SHUTDOWN_TIMEOUT', '10'))  # Сколько ждём начатые обработчики при остановке
+
+# Кэш разобранных событий (по id и etag): время, ссылка на звонок, экранированные поля
+EVENT_RECORD_CACHE_SIZE = int(os.getenv('EVENT_RECORD_CACHE_SIZE', '4096'))
+
+# Кэш списков событий для команд /today, /tomorrow, /now, /next (stale-while-revalidate)
+AGENDA_CACHE_TTL = float(os.getenv('AGENDA_CACHE_TTL', '60'))  # Сколько секунд данные считаются свежими
+AGENDA_CACHE_MAX_STALE = float(os.getenv('AGENDA_CACHE_MAX_STALE', '3600'))  # До какого возраста отдаём данные, обновляя в фоне
+AGENDA_CACHE_SIZE = int(os.getenv('AGENDA_CACHE_SIZE', '4096'))  # Сколько списков держим в памяти
+
+# Заранее созданные ссылки Google Meet (/generate_meet_link)
+MEET_POOL_SIZE = int(os.getenv('MEET_POOL_SIZE', '2'))  # Сколько готовых ссылок держим на пользователя
+MEET_POOL_TTL_HOURS = float(os.getenv('MEET_POOL_TTL_HOURS', '24'))  # Ссылки старше не выдаём
+MEET_POOL_USERS = int(os.getenv('MEET_POOL_USERS', '1000'))  # Для скольких пользователей держим ссылки
+
+# Замер задержек операций с календарём (calendar_facade)
+CALENDAR_SLOW_SECONDS = float(os.getenv('CALENDAR_SLOW_SECONDS', '2'))  # Операции дольше пишем в лог
+CALENDAR_LATENCY_SAMPLES = int(os.getenv('CALENDAR_LATENCY_SAMPLES', '512'))  # Замеров на операцию для перцентилей
+
+# Метрики в формате Prometheus (HTTP на localhost)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))  # Воркерам напоминаний задавайте свой порт
+METRICS_PATH = os.getenv('METRICS_PATH', '/metrics')
+
+# Выборочная трассировка проверки событий (JSONL, отчёт: python sweep_report.py)
+SWEEP_TRACE_SAMPLE = float(os.getenv('SWEEP_TRACE_SAMPLE', '0'))  # Доля пользователей в каждом прогоне (0 — выключено)
+SWEEP_TRACE_SLOW_SECONDS = float(os.getenv('SWEEP_TRACE_SLOW_SECONDS', '0'))  # Всегда писать пользователей медленнее порога (0 — выключено)
+SWEEP_TRACE_FILE = os.getenv('SWEEP_TRACE_FILE', 'sweep_trace.jsonl')
+SWEEP_TRACE_MAX_BYTES = int(os.getenv('SWEEP_TRACE_MAX_BYTES', str(50 * 1024 * 1024)))  # Затем файл переименовывается в .1
@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+
+from google.oauth2.credentials import Credentials
+
+from config import CREDENTIALS_DB, CREDENTIAL_CACHE_SIZE, CREDENTIAL_CACHE_TTL, TOKENS_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def _expiry_timestamp(creds):
+    """Срок действия access-токена как unix-время (expiry в google-auth — наивное UTC)."""
+    if not creds.expiry:
+        return None
+    return creds.expiry.replace(tzinfo=timezone.utc).timestamp()
+
+
+class CredentialStore:
+    """
+    Хранилище учетных данных Google в SQLite (режим WAL) с LRU-кэшем в памяти.
+
+    Заменяет файлы user_tokens/token_<id>.pickle: обновления атомарны,
+    список подключённых пользователей берётся из индекса, а не из os.listdir.
+    Запись кэша старше cache_ttl сверяется с updated_at в базе: токен, обновлённый
+    или удалённый другим процессом (бот и воркеры напоминаний), не живёт в памяти вечно.
+    """
+
+    def __init__(self, path=CREDENTIALS_DB, cache_size=CREDENTIAL_CACHE_SIZE, cache_ttl=CREDENTIAL_CACHE_TTL):
+        self._cache = OrderedDict()  # user_id -> (Credentials, updated_at, когда сверяли с базой)
+        self._cache_size = cache_size
+        self._cache_ttl = cache_ttl
+        self._lock = threading.RLock()
+        self._listeners = []  # Вызываются как listener(user_id, срок действия или None при удалении)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS credentials ("
+            " user_id INTEGER PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expiry REAL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def add_listener(self, listener):
+        """Подписка на изменения учетных данных (например, для фонового обновления токенов)."""
+        self._listeners.append(listener)
+
+    def _notify(self, user_id, expiry):
+        for listener in self._listeners:
+            try:
+                listener(user_id, expiry)
+            except Exception as e:
+                logger.error(f"Ошибка в подписчике хранилища учетных данных: {str(e)}")
+
+    def _remember(self, user_id, creds, updated_at):
+        self._cache[user_id] = (creds, updated_at, time.monotonic())
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def cached(self, user_id):
+        """
+        Учетные данные из памяти, если они сверялись с базой не раньше cache_ttl назад, иначе None.
+        Не обращается к диску, поэтому безопасна для цикла событий.
+        """
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is None or time.monotonic() - entry[2] >= self._cache_ttl:
+                return None
+            self._cache.move_to_end(user_id)
+            return entry[0]
+
+    def get(self, user_id):
+        """Возвращает учетные данные пользователя или None."""
+        with self._lock:
+            creds = self.cached(user_id)
+            if creds is not None:
+                return creds
+
+            row = self._conn.execute("SELECT data, updated_at FROM credentials WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                self._cache.pop(user_id, None)  # Пользователь вышел в другом процессе
+                return None
+            entry = self._cache.get(user_id)
+            if entry is not None and entry[1] == row[1]:
+                # Запись не менялась: оставляем тот же объект (его токен мог обновиться в памяти)
+                self._remember(user_id, entry[0], row[1])
+                return entry[0]
+            try:
+                creds = Credentials.from_authorized_user_info(json.loads(row[0]))
+            except (ValueError, KeyError) as e:
+                logger.error(f"Повреждённые учетные данные пользователя {user_id}: {str(e)}")
+                return None
+            self._remember(user_id, creds, row[1])
+            return creds
+
+    def put(self, user_id, creds):
+        """Атомарно сохраняет (или заменяет) учетные данные пользователя."""
+        expiry = _expiry_timestamp(creds)
+        updated_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO credentials (user_id, data, expiry, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, expiry = excluded.expiry, "
+                "updated_at = excluded.updated_at",
+                (user_id, creds.to_json(), expiry, updated_at),
+            )
+            self._remember(user_id, creds, updated_at)
+        self._notify(user_id, expiry)
+
+    def delete(self, user_id):
+        """Удаляет учетные данные. Возвращает True, если они были."""
+        with self._lock:
+            self._cache.pop(user_id, None)
+            cursor = self._conn.execute("DELETE FROM credentials WHERE user_id = ?", (user_id,))
+        self._notify(user_id, None)
+        return cursor.rowcount > 0
+
+    def has(self, user_id):
+        with self._lock:
+            if self.cached(user_id) is not None:
+                return True
+            return self._conn.execute("SELECT 1 FROM credentials WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+    def user_ids(self):
+        """Список подключённых пользователей (по индексу первичного ключа)."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT user_id FROM credentials ORDER BY user_id")]
+
+    def expiries(self):
+        """Пары (user_id, срок действия токена) для фонового обновления токенов."""
+        with self._lock:
+            return self._conn.execute("SELECT user_id, expiry FROM credentials").fetchall()
+
+    def migrate_from_pickle_dir(self, directory=TOKENS_DIR):
+        """
+        Однократный перенос токенов из user_tokens/token_<id>.pickle.
+        Файлы не удаляются; повторный запуск ничего не делает.
+        """
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'pickle_migrated'").fetchone():
+                return 0
+
+        migrated = 0
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                if not (filename.startswith('token_') and filename.endswith('.pickle')):
+                    continue
+                try:
+                    user_id = int(filename[len('token_'):-len('.pickle')])
+                    with open(os.path.join(directory, filename), 'rb') as token:
+                        creds = pickle.load(token)
+                    if not self.has(user_id):
+                        self.put(user_id, creds)
+                        migrated += 1
+                except Exception as e:
+                    logger.warning(f"Не удалось перенести {filename}: {str(e)}")
+
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('pickle_migrated', ?)", (str(time.time()),))
+        logger.info(f"Перенесено токенов из {directory}: {migrated}")
+        return migrated
+
+
+# Общее хранилище процесса
+credential_store = CredentialStore()
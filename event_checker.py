@@ -1,48 +1,126 @@
+import asyncio
 import logging
+import time
 from datetime import datetime
-from google_calendar import get_upcoming_events, authenticate_google_calendar  # Функция для получения событий из Google Calendar
-from reminders import send_reminder  # Функция для отправки напоминаний
-from config import TIMEZONE, active_users, user_settings, TOKENS_DIR  # Конфигурации и общие переменные
-import os
-from dateutil import parser  # Добавляем парсер даты из библиотеки dateutil
+from async_calendar import get_upcoming_events, authenticate_google_calendar  # Асинхронный клиент Google Calendar
+from reminder_scheduler import scheduler  # Планировщик напоминаний
+import metrics
+from sweep_trace import span, tracer
+from config import (  # Конфигурации и общие переменные
+    TIMEZONE,
+    SWEEP_CONCURRENCY,
+    SWEEP_USER_TIMEOUT,
+)
+from credential_store import credential_store
+from reminder_ledger import reminder_ledger
+from settings_store import reminder_settings
 
-async def check_and_notify_events(bot):
+# Не даём двум проверкам идти одновременно, если предыдущая затянулась
+_sweep_lock = asyncio.Lock()
+
+# Ограничение для внеочередных обновлений отдельных пользователей
+_refresh_semaphore = asyncio.Semaphore(SWEEP_CONCURRENCY)
+
+
+def list_user_ids():
+    """
+    Возвращает id пользователей, у которых есть сохранённый токен.
+    """
+    return credential_store.user_ids()
+
+
+async def _fetch_user_events(user_id):
     """
-    Проверка событий и отправка уведомлений.
-    Эта функция вызывается по расписанию через Cloud Scheduler.
+    Загрузка токена и запрос событий через асинхронный клиент,
+    поэтому запросы не останавливают цикл событий бота.
     """
+    with span('auth'):
+        creds = await authenticate_google_calendar(user_id)
+    if not creds:
+        return None
+    with span('events'):
+        return await get_upcoming_events(creds, user_id)
+
+
+async def _check_user(user_id, semaphore, run=None, kind='sweep'):
+    """
+    Получает события одного пользователя и передаёт их планировщику.
+    """
+    trace = tracer.start(user_id, run, kind)
+    status = 'ok'
     try:
-        now = datetime.now(TIMEZONE)  # `now` уже offset-aware
-        logging.debug(f"Проверка событий на {now}")
-
-        for filename in os.listdir(TOKENS_DIR):
-            if filename.startswith('token_') and filename.endswith('.pickle'):
-                user_id = int(filename.replace('token_', '').replace('.pickle', ''))
-
-                creds = authenticate_google_calendar(user_id)
-                if creds:
-                    events = get_upcoming_events(creds)
-                    for event in events:
-                        event_id = event['id']
-                        logging.debug(f"Проверяем событие {event_id}")
-
-                        # Извлекаем время начала события
-                        event_start_str = event['start'].get('dateTime', event['start'].get('date'))
-                        event_start = parser.isoparse(event_start_str)  # Парсим строку в datetime
-
-                        # Если event_start без таймзоны, добавляем её
-                        if event_start.tzinfo is None:
-                            event_start = event_start.replace(tzinfo=TIMEZONE)
-
-                        reminder_time = user_settings.get(user_id, 0)
-                        logging.debug(f"Настройка для {user_id}: {reminder_time} минут")
-                        logging.debug(f"Событие: {event['summary']}")
-                        logging.debug(f"Время начала события: {event_start}")
-                        logging.debug(f"Текущее время: {now}")
-                        logging.debug(f"До события осталось: {event_start - now}")
-
-                        # Отправляем напоминание пользователю
-                        await send_reminder(bot, user_id, event, event_start, reminder_time)
-
-    except Exception as e:
-        logging.error(f"Ошибка при проверке событий: {str(e)}")
\ No newline at end of file
+        with span('queue'):
+            await semaphore.acquire()
+        try:
+            events = await asyncio.wait_for(_fetch_user_events(user_id), timeout=SWEEP_USER_TIMEOUT)
+        except asyncio.TimeoutError:
+            status = 'timeout'
+            logging.warning(f"Пользователь {user_id}: события не получены за {SWEEP_USER_TIMEOUT} сек.")
+            return
+        except Exception as e:
+            status = 'error'
+            logging.error(f"Ошибка при получении событий пользователя {user_id}: {str(e)}")
+            return
+        finally:
+            semaphore.release()
+
+        if events is None:
+            status = 'no_token'
+            return  # Токена нет или он недействителен
+
+        offsets = reminder_settings.offsets(user_id)
+        logging.debug(f"Настройка для {user_id}: {offsets} минут")
+
+        # Планировщик сам решит, изменились ли события, и отправит напоминания вовремя
+        with span('plan'):
+            scheduler.plan(user_id, events, offsets)
+        if trace is not None:
+            trace.attrs['events'] = len(events)
+    finally:
+        tracer.finish(trace, status)
+
+
+async def refresh_user(user_id):
+    """
+    Внеочередное обновление событий одного пользователя
+    (например, после push-уведомления об изменении календаря).
+    """
+    await _check_user(user_id, _refresh_semaphore, kind='refresh')
+
+
+async def check_and_notify_events(owns=None):
+    """
+    Обновление событий и перепланирование напоминаний.
+    Эта функция вызывается по расписанию раз в REMINDER_REFRESH_MINUTES минут,
+    сами напоминания отправляет планировщик reminder_scheduler.
+    Пользователи обрабатываются параллельно, но не более SWEEP_CONCURRENCY одновременно.
+    owns(user_id) ограничивает проверку своими пользователями (режим воркеров).
+    """
+    if _sweep_lock.locked():
+        logging.warning("Предыдущая проверка событий ещё не завершилась, пропускаем запуск")
+        return
+
+    async with _sweep_lock:
+        started = time.monotonic()
+        run = tracer.new_run()
+        try:
+            user_ids = await asyncio.to_thread(list_user_ids)
+            if owns is not None:
+                user_ids = [user_id for user_id in user_ids if owns(user_id)]
+            logging.debug(f"Проверка событий на {datetime.now(TIMEZONE)} для {len(user_ids)} пользователей")
+
+            semaphore = asyncio.Semaphore(SWEEP_CONCURRENCY)
+            await asyncio.gather(*(_check_user(user_id, semaphore, run) for user_id in user_ids))
+
+            # Заодно чистим журнал отправленных напоминаний от старых записей
+            await asyncio.to_thread(reminder_ledger.expire)
+
+            elapsed = time.monotonic() - started
+            tracer.record_run(run, len(user_ids), elapsed)
+            await tracer.flush()
+            metrics.sweep_seconds.observe(elapsed)
+            metrics.sweep_users.set(len(user_ids))
+            logging.info(f"Обновление событий завершено: {len(user_ids)} пользователей за {elapsed:.2f} сек.")
+        except Exception as e:
+            metrics.sweep_failures.inc()
+            logging.error(f"Ошибка при проверке событий: {str(e)}")
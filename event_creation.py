@@ -1,19 +1,10 @@
 import re
-import asyncio
 from datetime import datetime, timedelta
 from typing import Tuple
 
 async def create_google_calendar_event(user_id: int, event_data: dict) -> Tuple[bool, str]:
     try:
-        from google_calendar import authenticate_google_calendar, get_calendar_service
-        
-        creds = await asyncio.to_thread(authenticate_google_calendar, user_id)
-        if not creds:
-            return False, "Ошибка: Не удалось подключиться к Google Calendar. Попробуйте /relogin"
-
-        service = await asyncio.to_thread(get_calendar_service, creds)
-        if not service:
-            return False, "Ошибка: Не удалось создать сервис Google Calendar"
+        import calendar_facade
 
         time_str = event_data['time']
         if ':' not in time_str:
@@ -47,13 +38,13 @@ async def create_google_calendar_event(user_id: int, event_data: dict) -> Tuple[
                 }
             }
 
-        created_event = await asyncio.to_thread(
-            lambda: service.events().insert(
-                calendarId='primary', 
-                body=event,
-                conferenceDataVersion=1 if event_data.get('create_meet_link', False) else 0
-            ).execute()
+        created_event = await calendar_facade.create_event(
+            user_id,
+            event,
+            conference=event_data.get('create_meet_link', False)
         )
+        if not created_event:
+            return False, "Ошибка: Не удалось подключиться к Google Calendar. Попробуйте /relogin"
         
         event_link = created_event.get('htmlLink')
         meet_link = created_event.get('hangoutLink', '')
@@ -0,0 +1,175 @@
+import base64
+import threading
+from collections import OrderedDict
+
+from dateutil import parser  # Парсер даты из библиотеки dateutil
+
+import metrics
+from config import TIMEZONE, EVENT_RECORD_CACHE_SIZE
+from meeting_links import get_meeting_link
+
+# Ограничения длины полей
+DESCRIPTION_LIMIT = 150
+ATTENDEES_LIMIT = 150
+
+# Разобранные события: (id, etag) -> EventRecord, вытеснение по LRU
+_records = OrderedDict()
+_records_lock = threading.Lock()
+
+
+def parse_event_time(event, field='start'):
+    """
+    Возвращает время начала (или окончания) события как offset-aware datetime.
+    События на весь день считаются в локальной временной зоне.
+    """
+    value = event[field].get('dateTime', event[field].get('date'))
+    parsed = parser.isoparse(value)
+    if parsed.tzinfo is None:
+        parsed = TIMEZONE.localize(parsed)
+    return parsed
+
+
+def get_event_link(event):
+    """Ссылка на событие в веб-интерфейсе Google Calendar."""
+    calendar_id = "primary"  # Replace with the actual calendar ID if available
+    encoded_event_id = base64.urlsafe_b64encode(f"{event['id']} {calendar_id}".encode()).decode()
+    return f"https://calendar.google.com/calendar/event?eid={encoded_event_id}"
+
+
+class EventRecord:
+    """
+    Разобранное событие Google Calendar.
+
+    Время приведено к локальной зоне, ссылка на звонок найдена, текстовые поля
+    обрезаны и экранированы для MarkdownV2. Запись строится один раз на (id, etag)
+    и переиспользуется планировщиком, напоминаниями и форматированием.
+    """
+
+    __slots__ = (
+        'id',
+        'start',  # datetime в TIMEZONE или None
+        'end',
+        'all_day',
+        'meeting_link',  # Ссылка на видеозвонок или None
+        'summary',  # Поля ниже уже экранированы для MarkdownV2
+        'location',
+        'attendees',
+        'description',
+        'event_link',
+    )
+
+    def __init__(self, event):
+        # Импорт здесь: message_format сам использует записи событий
+        from message_format import escape_markdown, escape_url
+
+        self.id = event['id']
+        self.all_day = 'dateTime' not in event.get('start', {})
+        self.start = self._time(event, 'start')
+        self.end = self._time(event, 'end')
+        self.meeting_link = get_meeting_link(event)
+
+        # Список участников не длиннее ATTENDEES_LIMIT символов
+        attendees = ", ".join(a.get('email', 'Неизвестный участник') for a in event.get('attendees', []))
+        if not attendees:
+            attendees = "Участники не указаны"
+        elif len(attendees) > ATTENDEES_LIMIT:
+            attendees = attendees[:ATTENDEES_LIMIT] + "..."
+
+        self.summary = escape_markdown(event.get('summary', 'Без названия'))
+        self.location = escape_markdown(event.get('location', 'Локация не указана'))
+        self.attendees = escape_markdown(attendees)
+        self.description = escape_markdown(event.get('description', 'без описания')[:DESCRIPTION_LIMIT])
+        self.event_link = escape_url(get_event_link(event))
+
+    @staticmethod
+    def _time(event, field):
+        try:
+            return parse_event_time(event, field).astimezone(TIMEZONE)
+        except (KeyError, ValueError, TypeError):
+            return None
+
+
+def get_event_record(event):
+    """
+    Запись для события из кэша; строится заново, только если изменился etag.
+    """
+    version = event.get('etag') or event.get('updated')
+    if not version:
+        return EventRecord(event)
+
+    key = (event['id'], version)
+    with _records_lock:
+        record = _records.get(key)
+        if record is not None:
+            _records.move_to_end(key)
+            metrics.cache_requests.inc(cache='event_record', result='hit')
+            return record
+
+    metrics.cache_requests.inc(cache='event_record', result='miss')
+    record = EventRecord(event)
+    with _records_lock:
+        _records[key] = record
+        while len(_records) > EVENT_RECORD_CACHE_SIZE:
+            _records.popitem(last=False)
+    return record
+
+
+class AgendaSnapshot:
+    """
+    События пользователя на сегодня и завтра (по локальным суткам TIMEZONE)
+    плюс первая встреча после момента снимка.
+
+    Снимок строится одним чтением календаря, а /today, /tomorrow, /now и /next
+    делят его на части локально.
+    """
+
+    __slots__ = ('day_start', 'day_end', 'window_end', 'taken_at', 'events', 'following')
+
+    def __init__(self, today, tomorrow, events, following, taken_at):
+        self.day_start, self.day_end = today
+        self.window_end = tomorrow[1]
+        self.taken_at = taken_at
+        # (начало, конец, событие) по возрастанию начала
+        rows = []
+        for event in events:
+            record = get_event_record(event)
+            if record.start is not None and record.end is not None:
+                rows.append((record.start, record.end, event))
+        rows.sort(key=lambda row: row[0])
+        self.events = rows
+        self.following = following  # Ближайшая не начавшаяся встреча на момент снимка (или None)
+
+    def _between(self, time_min, time_max):
+        return [event for start, end, event in self.events if end > time_min and start < time_max]
+
+    def today(self):
+        return self._between(self.day_start, self.day_end)
+
+    def tomorrow(self):
+        return self._between(self.day_end, self.window_end)
+
+    def current(self, now):
+        """Встреча, которая идёт прямо сейчас (только события со временем)."""
+        for start, end, event in self.events:
+            if 'dateTime' in event['start'] and start <= now <= end:
+                return event
+        return None
+
+    def next(self, now):
+        """Ближайшая встреча, которая ещё не началась (только события со временем)."""
+        for start, end, event in self.events:
+            if 'dateTime' in event['start'] and start > now:
+                return event
+        following = self.following
+        if following is not None and get_event_record(following).start > now:
+            return following
+        return None
+
+    def covers(self, now):
+        """
+        Снимок годится для ответа в момент now: сутки не сменились
+        и ближайшая встреча за пределами окна ещё не началась.
+        """
+        if not self.day_start <= now < self.day_end:
+            return False
+        return self.following is None or get_event_record(self.following).start > now
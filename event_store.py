@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import EVENT_STORE_LOOKBACK_DAYS, EVENT_STORE_WINDOW_DAYS
+from event_model import get_event_record
+
+logger = logging.getLogger(__name__)
+
+
+class EventStore:
+    """
+    Локальная копия событий одного пользователя.
+
+    Первый вызов async_sync() загружает события окна на EVENT_STORE_WINDOW_DAYS дней
+    вперёд, дальше запрашиваются только изменения по nextSyncToken. Когда от окна
+    остаётся меньше половины, синхронизация снова выполняется полностью: повторяющееся
+    событие без даты окончания не разворачивается в тысячи экземпляров.
+    Все функции чтения отвечают из памяти.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.sync_token = None
+        self.synced_at = None
+        self._events = {}  # id события -> событие
+        self._sorted = None  # Кэш отсортированного списка (время начала, время окончания, событие)
+        self._lock = threading.RLock()
+        self._async_lock = asyncio.Lock()  # Для асинхронного клиента (async_calendar)
+        self.dirty = True  # Google сообщил об изменениях (push-уведомление)
+        self.watched_until = 0  # До какого момента действует канал events.watch
+        self.window_end = None  # Граница окна (timeMax) последней полной синхронизации
+
+    def reset(self):
+        """Сбрасывает хранилище, следующая синхронизация будет полной."""
+        with self._lock:
+            self.sync_token = None
+            self.synced_at = None
+            self.window_end = None
+            self.dirty = True
+            self._events = {}
+            self._sorted = None
+
+    def mark_dirty(self):
+        """Помечает хранилище устаревшим (пришло push-уведомление об изменениях)."""
+        self.dirty = True
+
+    def watch(self, expires_at):
+        """Отмечает, что изменения календаря приходят через push-канал до expires_at."""
+        self.watched_until = expires_at
+
+    def unwatch(self):
+        self.watched_until = 0
+
+    def needs_sync(self):
+        """
+        Нужно ли обращаться к Google.
+        Без push-канала синхронизируемся всегда, с каналом — только после уведомления.
+        """
+        return (self.sync_token is None or self.dirty or time.time() >= self.watched_until
+                or self._window_expiring())
+
+    def _window_expiring(self):
+        """От окна полной синхронизации осталось меньше половины."""
+        if self.window_end is None:
+            return False
+        return datetime.now(timezone.utc) >= self.window_end - timedelta(days=EVENT_STORE_WINDOW_DAYS / 2)
+
+    def request_params(self):
+        """Параметры events().list для следующей синхронизации."""
+        params = {
+            'calendarId': 'primary',
+            'singleEvents': True,
+            'maxResults': 2500,
+        }
+        if self.sync_token:
+            params['syncToken'] = self.sync_token
+        else:
+            now = datetime.now(timezone.utc)
+            self.window_end = now + timedelta(days=EVENT_STORE_WINDOW_DAYS)
+            params['timeMin'] = (now - timedelta(days=EVENT_STORE_LOOKBACK_DAYS)).isoformat()
+            params['timeMax'] = self.window_end.isoformat()
+        return params
+
+    def apply(self, items, next_sync_token, full):
+        """
+        Применяет загруженные события.
+        При полной синхронизации содержимое заменяется целиком, иначе применяется дельта.
+        """
+        with self._lock:
+            events = {} if full else self._events
+            for item in items:
+                if item.get('status') == 'cancelled':
+                    events.pop(item['id'], None)
+                else:
+                    events[item['id']] = item
+            self._events = events
+            self.sync_token = next_sync_token
+            self.synced_at = datetime.now(timezone.utc)
+            self._sorted = None
+            self._prune()
+
+    def _prune(self):
+        """
+        Удаляет давно закончившиеся события и события за окном синхронизации
+        (их приносят изменения по syncToken), чтобы хранилище не росло бесконечно.
+        """
+        border = datetime.now(timezone.utc) - timedelta(days=EVENT_STORE_LOOKBACK_DAYS)
+        for event_id, event in list(self._events.items()):
+            record = get_event_record(event)
+            if record.end is not None and record.end < border:
+                del self._events[event_id]
+            elif self.window_end is not None and record.start is not None and record.start >= self.window_end:
+                del self._events[event_id]
+
+    async def async_sync(self, fetch):
+        """
+        Синхронизирует хранилище с Google Calendar через async_calendar.
+        fetch(params) — корутина, возвращающая ответ events.list.
+        При ответе 410 GONE (устаревший syncToken) выполняется полная синхронизация.
+        """
+        async with self._async_lock:
+            if self._window_expiring():
+                self.reset()  # Окно сдвигаем полной синхронизацией
+            try:
+                await self._async_sync(fetch)
+            except Exception as error:
+                if getattr(error, 'status', None) != 410:
+                    raise
+                logger.info(f"syncToken пользователя {self.user_id} устарел, выполняем полную синхронизацию")
+                self.reset()
+                await self._async_sync(fetch)
+
+    async def _async_sync(self, fetch):
+        full = self.sync_token is None
+        # Сбрасываем флаг до запроса: уведомление, пришедшее во время синхронизации, не потеряется
+        self.dirty = False
+        params = self.request_params()
+        items = []
+        try:
+            while True:
+                response = await fetch(params)
+                items.extend(response.get('items', []))
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+                params['pageToken'] = page_token
+        except BaseException:
+            # Изменения так и не получены: следующая проверка должна повторить синхронизацию
+            self.dirty = True
+            raise
+        self.apply(items, response.get('nextSyncToken'), full)
+
+    def _sorted_events(self):
+        with self._lock:
+            if self._sorted is None:
+                rows = []
+                for event in self._events.values():
+                    record = get_event_record(event)
+                    if record.start is not None and record.end is not None:
+                        rows.append((record.start, record.end, event))
+                rows.sort(key=lambda row: row[0])
+                self._sorted = rows
+            return self._sorted
+
+    def between(self, time_min, time_max):
+        """События, пересекающие интервал [time_min, time_max), по возрастанию времени начала."""
+        return [event for start, end, event in self._sorted_events() if end > time_min and start < time_max]
+
+    def upcoming(self, now, limit=10):
+        """Ещё не закончившиеся события (как events().list с timeMin=now)."""
+        result = []
+        for start, end, event in self._sorted_events():
+            if end > now:
+                result.append(event)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def current(self, now):
+        """Встреча, которая идёт прямо сейчас (только события со временем)."""
+        for start, end, event in self._sorted_events():
+            if 'dateTime' in event['start'] and start <= now <= end:
+                return event
+        return None
+
+    def next(self, now):
+        """Ближайшая встреча, которая ещё не началась (только события со временем)."""
+        for start, end, event in self._sorted_events():
+            if 'dateTime' in event['start'] and start > now:
+                return event
+        return None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_event_store(user_id):
+    """Возвращает хранилище событий пользователя, создавая его при необходимости."""
+    with _stores_lock:
+        store = _stores.get(user_id)
+        if store is None:
+            store = _stores[user_id] = EventStore(user_id)
+        return store
+
+
+def drop_event_store(user_id):
+    """Удаляет хранилище пользователя (после выхода или повторной авторизации)."""
+    with _stores_lock:
+        _stores.pop(user_id, None)
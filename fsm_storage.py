@@ -0,0 +1,103 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import FSM_STORAGE, FSM_DB
+
+logger = logging.getLogger(__name__)
+
+
+def _storage_key(key):
+    """Строковый ключ записи: бот, чат, пользователь, тема и бизнес-подключение."""
+    return ':'.join(
+        str(part) for part in (
+            key.bot_id,
+            key.chat_id,
+            key.user_id,
+            key.thread_id or '',
+            key.business_connection_id or '',
+            key.destiny,
+        )
+    )
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в SQLite (режим WAL).
+
+    Состояние и данные (JSON) переживают перезапуск и видны всем процессам бота,
+    работающим с одним файлом базы. Запросы выполняются в отдельном потоке,
+    чтобы не блокировать цикл событий.
+    """
+
+    def __init__(self, path=FSM_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            " key TEXT PRIMARY KEY,"
+            " state TEXT,"
+            " data TEXT NOT NULL DEFAULT '{}')"
+        )
+
+    def _execute(self, query, params=()):
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()
+
+    async def set_state(self, key, state=None):
+        if isinstance(state, State):
+            state = state.state
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO fsm (key, state) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET state = excluded.state",
+            (_storage_key(key), state),
+        )
+
+    async def get_state(self, key):
+        row = await asyncio.to_thread(self._execute, "SELECT state FROM fsm WHERE key = ?", (_storage_key(key),))
+        return row[0] if row else None
+
+    async def set_data(self, key, data):
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO fsm (key, data) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET data = excluded.data",
+            (_storage_key(key), json.dumps(dict(data), ensure_ascii=False)),
+        )
+
+    async def get_data(self, key):
+        row = await asyncio.to_thread(self._execute, "SELECT data FROM fsm WHERE key = ?", (_storage_key(key),))
+        return json.loads(row[0]) if row else {}
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_storage(backend=FSM_STORAGE):
+    """
+    Создает хранилище FSM по настройке FSM_STORAGE:
+    'memory' — в памяти процесса, 'sqlite' — файл FSM_DB,
+    redis://... — Redis (нужен пакет redis).
+    """
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'sqlite':
+        return SQLiteStorage()
+    if backend.startswith(('redis://', 'rediss://', 'unix://')):
+        # Импорт здесь: пакет redis нужен только для этого варианта
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError as e:
+            raise RuntimeError(f"Для FSM_STORAGE={backend} установите пакет redis: pip install redis") from e
+        return RedisStorage.from_url(backend)
+    raise ValueError(f"Неизвестное хранилище FSM: {backend}")
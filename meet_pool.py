@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+import async_calendar
+import metrics
+from config import MEET_POOL_SIZE, MEET_POOL_TTL_HOURS, MEET_POOL_USERS
+from credential_store import credential_store
+
+logger = logging.getLogger(__name__)
+
+
+class MeetPool:
+    """
+    Заранее созданные ссылки Google Meet для /generate_meet_link.
+
+    Создание ссылки — два запроса к Google (вставка события с conferenceData и его
+    удаление), поэтому у пользователя, однажды запросившего ссылку, в фоне
+    держится до MEET_POOL_SIZE готовых ссылок. Пул заполняется сразу после входа
+    и после каждой выдачи ссылки, ссылки старше MEET_POOL_TTL_HOURS не выдаются.
+    Пул живёт в памяти: после перезапуска первая ссылка пользователя создаётся сразу,
+    а не заранее для всех пользователей (это MEET_POOL_SIZE пар запросов на каждого).
+
+    Вставка и удаление служебного события вызывают push-уведомление. Отличить его
+    от настоящего изменения нельзя (Google не сообщает, что изменилось), поэтому
+    каждое пополнение стоит одной инкрементальной синхронизации (syncToken,
+    уведомления одного пользователя склеиваются) и сброса кэша команд пользователя.
+    """
+
+    def __init__(self, size=MEET_POOL_SIZE, ttl=MEET_POOL_TTL_HOURS * 3600, users=MEET_POOL_USERS):
+        self._size = size
+        self._ttl = ttl
+        self._users = users
+        self._links = OrderedDict()  # user_id -> deque[(время создания, ссылка)], вытеснение по LRU
+        self._filling = {}  # user_id -> задача пополнения
+        self._loop = None
+
+    def start(self):
+        """Подписывается на удаление учетных данных: ссылки чужого аккаунта не выдаём."""
+        self._loop = asyncio.get_running_loop()
+        credential_store.add_listener(self._on_credentials_changed)
+
+    def _on_credentials_changed(self, user_id, expiry):
+        """Подписчик хранилища: может вызываться из других потоков."""
+        if expiry is None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self.drop, user_id)
+
+    def drop(self, user_id):
+        """Забывает ссылки пользователя (после выхода или повторной авторизации)."""
+        self._links.pop(user_id, None)
+        task = self._filling.pop(user_id, None)
+        if task is not None:
+            task.cancel()
+
+    def _pool(self, user_id):
+        pool = self._links.get(user_id)
+        if pool is None:
+            pool = self._links[user_id] = deque()
+            while len(self._links) > self._users:
+                evicted, _ = self._links.popitem(last=False)
+                self.drop(evicted)
+        self._links.move_to_end(user_id)
+        return pool
+
+    def _take_ready(self, user_id):
+        pool = self._pool(user_id)
+        deadline = time.time() - self._ttl
+        while pool:
+            created_at, link = pool.popleft()
+            if created_at > deadline:
+                return link
+        return None
+
+    def fill(self, user_id):
+        """Запускает фоновое пополнение, если оно ещё не идёт."""
+        if user_id in self._filling or self._size <= 0:
+            return
+        self._filling[user_id] = asyncio.create_task(self._fill(user_id))
+
+    async def _fill(self, user_id):
+        try:
+            pool = self._pool(user_id)
+            while len(pool) < self._size and self._links.get(user_id) is pool:
+                link = await async_calendar.generate_google_meet_link(user_id)
+                if not link.startswith('https://'):
+                    break  # Google не создал конференцию (например, Meet отключён в аккаунте)
+                pool.append((time.time(), link))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Повторим при следующей выдаче ссылки
+            logger.warning(f"Не удалось пополнить ссылки Meet пользователя {user_id}: {str(e)}")
+        finally:
+            if self._filling.get(user_id) is asyncio.current_task():
+                del self._filling[user_id]
+
+    async def take(self, user_id):
+        """
+        Возвращает готовую ссылку из пула и запускает пополнение.
+        Если пул пуст (первый запрос или ссылки истекли), ссылка создаётся сразу.
+        """
+        link = self._take_ready(user_id)
+        metrics.cache_requests.inc(cache='meet_pool', result='miss' if link is None else 'hit')
+        if link is None:
+            link = await async_calendar.generate_google_meet_link(user_id)
+        self.fill(user_id)
+        return link
+
+
+# Общий пул процесса
+meet_pool = MeetPool()
@@ -0,0 +1,47 @@
+import re
+
+# Все поддерживаемые сервисы одним выражением: текст просматривается один раз,
+# а общий префикс https?:// позволяет движку быстро пропускать обычный текст
+_MEETING_LINK_PATTERN = re.compile(
+    r"https?://(?:"
+    r"meet\.google\.com/[a-zA-Z0-9\-]+"                                  # Google Meet
+    r"|[a-zA-Z0-9\-.]*zoom\.us/[a-zA-Z0-9\-/?=&.%_]+"                    # Zoom
+    r"|teams\.microsoft\.com/l/meetup-join/[a-zA-Z0-9\-/?=&.%_~@:]+"     # Microsoft Teams
+    r"|teams\.live\.com/meet/[0-9]+"                                     # Teams (личные)
+    r"|[a-zA-Z0-9\-]+\.webex\.com/[a-zA-Z0-9\-/?=&.%_]+"                 # Webex
+    r"|meet\.jit\.si/[a-zA-Z0-9\-_%]+"                                   # Jitsi
+    r"|telemost\.(?:360\.)?yandex\.(?:ru|com)/j/[0-9]+"                  # Яндекс Телемост
+    r")"
+)
+
+# Символы, которые часто прилипают к ссылке в конце предложения
+_TRAILING = '.,;:!?'
+
+def find_meeting_link(text):
+    """
+    Ищет первую ссылку на видеозвонок в тексте (один проход по тексту).
+    """
+    if not text:
+        return None
+    match = _MEETING_LINK_PATTERN.search(text)
+    return match.group(0).rstrip(_TRAILING) if match else None
+
+def _conference_link(event):
+    """Ссылка на видеозвонок из conferenceData.entryPoints."""
+    for entry_point in event.get('conferenceData', {}).get('entryPoints', ()):
+        if entry_point.get('entryPointType') == 'video' and entry_point.get('uri'):
+            return entry_point['uri']
+    return None
+
+def get_meeting_link(event):
+    """
+    Ссылка на видеозвонок события: из описания или места проведения (их заполняет
+    пользователь), затем из conferenceData или hangoutLink.
+    Результат запоминается вместе с записью события (event_model.get_event_record).
+    """
+    return (
+        find_meeting_link(event.get('description'))
+        or find_meeting_link(event.get('location'))
+        or _conference_link(event)
+        or event.get('hangoutLink')
+    )
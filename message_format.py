@@ -1,130 +1,114 @@
-import re
-from datetime import datetime, timedelta, timezone
-import pytz
+from datetime import datetime, timedelta
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-import base64
-import logging
 
-TIMEZONE = pytz.timezone('Europe/Moscow')
+from config import TIMEZONE
+from event_model import get_event_record
 
-import re
+# Символы, которые Telegram требует экранировать в MarkdownV2 (включая саму '\')
+_MARKDOWN_SPECIAL = '\\_*[]()~`>#+-=|{}.!'
+_ESCAPE_TABLE = str.maketrans({char: '\\' + char for char in _MARKDOWN_SPECIAL})
 
-def escape_markdown(text):
-    # Символы, которые требуют экранирования в Markdown (по спецификации Telegram)
-    escape_chars = r'_*[]()~`>#+-=|{}!'
-    
-    # Экранируем только если символ еще не экранирован
-    text = re.sub(r'(?<!\\)([{}])'.format(re.escape(escape_chars)), r'\\\1', text)
-
-    # Отдельно экранируем `.`, так как Telegram ожидает `\.` для корректного рендеринга
-    text = re.sub(r'(?<!\\)\.', r'\\.', text)
-
-    return text
+# Внутри (...) ссылки экранируются только ')' и '\'
+_URL_ESCAPE_TABLE = str.maketrans({')': '\\)', '\\': '\\\\'})
 
-def find_meeting_link(text: str) -> str:
+def escape_markdown(text):
+    """Экранирует текст для MarkdownV2 за один проход (str.translate)."""
+    return str(text).translate(_ESCAPE_TABLE)
+
+def escape_url(url):
+    """Экранирует адрес для части (...) inline-ссылки."""
+    return str(url).translate(_URL_ESCAPE_TABLE)
+
+# Шаблоны сообщений. Постоянные части уже экранированы, поля подставляются
+# экранированными ровно один раз (см. event_model.EventRecord и format_event_draft).
+EVENT_TEMPLATE = (
+    "🗓 {start} \\- {end} \\| *[{summary}]({link})*\n\n"
+    "📍 Место: {location}\n"
+    "👨‍💻 Участники: {attendees}\n"
+    "📝 Описание: {description}\n"
+)
+
+REMINDER_TEMPLATE = (
+    "⏰ Напоминание\\!\nВаша встреча *{summary}* начинается через {minutes} минут\\!\n"
+    + EVENT_TEMPLATE
+)
+
+DRAFT_TEMPLATE = (
+    "📌 *Название:* {title}\n\n"
+    "📅 *Дата:* {date}\n"
+    "⌚ *Время:* {time_range}\n"
+    "📝 *Описание:* {description}\n"
+)
+
+EVENT_SUMMARY_TEMPLATE = DRAFT_TEMPLATE + "\nСоздать ссылку на Google Meet?"
+
+EVENT_CONFIRMATION_TEMPLATE = (
+    DRAFT_TEMPLATE
+    + "🔗 *Google Meet:* {meet_status}\n\n"
+    "Подтверждаете создание события?"
+)
+
+def _event_fields(event):
     """
-    Searches for Google Meet, Zoom, or Microsoft Teams links in the provided text.
+    Поля события для шаблонов. Всё, кроме времени начала, берётся готовым
+    из записи события; зависит от текущей даты только формат начала.
     """
-    if not text:
-        return None
-
-    # Define patterns for Google Meet, Zoom, and Microsoft Teams
-    meet_pattern = r"https?://meet\.google\.com/[a-zA-Z0-9\-]+"
-    zoom_pattern = r"https?://[a-z0-9\-\.]*zoom\.us/[a-zA-Z0-9\-/?=&]+"
-    teams_pattern = r"https?://teams\.microsoft\.com/l/meetup-join/[0-9a-zA-Z\-]+"
-
-    # Search for links in the text
-    for pattern in [meet_pattern, zoom_pattern, teams_pattern]:
-        match = re.search(pattern, text)
-        if match:
-            return match.group(0)
-
+    record = get_event_record(event)
+    if record.start is None:
+        start = "Время не указано"
+    elif record.start.date() == datetime.now(TIMEZONE).date():
+        start = record.start.strftime("%H:%M")
+    else:
+        start = record.start.strftime("%d\\.%m\\.%Y %H:%M")
+
+    return {
+        'start': start,
+        'end': record.end.strftime("%H:%M") if record.end else "",
+        'summary': record.summary,
+        'link': record.event_link,
+        'location': record.location,
+        'attendees': record.attendees,
+        'description': record.description,
+    }
+
+def get_call_keyboard(event):
+    """Кнопка «Перейти к звонку», если у события есть ссылка на звонок."""
+    video_call_link = get_event_record(event).meeting_link
+    if video_call_link:
+        button = InlineKeyboardButton(text="Перейти к звонку", url=video_call_link.strip())
+        return InlineKeyboardMarkup(inline_keyboard=[[button]])
     return None
 
-def get_video_call_link(event: dict) -> str:
-    """
-    Tries to find a video call link from event's description or event's hangoutLink.
-    """
-    description_text = event.get('description', '')  # Забираем описание
-    video_call_link = find_meeting_link(description_text) or event.get('hangoutLink')
-    return video_call_link or "Ссылка на звонок не найдена"
-
 def format_event(event):
     """
     Форматирует событие в читаемый текст с использованием MarkdownV2.
     """
-    summary = event.get('summary', 'Без названия')  # Наименование встречи
-    start = event['start'].get('dateTime', event['start'].get('date'))  # Время начала
-    end = event['end'].get('dateTime', event['end'].get('date'))  # Время окончания
-    location = event.get('location', 'Локация не указана')  # Локация встречи
-    attendees = event.get('attendees', [])  # Участники
-    conference_data = event.get('conferenceData', {})  # Данные о звонке
-    description = escape_markdown(event.get('description', 'без описания')[:150])  # Truncate description
-    video_call_link = get_video_call_link(event)
-
-    #забираем номер события из календаря
-    event_id = event['id']
-    calendar_id = "primary"  # Replace with the actual calendar ID if available
-    encoded_event_id = base64.urlsafe_b64encode(f"{event_id} {calendar_id}".encode()).decode()
-
-    # Build the calendar event link
-    calendar_event_link = f"https://calendar.google.com/calendar/event?eid={encoded_event_id}"
-
-    # Получаем текущую дату и время
-    now = datetime.now(timezone.utc)
-    tomorrow = now + timedelta(days=1)
-    tomorrow_start = tomorrow.replace(hour=0, minute=0, second=0, microsecond=0)  # Начало завтрашнего дня
-
-    # Экранируем текст для Markdown
-    summary = escape_markdown(summary)
-    location = escape_markdown(location)
-
-    # Форматирование времени с учётом временной зоны
-    if start:
-        # Конвертируем время начала из UTC в нужную временную зону
-        start_time = datetime.fromisoformat(start).astimezone(pytz.utc)  # Приводим к UTC
-        start_time = start_time.astimezone(TIMEZONE)  # Преобразуем в локальную временную зону
-        today = datetime.now(TIMEZONE).date()
-        start_time_str = (
-            start_time.strftime("%H:%M") if start_time.date() == today 
-            else start_time.strftime("%d.%m.%Y %H:%M")
-        )
-        start_time_str = escape_markdown(start_time_str)
-    else:
-        start_time_str = "Время не указано"
-
-    if end:
-        end_time = datetime.fromisoformat(end).astimezone(pytz.utc)  # Приводим к UTC
-        end_time = end_time.astimezone(TIMEZONE)  # Преобразуем в локальную временную зону
-        end_time_str = end_time.strftime("%H:%M")
-        end_time_str = escape_markdown(end_time_str)
-    else:
-        end_time_str = ""
+    return EVENT_TEMPLATE.format_map(_event_fields(event)), get_call_keyboard(event)
 
-    # Форматирование списка участников
-    attendees_list = [a.get('email', 'Неизвестный участник') for a in attendees]
-    attendees_str = ", ".join([f"{a}" for a in attendees_list]) if attendees_list else "Участники не указаны"
-
-    # Ограничиваем длину списка участников до 150 символов
-    if len(attendees_str) > 150:
-        attendees_str = attendees_str[:150] + "..."  # Обрезаем и добавляем троеточие
-
-    attendees_str = escape_markdown(attendees_str)
+def format_reminder(event, minutes_before):
+    """
+    Текст напоминания о событии (MarkdownV2) и кнопка звонка.
+    """
+    fields = _event_fields(event)
+    fields['minutes'] = minutes_before
+    return REMINDER_TEMPLATE.format_map(fields), get_call_keyboard(event)
 
-    # Сборка форматированного сообщения
-    formatted_message = (
-        f"🗓 {start_time_str} \\- {end_time_str} \\| "
-        f"*[{summary}]({calendar_event_link})*\n\n"
-        f"📍 Место: {location}\n"
-        f"👨‍💻 Участники: {attendees_str}\n"
-        f"📝 Описание: {description}\n"
+def format_event_draft(data, template=EVENT_SUMMARY_TEMPLATE):
+    """
+    Сводка создаваемого события по данным FSM (EVENT_SUMMARY_TEMPLATE
+    или EVENT_CONFIRMATION_TEMPLATE).
+    """
+    # Формируем время окончания
+    time_str = data['time']
+    if ':' not in time_str:
+        time_str += ':00'
+    start_datetime = datetime.strptime(f"{data['date']} {time_str}", "%d.%m.%Y %H:%M")
+    end_datetime = start_datetime + timedelta(hours=float(data['duration']))
+
+    return template.format(
+        title=escape_markdown(data.get('title', 'не указано')),
+        date=escape_markdown(data.get('date', 'не указана')),
+        time_range=escape_markdown(f"{time_str} - {end_datetime.strftime('%H:%M')}"),
+        description=escape_markdown(data.get('description', 'нет описания')),
+        meet_status="Да" if data.get('create_meet_link', False) else "Нет",
     )
-
-    # Создание клавиатуры
-    keyboard = None
-    if video_call_link and video_call_link != "Ссылка на звонок не найдена":
-        button = InlineKeyboardButton(text="Перейти к звонку", url=video_call_link.strip())
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[[button]])
-
-    # Возвращаем сообщение и клавиатуру
-    return formatted_message, keyboard
\ No newline at end of file
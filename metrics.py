@@ -0,0 +1,253 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+from config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT, METRICS_PATH
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Границы для длительности проверки событий (секунды)
+SWEEP_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}  # значения меток -> значение
+        self._lock = threading.Lock()  # Кэш записей событий обновляется и из потоков
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+
+class Counter(_Metric):
+    """Монотонный счётчик."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Текущее значение; можно задать функцию, которая читается при каждом запросе метрик."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), function=None):
+        super().__init__(name, documentation, labels)
+        self._function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными корзинами (как в prometheus_client)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def _samples(self):
+        lines = []
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, key, (('le', _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Метрики процесса."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=(), function=None):
+        return self._register(Gauge(name, documentation, labels, function))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Общий реестр процесса
+registry = Registry()
+
+# ===== Метрики ===== #
+
+handler_seconds = registry.histogram(
+    'schedio_handler_seconds', 'Время обработки апдейта обработчиком aiogram', ('kind', 'handler'))
+handler_errors = registry.counter(
+    'schedio_handler_errors_total', 'Исключения, вышедшие из обработчиков aiogram', ('kind', 'handler'))
+
+google_api_seconds = registry.histogram(
+    'schedio_google_api_seconds', 'Задержка запросов к Google API', ('method',))
+google_api_requests = registry.counter(
+    'schedio_google_api_requests_total', 'Запросы к Google API по методу и HTTP-статусу', ('method', 'status'))
+calendar_operation_seconds = registry.histogram(
+    'schedio_calendar_operation_seconds', 'Задержка операций calendar_facade', ('operation',))
+
+sweep_seconds = registry.histogram(
+    'schedio_sweep_seconds', 'Длительность проверки событий (sweep)', buckets=SWEEP_BUCKETS)
+sweep_users = registry.gauge(
+    'schedio_sweep_users', 'Пользователей в последней проверке событий')
+sweep_failures = registry.counter(
+    'schedio_sweep_failures_total', 'Проверки событий, завершившиеся ошибкой')
+
+telegram_send_seconds = registry.histogram(
+    'schedio_telegram_send_seconds', 'Время вызова Telegram API с учётом ожидания в очереди', ('method',))
+telegram_retry_after = registry.counter(
+    'schedio_telegram_retry_after_total', 'Ответы Telegram 429 (retry_after)')
+
+cache_requests = registry.counter(
+    'schedio_cache_requests_total', 'Обращения к кэшам: hit, stale или miss', ('cache', 'result'))
+
+
+def time_google_api(method, started, status):
+    """Запоминает задержку и статус запроса к Google API (started — time.perf_counter())."""
+    google_api_seconds.observe(time.perf_counter() - started, method=method)
+    google_api_requests.inc(method=method, status=status)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Замер времени обработчиков. Подключается как внутренний middleware
+    (router.message.middleware), поэтому известен выбранный обработчик.
+    """
+
+    def __init__(self, kind):
+        self._kind = kind
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get('handler')
+        name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(kind=self._kind, handler=name)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, kind=self._kind, handler=name)
+
+
+def install(router):
+    """Подключает замер обработчиков сообщений и callback-кнопок роутера."""
+    router.message.middleware(HandlerMetricsMiddleware('message'))
+    router.callback_query.middleware(HandlerMetricsMiddleware('callback'))
+
+
+async def _metrics_view(request):
+    return web.Response(body=registry.render().encode(), headers={
+        'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+        'Cache-Control': 'no-cache',
+    })
+
+
+async def start(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Поднимает HTTP-сервер метрик (по умолчанию только на localhost).
+    Возвращает AppRunner или None, если метрики выключены или порт занят.
+    """
+    if not METRICS_ENABLED:
+        return None
+    app = web.Application()
+    app.router.add_get(METRICS_PATH, _metrics_view)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.warning(f"Не удалось запустить сервер метрик на {host}:{port}: {str(e)}")
+        await runner.cleanup()
+        return None
+    logger.info(f"Метрики доступны на http://{host}:{port}{METRICS_PATH}")
+    return runner
@@ -0,0 +1,76 @@
+import logging
+import sqlite3
+import threading
+import time
+
+from config import LEDGER_DB, LEDGER_RETENTION_HOURS
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderLedger:
+    """
+    Журнал отправленных напоминаний.
+
+    Ключ — (user_id, event_id, время начала, смещение). Проверка выполняется
+    по множеству в памяти за O(1), а запись сохраняется в SQLite до отправки,
+    поэтому перекрывающиеся проверки и перезапуски не дублируют напоминания.
+    Если отправка не удалась, запись снимается через release().
+    Записи о давно прошедших событиях удаляются автоматически.
+    """
+
+    def __init__(self, path=LEDGER_DB):
+        self._lock = threading.Lock()
+        self._keys = set()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sent_reminders ("
+            " user_id INTEGER NOT NULL,"
+            " event_id TEXT NOT NULL,"
+            " start_ts INTEGER NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " PRIMARY KEY (user_id, event_id, start_ts, offset)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sent_reminders_start ON sent_reminders (start_ts)")
+        self.expire()
+        self._keys = set(self._conn.execute("SELECT user_id, event_id, start_ts, offset FROM sent_reminders"))
+
+    def seen(self, key):
+        """Было ли напоминание уже отправлено."""
+        return key in self._keys
+
+    def claim(self, key):
+        """
+        Отмечает напоминание как отправленное.
+        Возвращает False, если его уже кто-то отправил.
+        """
+        with self._lock:
+            if key in self._keys:
+                return False
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO sent_reminders (user_id, event_id, start_ts, offset) VALUES (?, ?, ?, ?)",
+                key,
+            )
+            self._keys.add(key)
+            return cursor.rowcount > 0
+
+    def release(self, key):
+        """Снимает отметку с напоминания, которое так и не удалось отправить."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sent_reminders WHERE user_id = ? AND event_id = ? AND start_ts = ? AND offset = ?",
+                key,
+            )
+            self._keys.discard(key)
+
+    def expire(self):
+        """Удаляет записи о событиях, начавшихся раньше LEDGER_RETENTION_HOURS назад."""
+        border = int(time.time() - LEDGER_RETENTION_HOURS * 3600)
+        with self._lock:
+            self._conn.execute("DELETE FROM sent_reminders WHERE start_ts < ?", (border,))
+            self._keys = {key for key in self._keys if key[2] >= border}
+
+
+# Общий журнал процесса
+reminder_ledger = ReminderLedger()
@@ -0,0 +1,231 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from config import REMINDER_HORIZON_MINUTES, REMINDER_GRACE_SECONDS, REMINDER_RETRY_SECONDS
+from event_model import get_event_record
+from reminder_ledger import reminder_ledger
+from reminders import deliver_reminder
+from sweep_trace import span, tracer
+
+logger = logging.getLogger(__name__)
+
+
+def _fingerprint(events, offsets):
+    """
+    Отпечаток набора событий пользователя: меняется только при изменении
+    событий (id, время начала, дата обновления) или настроек напоминаний.
+    """
+    return (
+        frozenset(
+            (event['id'], event['start'].get('dateTime', event['start'].get('date')), event.get('updated'))
+            for event in events
+        ),
+        frozenset(offsets),
+    )
+
+
+class ReminderScheduler:
+    """
+    Планировщик напоминаний на min-heap.
+
+    Время срабатывания для каждой пары (пользователь, событие, смещение)
+    вычисляется один раз, когда событие попадает в горизонт планирования.
+    Планировщик спит до ближайшего дедлайна, а не опрашивает Google каждую минуту.
+    """
+
+    def __init__(self):
+        self._bot = None
+        self._heap = []  # (время срабатывания, порядковый номер, ключ)
+        self._entries = {}  # ключ -> (время срабатывания, событие, смещение)
+        self._user_keys = {}  # user_id -> множество ключей пользователя
+        self._fingerprints = {}  # user_id -> отпечаток последнего плана
+        self._replan_at = {}  # user_id -> когда ближайшее напоминание за горизонтом войдёт в горизонт
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._deliveries = set()  # Задачи отправки: храним ссылки, иначе их может собрать сборщик мусора
+        self._owns = None  # Проверка владения пользователем в режиме нескольких процессов
+
+    def start(self, bot, owns=None):
+        """
+        Запускает фоновую задачу отправки напоминаний.
+        owns(user_id) — если задана, напоминания отправляются только своим пользователям.
+        """
+        self._bot = bot
+        self._owns = owns
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        """Останавливает фоновую задачу."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def plan(self, user_id, events, offsets):
+        """
+        Перепланирует напоминания пользователя.
+        Если события и настройки не изменились и ни одно напоминание
+        не вошло в горизонт планирования, ничего не делает и возвращает False.
+        """
+        now = time.time()
+        fingerprint = _fingerprint(events, offsets)
+        if self._fingerprints.get(user_id) == fingerprint and now < self._replan_at.get(user_id, float('inf')):
+            return False
+        self._fingerprints[user_id] = fingerprint
+        self._replan_at.pop(user_id, None)
+
+        # Старые записи пользователя удаляем из индекса, в куче они станут "мёртвыми"
+        for key in self._user_keys.pop(user_id, ()):
+            self._entries.pop(key, None)
+
+        horizon_seconds = REMINDER_HORIZON_MINUTES * 60
+        horizon = now + horizon_seconds
+        beyond = None  # Ближайшее время срабатывания за горизонтом
+        # Смещения в секундах считаем один раз, а не для каждого события
+        offset_seconds = [(offset, offset * 60) for offset in offsets]
+        keys = set()
+        for event in events:
+            event_start = get_event_record(event).start
+            if event_start is None:
+                logger.warning(f"Не удалось разобрать время события {event.get('id')}")
+                continue
+
+            # Все смещения пользователя проверяются за один проход по событию
+            start_ts = int(event_start.timestamp())
+            for offset, seconds in offset_seconds:
+                fire_at = start_ts - seconds
+                # Событие ещё не в горизонте: перепланируем, когда оно туда войдёт
+                if fire_at > horizon:
+                    beyond = fire_at if beyond is None else min(beyond, fire_at)
+                    continue
+                # Напоминание уже безнадёжно опоздало
+                if fire_at < now - REMINDER_GRACE_SECONDS:
+                    continue
+
+                key = (user_id, event['id'], start_ts, offset)
+                if reminder_ledger.seen(key):
+                    continue  # Уже отправлено (в том числе до перезапуска)
+                self._entries[key] = (fire_at, event, offset)
+                heapq.heappush(self._heap, (fire_at, next(self._counter), key))
+                keys.add(key)
+
+        if keys:
+            self._user_keys[user_id] = keys
+        if beyond is not None:
+            self._replan_at[user_id] = beyond - horizon_seconds
+        self._wakeup.set()
+        logger.debug(f"Пользователь {user_id}: запланировано напоминаний: {len(keys)}")
+        return True
+
+    def forget(self, user_id):
+        """Удаляет все запланированные напоминания пользователя (например, после /logout)."""
+        self._fingerprints.pop(user_id, None)
+        self._replan_at.pop(user_id, None)
+        for key in self._user_keys.pop(user_id, ()):
+            self._entries.pop(key, None)
+
+    def users(self):
+        """Пользователи, чьи события уже спланированы."""
+        return list(self._fingerprints)
+
+    def invalidate(self, user_id):
+        """Сбрасывает отпечаток, чтобы следующее обновление перепланировало пользователя."""
+        self._fingerprints.pop(user_id, None)
+
+    async def _run(self):
+        """Основной цикл: спим до ближайшего дедлайна и отправляем напоминание."""
+        while True:
+            try:
+                # Выбрасываем из вершины кучи записи, которые были перепланированы
+                while self._heap and self._entries.get(self._heap[0][2], (None,))[0] != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+
+                self._wakeup.clear()
+                if not self._heap:
+                    await self._wakeup.wait()
+                    continue
+
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                fire_at, _, key = heapq.heappop(self._heap)
+                _, event, offset = self._entries.pop(key)
+                user_id = key[0]
+                self._user_keys.get(user_id, set()).discard(key)
+
+                # Пользователь мог перейти к другому процессу
+                if self._owns is not None and not self._owns(user_id):
+                    continue
+
+                task = asyncio.create_task(self._deliver(key, event, offset))
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в планировщике напоминаний: {str(e)}")
+                await asyncio.sleep(1)
+
+    def _retry(self, key, event, offset):
+        """Снова ставит неотправленное напоминание в очередь, пока оно опаздывает не больше допустимого."""
+        user_id, _, start_ts, _ = key
+        retry_at = time.time() + REMINDER_RETRY_SECONDS
+        # Пользователь вышел или напоминание уже перепланировано проверкой событий
+        if user_id not in self._fingerprints or key in self._entries:
+            return
+        if retry_at > start_ts - offset * 60 + REMINDER_GRACE_SECONDS:
+            logger.warning(f"Напоминание пользователю {user_id} не отправлено и больше не повторяется")
+            return
+        self._entries[key] = (retry_at, event, offset)
+        heapq.heappush(self._heap, (retry_at, next(self._counter), key))
+        self._user_keys.setdefault(user_id, set()).add(key)
+        self._wakeup.set()
+
+    async def _deliver(self, key, event, offset):
+        user_id = key[0]
+        # Запись в журнал до отправки: повторная отправка невозможна даже после перезапуска.
+        # SQLite — в потоке, чтобы не блокировать цикл событий
+        try:
+            if not await asyncio.to_thread(reminder_ledger.claim, key):
+                return
+        except Exception as e:
+            logger.error(f"Не удалось записать напоминание пользователя {user_id} в журнал: {str(e)}")
+            self._retry(key, event, offset)
+            return
+
+        trace = tracer.start(user_id, kind='deliver')
+        status = 'ok'
+        try:
+            with span('send'):
+                await deliver_reminder(self._bot, user_id, event, offset)
+        except Exception as e:
+            status = 'error'
+            logger.error(f"Ошибка при отправке напоминания пользователю {user_id}: {str(e)}")
+            # Напоминание не ушло: снимаем отметку в журнале и пробуем ещё раз
+            try:
+                await asyncio.to_thread(reminder_ledger.release, key)
+            except Exception as e:
+                logger.error(f"Не удалось снять отметку напоминания пользователя {user_id}: {str(e)}")
+            else:
+                self._retry(key, event, offset)
+        finally:
+            # Записи попадут в файл вместе с ближайшей проверкой событий
+            tracer.finish(trace, status)
+
+
+# Общий планировщик процесса
+scheduler = ReminderScheduler()
@@ -0,0 +1,226 @@
+# reminder_worker.py
+# Отдельный процесс отправки напоминаний: python reminder_worker.py
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from aiogram import Bot
+
+import async_calendar
+import metrics
+from config import (
+    API_TOKEN,
+    REMINDER_REFRESH_MINUTES,
+    REMINDER_SHARDS,
+    WORKER_DB,
+    WORKER_LEASE_SECONDS,
+    WORKER_HEARTBEAT_SECONDS,
+)
+from event_checker import check_and_notify_events, list_user_ids, refresh_user
+from reminder_scheduler import scheduler
+import send_queue
+from settings_store import reminder_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.sha1(value.encode()).digest()[:8], 'big')
+
+
+def shard_of(user_id, shards=REMINDER_SHARDS):
+    """Часть, к которой относится пользователь (стабильна между процессами и перезапусками)."""
+    return _hash(str(user_id)) % shards
+
+
+class ShardLeases:
+    """
+    Аренда частей пользователей в общей базе SQLite.
+
+    Каждый воркер держит примерно поровну частей и продлевает аренду раз в
+    WORKER_HEARTBEAT_SECONDS. Части упавшего воркера освобождаются по истечении
+    аренды и переходят к живым. Порядок выбора частей задаётся rendezvous-хешем
+    (воркер, часть), поэтому при добавлении воркера переезжает минимум частей.
+    """
+
+    def __init__(self, worker_id, path=WORKER_DB, shards=REMINDER_SHARDS):
+        self.worker_id = worker_id
+        self._shards = shards
+        self._owned = frozenset()
+        self._valid_until = 0.0  # До какого момента своя аренда гарантированно действует
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS workers ("
+            " worker_id TEXT PRIMARY KEY,"
+            " heartbeat REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS shard_leases ("
+            " shard INTEGER PRIMARY KEY,"
+            " worker_id TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+
+    def owns(self, user_id):
+        """Отвечает ли этот воркер за пользователя прямо сейчас."""
+        return time.time() < self._valid_until and shard_of(user_id, self._shards) in self._owned
+
+    def heartbeat(self):
+        """
+        Продлевает свою аренду, освобождает лишние части и забирает свободные.
+        Возвращает множество своих частей.
+        """
+        with self._lock:
+            now = time.time()
+            expires_at = now + WORKER_LEASE_SECONDS
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO workers (worker_id, heartbeat) VALUES (?, ?) "
+                    "ON CONFLICT(worker_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                    (self.worker_id, now),
+                )
+                conn.execute("DELETE FROM workers WHERE heartbeat < ?", (now - WORKER_LEASE_SECONDS,))
+                alive = conn.execute("SELECT COUNT(*) FROM workers").fetchone()[0]
+                fair_share = math.ceil(self._shards / max(alive, 1))
+
+                conn.execute(
+                    "UPDATE shard_leases SET expires_at = ? WHERE worker_id = ?",
+                    (expires_at, self.worker_id),
+                )
+                owned = [row[0] for row in conn.execute(
+                    "SELECT shard FROM shard_leases WHERE worker_id = ?", (self.worker_id,)
+                )]
+                rank = lambda shard: _hash(f"{self.worker_id}:{shard}")
+
+                if len(owned) > fair_share:
+                    # Отдаём части, которые нам «нравятся» меньше всего
+                    owned.sort(key=rank, reverse=True)
+                    released = owned[fair_share:]
+                    owned = owned[:fair_share]
+                    conn.executemany(
+                        "DELETE FROM shard_leases WHERE shard = ? AND worker_id = ?",
+                        [(shard, self.worker_id) for shard in released],
+                    )
+                elif len(owned) < fair_share:
+                    taken = {row[0] for row in conn.execute(
+                        "SELECT shard FROM shard_leases WHERE expires_at >= ?", (now,)
+                    )}
+                    free = sorted((shard for shard in range(self._shards) if shard not in taken), key=rank, reverse=True)
+                    acquired = free[:fair_share - len(owned)]
+                    conn.executemany(
+                        "INSERT INTO shard_leases (shard, worker_id, expires_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(shard) DO UPDATE SET worker_id = excluded.worker_id, expires_at = excluded.expires_at",
+                        [(shard, self.worker_id, expires_at) for shard in acquired],
+                    )
+                    owned.extend(acquired)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+            self._owned = frozenset(owned)
+            # Запас в один интервал: чужой воркер заберёт часть не раньше истечения аренды
+            self._valid_until = expires_at - WORKER_HEARTBEAT_SECONDS
+            return self._owned
+
+    def release(self):
+        """Освобождает все свои части (при штатной остановке)."""
+        with self._lock:
+            self._owned = frozenset()
+            self._valid_until = 0.0
+            self._conn.execute("DELETE FROM shard_leases WHERE worker_id = ?", (self.worker_id,))
+            self._conn.execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+
+
+async def _lease_loop(leases):
+    """Продлевает аренду и переносит пользователей при смене частей."""
+    owned = frozenset()
+    while True:
+        try:
+            current = await asyncio.to_thread(leases.heartbeat)
+            lost, gained = owned - current, current - owned
+            owned = current
+
+            if lost:
+                for user_id in scheduler.users():
+                    if shard_of(user_id) in lost:
+                        scheduler.forget(user_id)
+            if gained:
+                logger.info(f"Воркер {leases.worker_id}: частей {len(owned)} (+{len(gained)}, -{len(lost)})")
+                # Новые пользователи не ждут очередного обновления
+                user_ids = await asyncio.to_thread(list_user_ids)
+                for user_id in user_ids:
+                    if shard_of(user_id) in gained:
+                        scheduler.invalidate(user_id)
+                        asyncio.create_task(refresh_user(user_id))
+            elif lost:
+                logger.info(f"Воркер {leases.worker_id}: частей {len(owned)} (-{len(lost)})")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при продлении аренды: {str(e)}")
+        await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+
+
+async def _forget_logged_out():
+    """Убирает напоминания пользователей, вышедших через /logout в процессе бота."""
+    user_ids = set(await asyncio.to_thread(list_user_ids))
+    for user_id in scheduler.users():
+        if user_id not in user_ids:
+            scheduler.forget(user_id)
+
+
+async def _sweep_loop(leases):
+    """Периодическое обновление событий своих пользователей."""
+    while True:
+        await asyncio.sleep(REMINDER_REFRESH_MINUTES * 60)
+        try:
+            # Учетные данные и настройки меняет процесс бота
+            await _forget_logged_out()
+            await asyncio.to_thread(reminder_settings.reload)
+            await check_and_notify_events(owns=leases.owns)
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении событий воркера: {str(e)}")
+
+
+async def main():
+    bot = send_queue.install(Bot(token=API_TOKEN))
+    leases = ShardLeases(f"{socket.gethostname()}-{os.getpid()}")
+    logger.info(f"Запущен воркер напоминаний {leases.worker_id}")
+
+    metrics_runner = await metrics.start()
+    scheduler.start(bot, owns=leases.owns)
+    tasks = [
+        asyncio.create_task(_lease_loop(leases)),
+        asyncio.create_task(_sweep_loop(leases)),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await scheduler.stop()
+        await asyncio.to_thread(leases.release)
+        await async_calendar.client.close()
+        await bot.session.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
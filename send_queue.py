@@ -0,0 +1,250 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    ForwardMessage,
+    SendDocument,
+    SendMessage,
+    SendPhoto,
+)
+
+import metrics
+from config import SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: меньше — раньше
+PRIORITY_REMINDER = 0
+PRIORITY_REPLY = 1
+PRIORITY_BULK = 2
+
+# Методы, которые Telegram ограничивает по частоте сообщений
+THROTTLED_METHODS = (
+    SendMessage,
+    SendPhoto,
+    SendDocument,
+    CopyMessage,
+    ForwardMessage,
+    EditMessageText,
+    EditMessageReplyMarkup,
+)
+
+# Приоритет и дедлайн текущей отправки (задаются через send_priority)
+_current_priority = ContextVar('send_priority', default=(PRIORITY_REPLY, None))
+
+# После скольких чатов чистим неактивные
+_PRUNE_THRESHOLD = 4096
+
+
+@contextmanager
+def send_priority(priority, deadline=None):
+    """
+    Задаёт приоритет и дедлайн (unix-время) для отправок внутри блока:
+
+        with send_priority(PRIORITY_REMINDER, fire_at):
+            await bot.send_message(...)
+    """
+    token = _current_priority.set((priority, deadline))
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class _Bucket:
+    """Token bucket: rate токенов в секунду, не больше capacity."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _fill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now):
+        """Когда будет доступен один токен."""
+        self._fill(now)
+        return now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+
+    def idle(self, now):
+        """Счётчик полностью восстановился — его можно забыть."""
+        self._fill(now)
+        return self.tokens >= self.capacity
+
+    def take(self, now):
+        self._fill(now)
+        self.tokens -= 1
+
+
+class SendQueue:
+    """
+    Общая очередь исходящих сообщений Telegram.
+
+    Сообщения уходят по приоритету и дедлайну (напоминания раньше ответов),
+    не чаще SEND_GLOBAL_RATE в секунду на бота и SEND_CHAT_RATE в секунду на чат.
+    При 429 (retry_after) отправка приостанавливается и сообщение повторяется.
+    """
+
+    def __init__(self, global_rate=SEND_GLOBAL_RATE, chat_rate=SEND_CHAT_RATE, chat_burst=SEND_CHAT_BURST):
+        self._heap = []  # (приоритет, дедлайн, порядковый номер, chat_id, factory, future)
+        self._counter = itertools.count()
+        self._global = _Bucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats = {}  # chat_id -> _Bucket
+        self._paused_until = 0.0  # monotonic-время окончания паузы после 429
+        self._wakeup = None
+        self._task = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    async def submit(self, chat_id, factory, priority=PRIORITY_REPLY, deadline=None):
+        """Ставит отправку в очередь и ждёт её результата. factory — корутина без аргументов."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._push(priority, time.time() if deadline is None else deadline, next(self._counter), chat_id, factory, future)
+        return await future
+
+    def _push(self, *entry):
+        heapq.heappush(self._heap, entry)
+        self._wakeup.set()
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > _PRUNE_THRESHOLD:
+                self._prune(time.monotonic())
+            bucket = self._chats[chat_id] = _Bucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    def _prune(self, now):
+        """Забываем чаты, чьи счётчики уже полностью восстановились."""
+        for chat_id in [chat_id for chat_id, bucket in self._chats.items() if bucket.idle(now)]:
+            del self._chats[chat_id]
+
+    def _next_ready(self, now):
+        """
+        Достаёт первую по приоритету отправку, чей чат не исчерпал лимит.
+        Возвращает (запись или None, когда освободится ближайший чат).
+        """
+        deferred = []
+        entry = None
+        wake_at = None
+        while self._heap:
+            candidate = heapq.heappop(self._heap)
+            if candidate[5].done():
+                continue  # Ожидающий отменил отправку
+            ready_at = self._chat_bucket(candidate[3]).ready_at(now)
+            if ready_at <= now:
+                entry = candidate
+                break
+            deferred.append(candidate)
+            wake_at = ready_at if wake_at is None else min(wake_at, ready_at)
+        for candidate in deferred:
+            heapq.heappush(self._heap, candidate)
+        return entry, wake_at
+
+    async def _sleep(self, delay):
+        """Спит delay секунд или до появления новой отправки."""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            try:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                global_ready = self._global.ready_at(now)
+                if global_ready > now:
+                    await asyncio.sleep(global_ready - now)
+                    continue
+
+                self._wakeup.clear()
+                entry, wake_at = self._next_ready(now)
+                if entry is None:
+                    await self._sleep(None if wake_at is None else wake_at - now)
+                    continue
+
+                self._global.take(now)
+                self._chat_bucket(entry[3]).take(now)
+                asyncio.create_task(self._send(entry))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в очереди отправки: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def _send(self, entry):
+        future = entry[5]
+        try:
+            result = await entry[4]()
+        except TelegramRetryAfter as e:
+            # Telegram просит подождать: ставим всю очередь на паузу и повторяем это же сообщение
+            metrics.telegram_retry_after.inc()
+            logger.warning(f"Ограничение Telegram для чата {entry[3]}, пауза {e.retry_after} сек.")
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            self._push(*entry)
+            return
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+
+class QueuedSendMiddleware(BaseRequestMiddleware):
+    """Пропускает отправку сообщений через общую очередь (подключается к сессии бота)."""
+
+    def __init__(self, queue):
+        self._queue = queue
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        try:
+            if not isinstance(method, THROTTLED_METHODS):
+                return await make_request(bot, method)
+            priority, deadline = _current_priority.get()
+            return await self._queue.submit(
+                method.chat_id,
+                lambda: make_request(bot, method),
+                priority=priority,
+                deadline=deadline,
+            )
+        finally:
+            metrics.telegram_send_seconds.observe(time.perf_counter() - started, method=type(method).__name__)
+
+
+# Общая очередь процесса
+send_queue = SendQueue()
+metrics.registry.gauge('schedio_send_queue_depth', 'Сообщений в очереди отправки Telegram', function=lambda: len(send_queue))
+
+
+def install(bot):
+    """Подключает очередь отправки к боту: все вызовы send_message/reply идут через неё."""
+    bot.session.middleware(QueuedSendMiddleware(send_queue))
+    return bot
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+
+from config import SETTINGS_DB, SETTINGS_FLUSH_SECONDS, DEFAULT_REMINDER_OFFSETS
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(offsets):
+    """Набор смещений в виде кортежа по убыванию (сначала самое раннее напоминание)."""
+    return tuple(sorted(set(offsets), reverse=True))
+
+
+class ReminderSettings:
+    """
+    Настройки напоминаний: набор смещений (в минутах) на пользователя.
+
+    Все настройки держатся в памяти как готовый индекс, поэтому планировщик
+    читает их без обращения к диску. Изменения записываются в SQLite
+    пачками в фоне (write-behind) и переживают перезапуск бота.
+    """
+
+    def __init__(self, path=SETTINGS_DB):
+        self._lock = threading.Lock()
+        self._dirty = set()  # Пользователи, чьи изменения ещё не записаны
+        self._task = None
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reminder_settings ("
+            " user_id INTEGER PRIMARY KEY,"
+            " offsets TEXT NOT NULL)"
+        )
+        self._index = {
+            user_id: _normalize(int(value) for value in offsets.split(',') if value)
+            for user_id, offsets in self._conn.execute("SELECT user_id, offsets FROM reminder_settings")
+        }
+
+    def offsets(self, user_id):
+        """Смещения пользователя; без сохранённых настроек — DEFAULT_REMINDER_OFFSETS."""
+        offsets = self._index.get(user_id)
+        return _normalize(DEFAULT_REMINDER_OFFSETS) if offsets is None else offsets
+
+    def toggle(self, user_id, offset):
+        """Включает или выключает напоминание за offset минут. Возвращает True, если оно включено."""
+        with self._lock:
+            offsets = set(self.offsets(user_id))
+            enabled = offset not in offsets
+            if enabled:
+                offsets.add(offset)
+            else:
+                offsets.discard(offset)
+            self._index[user_id] = _normalize(offsets)
+            self._dirty.add(user_id)
+        return enabled
+
+    def reload(self):
+        """
+        Перечитывает настройки из базы: их может менять другой процесс
+        (бот принимает команды, а напоминания отправляют воркеры).
+        Несохранённые локальные изменения не затираются.
+        """
+        rows = self._conn.execute("SELECT user_id, offsets FROM reminder_settings").fetchall()
+        with self._lock:
+            for user_id, offsets in rows:
+                if user_id not in self._dirty:
+                    self._index[user_id] = _normalize(int(value) for value in offsets.split(',') if value)
+
+    def flush(self):
+        """Записывает накопленные изменения одной транзакцией."""
+        with self._lock:
+            rows = [(user_id, ','.join(str(offset) for offset in self._index[user_id])) for user_id in self._dirty]
+            self._dirty.clear()
+        if not rows:
+            return 0
+        try:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT INTO reminder_settings (user_id, offsets) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET offsets = excluded.offsets",
+                    rows,
+                )
+        except BaseException:
+            # Запись не удалась: изменения остаются несохранёнными до следующей попытки
+            with self._lock:
+                self._dirty.update(user_id for user_id, _ in rows)
+            raise
+        logger.debug(f"Сохранены настройки напоминаний: {len(rows)}")
+        return len(rows)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(SETTINGS_FLUSH_SECONDS)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении настроек напоминаний: {str(e)}")
+
+    def start(self):
+        """Запускает фоновую запись изменений."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+        return self._task
+
+    async def stop(self):
+        """Останавливает фоновую запись и сохраняет всё, что осталось."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+# Общие настройки процесса
+reminder_settings = ReminderSettings()
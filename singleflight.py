@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+
+from config import COALESCE_WINDOW_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# После скольких сохранённых результатов чистим просроченные
+_PRUNE_THRESHOLD = 1024
+
+
+class SingleFlight:
+    """
+    Склейка одинаковых одновременных запросов.
+
+    Вызовы с одним ключом (user_id, операция, окно) ждут один общий запрос,
+    а его результат ещё ttl секунд отдаётся без повторного обращения к Google.
+    """
+
+    def __init__(self, ttl=COALESCE_WINDOW_SECONDS):
+        self._ttl = ttl
+        self._inflight = {}  # ключ -> задача выполняющегося запроса
+        self._results = {}  # ключ -> (действителен до, результат)
+
+    async def do(self, key, factory, ttl=None):
+        """
+        Выполняет factory() один раз на ключ.
+        ttl=0 — только склейка одновременных вызовов, без повторного использования результата.
+        """
+        ttl = self._ttl if ttl is None else ttl
+        now = time.monotonic()
+
+        cached = self._results.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        # Запрос выполняется в отдельной задаче: отмена одного из ждущих
+        # (например, по таймауту wait_for) не отменяет запрос для остальных
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, factory, ttl))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    async def _run(self, key, factory, ttl):
+        result = await factory()
+        if ttl > 0:
+            self._results[key] = (time.monotonic() + ttl, result)
+            if len(self._results) > _PRUNE_THRESHOLD:
+                self._prune()
+        return result
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Помечаем ошибку прочитанной, если все ждущие уже отменены
+
+    def forget(self, user_id):
+        """Сбрасывает сохранённые результаты пользователя (например, после создания события)."""
+        for key in [key for key in self._results if key[0] == user_id]:
+            del self._results[key]
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._results.items() if expires_at <= now]:
+            del self._results[key]
@@ -0,0 +1,111 @@
+# sweep_report.py
+# Отчёт по трассировке проверки событий (sweep_trace.jsonl):
+# python sweep_report.py [файлы...] [--top 10] [--kind sweep] [--hours 24]
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+from config import SWEEP_TRACE_FILE
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def read_records(paths, since=None):
+    """Записи из JSONL-файлов (повреждённые строки пропускаются)."""
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or record.get('ts', 0) >= since:
+                    yield record
+
+
+def report(records, top, kind):
+    runs = []
+    traces = []
+    for record in records:
+        if record.get('kind') == 'run':
+            runs.append(record)
+        elif record.get('kind') == kind:
+            traces.append(record)
+
+    if runs:
+        durations = [run['total'] for run in runs]
+        users = [run['users'] for run in runs]
+        print(f"Прогонов: {len(runs)}, пользователей в прогоне: до {max(users)}, "
+              f"длительность p50 {percentile(durations, 0.5):.2f} с, p95 {percentile(durations, 0.95):.2f} с, "
+              f"max {max(durations):.2f} с")
+
+    if not traces:
+        print(f"Нет трассировок вида '{kind}'")
+        return
+
+    # Этапы по всем трассировкам: вложенные запросы к Google (events.list, oauth.token)
+    # входят во время этапов auth/events, поэтому доли не складываются в 100%
+    traced_total = sum(trace['total'] for trace in traces)
+    stages = defaultdict(list)
+    for trace in traces:
+        for name, (seconds, _count) in trace.get('spans', {}).items():
+            stages[name].append(seconds)
+    print(f"\nТрассировок: {len(traces)}, суммарно {traced_total:.2f} с")
+    print(f"{'этап':16s} {'трасс.':>7s} {'сумма, с':>10s} {'среднее':>9s} {'p95':>9s} {'max':>9s} {'доля':>6s}")
+    for name, values in sorted(stages.items(), key=lambda item: -sum(item[1])):
+        total = sum(values)
+        share = total / traced_total * 100 if traced_total else 0.0
+        print(f"{name:16s} {len(values):7d} {total:10.2f} {total / len(values):9.3f} "
+              f"{percentile(values, 0.95):9.3f} {max(values):9.3f} {share:5.1f}%")
+
+    statuses = defaultdict(int)
+    for trace in traces:
+        statuses[trace.get('status', 'ok')] += 1
+    print("\nСтатусы: " + ", ".join(f"{status} {count}" for status, count in sorted(statuses.items())))
+
+    # Самые медленные пользователи: по худшей трассировке за все прогоны
+    by_user = defaultdict(list)
+    for trace in traces:
+        by_user[trace['user']].append(trace)
+    slowest = sorted(by_user.items(), key=lambda item: -max(trace['total'] for trace in item[1]))[:top]
+    print(f"\nТоп-{top} медленных пользователей:")
+    for user_id, user_traces in slowest:
+        worst = max(user_traces, key=lambda trace: trace['total'])
+        mean = sum(trace['total'] for trace in user_traces) / len(user_traces)
+        failures = sum(1 for trace in user_traces if trace.get('status', 'ok') != 'ok')
+        breakdown = ", ".join(
+            f"{name} {seconds:.3f}" + (f"×{count}" if count > 1 else "")
+            for name, (seconds, count) in sorted(worst.get('spans', {}).items(), key=lambda item: -item[1][0])
+        )
+        events = f", событий {worst['events']}" if 'events' in worst else ""
+        print(f"  {user_id}: max {worst['total']:.3f} с, среднее {mean:.3f} с, трасс. {len(user_traces)}, "
+              f"ошибок {failures}{events}")
+        print(f"      худший прогон ({worst.get('status', 'ok')}): {breakdown or 'нет этапов'}")
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description="Самые медленные пользователи и этапы проверки событий")
+    arguments.add_argument('paths', nargs='*', help=f"файлы трассировки (по умолчанию {SWEEP_TRACE_FILE} и .1)")
+    arguments.add_argument('--top', type=int, default=10, help="сколько пользователей показать")
+    arguments.add_argument('--kind', default='sweep', choices=('sweep', 'refresh', 'deliver'),
+                           help="вид трассировок: плановая проверка, внеочередное обновление или отправка")
+    arguments.add_argument('--hours', type=float, help="только записи за последние N часов")
+    options = arguments.parse_args(argv)
+
+    paths = options.paths or [SWEEP_TRACE_FILE + '.1', SWEEP_TRACE_FILE]
+    since = time.time() - options.hours * 3600 if options.hours else None
+    report(read_records(paths, since), options.top, options.kind)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from contextvars import ContextVar
+
+from config import SWEEP_TRACE_FILE, SWEEP_TRACE_SAMPLE, SWEEP_TRACE_SLOW_SECONDS, SWEEP_TRACE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Трассировка, к которой относятся этапы текущей задачи (None — не трассируем)
+_current = ContextVar('sweep_trace', default=None)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('_trace', '_name', '_started')
+
+    def __init__(self, trace, name):
+        self._trace = trace
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._trace.add(self._name, time.perf_counter() - self._started)
+        return False
+
+
+def span(name):
+    """
+    Замер этапа для текущей трассировки: with span('events.list'): ...
+    Вне трассировки возвращает пустой контекст, поэтому почти ничего не стоит.
+    """
+    trace = _current.get()
+    return _NULL_SPAN if trace is None else _Span(trace, name)
+
+
+def add_span(name, seconds):
+    """Добавляет уже измеренный этап к текущей трассировке (если она есть)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+class UserTrace:
+    """Этапы обработки одного пользователя: имя этапа -> суммарное время и число вызовов."""
+
+    __slots__ = ('kind', 'run', 'user_id', 'started', 'spans', 'attrs', 'sampled', '_token')
+
+    def __init__(self, kind, run, user_id, sampled):
+        self.kind = kind
+        self.run = run
+        self.user_id = user_id
+        self.sampled = sampled  # Попал в выборку; иначе пишется, только если оказался медленным
+        self.started = time.perf_counter()
+        self.spans = {}  # имя -> [секунд, вызовов]
+        self.attrs = {}
+        self._token = None
+
+    def add(self, name, seconds):
+        stat = self.spans.get(name)
+        if stat is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            stat[0] += seconds
+            stat[1] += 1
+
+
+class SweepTracer:
+    """
+    Выборочная трассировка проверки событий (sweep) и отправки напоминаний.
+
+    Для доли SWEEP_TRACE_SAMPLE пользователей в каждом прогоне замеряются этапы
+    (ожидание очереди, токен, запросы к Google, планирование, отправка),
+    а при SWEEP_TRACE_SLOW_SECONDS > 0 пишутся и все пользователи медленнее порога.
+    Записи копятся в памяти и дописываются в SWEEP_TRACE_FILE (JSONL) в конце прогона.
+    Отчёт по файлу: python sweep_report.py
+    """
+
+    def __init__(self, path=SWEEP_TRACE_FILE, sample=SWEEP_TRACE_SAMPLE, slow=SWEEP_TRACE_SLOW_SECONDS,
+                 max_bytes=SWEEP_TRACE_MAX_BYTES):
+        self._path = path
+        self._sample = sample
+        self._slow = slow
+        self._max_bytes = max_bytes
+        self._buffer = []  # Готовые строки JSONL
+
+    @property
+    def enabled(self):
+        return self._sample > 0 or self._slow > 0
+
+    def new_run(self):
+        """Идентификатор прогона (общий для всех пользователей одной проверки)."""
+        return uuid.uuid4().hex[:12] if self.enabled else None
+
+    def start(self, user_id, run=None, kind='sweep'):
+        """
+        Начинает трассировку пользователя в текущей задаче.
+        Возвращает UserTrace или None, если пользователь не трассируется.
+        """
+        if not self.enabled:
+            return None
+        sampled = self._sample > 0 and random.random() < self._sample
+        if not sampled and self._slow <= 0:
+            return None
+        trace = UserTrace(kind, run, user_id, sampled)
+        trace._token = _current.set(trace)
+        return trace
+
+    def finish(self, trace, status='ok'):
+        """Завершает трассировку; запись попадает в буфер, если пользователь в выборке или медленный."""
+        if trace is None:
+            return
+        _current.reset(trace._token)
+        total = time.perf_counter() - trace.started
+        if not trace.sampled and total < self._slow:
+            return
+        record = {
+            'ts': round(time.time(), 3),
+            'kind': trace.kind,
+            'run': trace.run,
+            'user': trace.user_id,
+            'total': round(total, 4),
+            'status': status,
+            'spans': {name: [round(seconds, 4), count] for name, (seconds, count) in trace.spans.items()},
+        }
+        record.update(trace.attrs)
+        self._buffer.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+
+    def record_run(self, run, users, seconds):
+        """Итог прогона: сколько пользователей и сколько времени заняла вся проверка."""
+        if run is None:
+            return
+        record = {'ts': round(time.time(), 3), 'kind': 'run', 'run': run, 'users': users, 'total': round(seconds, 4)}
+        self._buffer.append(json.dumps(record, separators=(',', ':')))
+
+    def _write(self, lines):
+        # Простая ротация: при превышении размера текущий файл становится .1
+        try:
+            if self._max_bytes and os.path.getsize(self._path) >= self._max_bytes:
+                os.replace(self._path, self._path + '.1')
+        except FileNotFoundError:
+            pass
+        with open(self._path, 'a', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+
+    async def flush(self):
+        """Дописывает накопленные записи в файл (в потоке, чтобы не блокировать цикл событий)."""
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, lines)
+        except Exception as e:
+            logger.error(f"Не удалось записать трассировку проверки событий: {str(e)}")
+
+
+# Общий трассировщик процесса
+tracer = SweepTracer()
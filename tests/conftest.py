@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Базы SQLite — во временной папке, чтобы тесты не трогали рабочие файлы
+_tmp = tempfile.mkdtemp(prefix='schedio-tests-')
+os.environ.setdefault('CREDENTIALS_DB', os.path.join(_tmp, 'schedio.db'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
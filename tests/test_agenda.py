@@ -0,0 +1,55 @@
+from agenda import MESSAGE_LIMIT, _open_entities, paginate, render_agenda, split_text
+
+
+def _balanced(text):
+    return _open_entities(text, len(text)) == (None, None, None)
+
+
+def _event(event_id, summary='Встреча'):
+    return {
+        'id': event_id,
+        'summary': summary,
+        'start': {'dateTime': '2030-01-01T10:00:00+03:00'},
+        'end': {'dateTime': '2030-01-01T11:00:00+03:00'},
+    }
+
+
+def test_pages_hold_at_most_per_page_events():
+    blocks = [f"событие {number}" for number in range(23)]
+    pages = paginate(blocks, per_page=10)
+    assert [len(page.split('\n')) for page in pages] == [10, 10, 3]
+    assert '\n'.join(pages).split('\n') == blocks
+
+
+def test_long_title_is_split_into_valid_pages():
+    pages = render_agenda('today', [_event('agenda-long', 'Очень длинное название ' * 300), _event('agenda-short')])
+    assert len(pages) > 2
+    for page in pages:
+        assert len(page) <= MESSAGE_LIMIT
+        assert _balanced(page)
+    # Каждая часть названия остаётся ссылкой на событие
+    assert sum(page.count('](https://calendar.google.com/') for page in pages) > 2
+
+
+def test_cut_never_separates_backslash_from_escaped_char():
+    for limit in range(5, 15):
+        text = 'a' * (limit - 1) + '\\.' + 'b' * 20
+        for part in split_text(text, limit):
+            assert len(part) <= limit
+            assert not part.startswith('.')
+            assert (len(part) - len(part.rstrip('\\'))) % 2 == 0
+
+
+def test_entity_is_moved_to_next_page_whole():
+    text = 'a' * 20 + ' *[title](https://example.com)*'
+    assert split_text(text, 40) == ['a' * 20 + ' ', '*[title](https://example.com)*']
+
+
+def test_cut_inside_link_address_closes_link_text():
+    text = '*[' + 'x' * 30 + '](https://example.com/path)*'
+    parts = split_text(text, 45)
+    assert len(parts) > 1
+    for part in parts:
+        assert len(part) <= 45
+        assert _balanced(part)
+        assert part.endswith('](https://example.com/path)*')
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+import agenda_cache as agenda_cache_module
+import calendar_facade
+from agenda_cache import AgendaCache
+
+
+class Loader:
+    """Загрузка из Google: возвращает следующее значение или бросает ошибку."""
+
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        value = self.values.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def _age(cache, key, seconds):
+    cache._entries[key].fetched_at -= seconds
+
+
+def test_hit_stale_and_miss():
+    cache = AgendaCache(ttl=10, max_stale=100, size=10)
+    loader = Loader('first', 'second', 'third')
+    key = (1, 'agenda', 0)
+
+    async def main():
+        assert (await cache.get(key, loader)).value == 'first'
+        assert (await cache.get(key, loader)).value == 'first'
+        assert loader.calls == 1
+
+        # Устарело: отдаём старое и обновляем в фоне
+        _age(cache, key, 50)
+        assert (await cache.get(key, loader)).value == 'first'
+        await asyncio.sleep(0)
+        assert loader.calls == 2
+        assert (await cache.get(key, loader)).value == 'second'
+
+        # Старше max_stale: ждём загрузки
+        _age(cache, key, 500)
+        assert (await cache.get(key, loader)).value == 'third'
+        assert loader.calls == 3
+
+    asyncio.run(main())
+
+
+def test_google_down_returns_last_known_value():
+    cache = AgendaCache(ttl=10, max_stale=100, size=10)
+    key = (1, 'agenda', 0)
+
+    async def main():
+        await cache.get(key, Loader('first'))
+        _age(cache, key, 500)
+        agenda = await cache.get(key, Loader(RuntimeError('503')))
+        assert agenda.value == 'first' and agenda.stale
+
+        with pytest.raises(RuntimeError):
+            await cache.get((2, 'agenda', 0), Loader(RuntimeError('503')))
+
+    asyncio.run(main())
+
+
+def test_invalidate_forces_reload():
+    cache = AgendaCache(ttl=10, max_stale=100, size=10)
+    loader = Loader('before', 'after')
+    key = (1, 'agenda', 0)
+
+    async def main():
+        await cache.get(key, loader)
+        cache.invalidate(2)
+        assert (await cache.get(key, loader)).value == 'before'
+        cache.invalidate(1)
+        assert (await cache.get(key, loader)).value == 'after'
+
+    asyncio.run(main())
+
+
+def test_load_started_before_invalidate_is_not_cached():
+    cache = AgendaCache(ttl=10, max_stale=100, size=10)
+    key = (1, 'agenda', 0)
+    release = None
+
+    async def slow_loader():
+        await release.wait()
+        return 'old'
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        pending = asyncio.create_task(cache.get(key, slow_loader))
+        await asyncio.sleep(0)
+        cache.invalidate(1)  # Событие создано, пока шло чтение
+        release.set()
+        assert (await pending).value == 'old'
+        assert (await cache.get(key, Loader('new'))).value == 'new'
+
+    asyncio.run(main())
+
+
+def test_lru_eviction():
+    cache = AgendaCache(ttl=10, max_stale=100, size=2)
+
+    async def main():
+        for user_id in (1, 2):
+            await cache.get((user_id, 'agenda', 0), Loader(user_id))
+        await cache.get((1, 'agenda', 0), Loader())  # 1 снова самый свежий
+        await cache.get((3, 'agenda', 0), Loader(3))
+        assert list(cache._entries) == [(1, 'agenda', 0), (3, 'agenda', 0)]
+
+    asyncio.run(main())
+
+
+def test_create_event_invalidates_agenda(monkeypatch):
+    cache = AgendaCache(ttl=10, max_stale=100, size=10)
+    monkeypatch.setattr(agenda_cache_module, 'agenda_cache', cache)
+
+    async def create_event(user_id, event, conference=False):
+        return {'id': 'created'}
+
+    monkeypatch.setattr(calendar_facade.async_calendar, 'create_event', create_event)
+    loader = Loader('before', 'after')
+    key = (1, 'agenda', 0)
+
+    async def main():
+        await cache.get(key, loader)
+        await calendar_facade.create_event(1, {'summary': 'Встреча'})
+        assert (await cache.get(key, loader)).value == 'after'
+
+    asyncio.run(main())
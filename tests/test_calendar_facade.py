@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import threading
+
+import pytest
+
+import calendar_facade
+from calendar_facade import LatencyStats
+
+
+def test_summary_counts_errors_and_percentiles():
+    stats = LatencyStats(samples=100)
+    for index in range(1, 101):
+        stats.record('today', index / 100, ok=index % 10 != 0)
+
+    summary = stats.summary()['today']
+    assert summary['count'] == 100
+    assert summary['errors'] == 10
+    assert summary['max'] == 1.0
+    assert summary['p50'] == 0.51
+    assert summary['p95'] == 0.96
+    assert summary['total'] == pytest.approx(50.5)
+
+
+def test_percentiles_use_recent_samples_only():
+    stats = LatencyStats(samples=3)
+    for seconds in (10.0, 0.1, 0.2, 0.3):
+        stats.record('next', seconds)
+    summary = stats.summary()['next']
+    assert summary['count'] == 4
+    assert summary['max'] == 10.0
+    assert summary['p95'] == 0.3
+
+
+def test_slow_operations_are_logged(monkeypatch, caplog):
+    monkeypatch.setattr(calendar_facade, 'CALENDAR_SLOW_SECONDS', 1.0)
+    stats = LatencyStats()
+    with caplog.at_level(logging.WARNING, logger='calendar_facade'):
+        stats.record('create_event', 0.5)
+        stats.record('create_event', 1.5)
+    assert [record.getMessage() for record in caplog.records] == [
+        "Медленная операция календаря create_event: 1.50 с",
+    ]
+
+
+def test_timed_records_failures(monkeypatch):
+    stats = LatencyStats()
+    monkeypatch.setattr(calendar_facade, 'latency', stats)
+
+    async def fail():
+        raise RuntimeError('Google недоступен')
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await calendar_facade._timed('today', fail())
+        assert await calendar_facade.run_blocking('auth_url', threading.get_ident) != threading.get_ident()
+
+    asyncio.run(main())
+    summary = stats.summary()
+    assert summary['today']['errors'] == 1
+    assert summary['auth_url'] == {**summary['auth_url'], 'count': 1, 'errors': 0}
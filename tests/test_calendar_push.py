@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import async_calendar
+from calendar_push import PushChannels
+
+
+def test_channels_survive_restart(tmp_path):
+    path = str(tmp_path / 'push.db')
+    channels = PushChannels(path)
+    channels._save(1, {'id': 'schedio-1-a', 'resourceId': 'r1', 'expiration': time.time() + 3600})
+    channels._save(2, {'id': 'schedio-2-b', 'resourceId': 'r2', 'expiration': time.time() + 3600})
+    channels._forget(2)
+
+    restarted = PushChannels(path)
+    assert list(restarted._channels) == [1]
+    assert restarted._channels[1]['resourceId'] == 'r1'
+
+
+def test_expired_channels_are_dropped(tmp_path):
+    path = str(tmp_path / 'push.db')
+    PushChannels(path)._save(1, {'id': 'schedio-1-a', 'resourceId': 'r1', 'expiration': time.time() - 1})
+    assert PushChannels(path)._channels == {}
+
+
+def test_register_replaces_and_stops_old_channel(tmp_path, monkeypatch):
+    stopped = []
+
+    async def authenticate(user_id):
+        return object()
+
+    async def watch_events(creds, body, user_id=None):
+        return {'resourceId': 'r-' + body['id'], 'expiration': str(int((time.time() + 3600) * 1000))}
+
+    async def stop_channel(creds, channel_id, resource_id, user_id=None):
+        stopped.append(channel_id)
+
+    monkeypatch.setattr(async_calendar, 'authenticate_google_calendar', authenticate)
+    monkeypatch.setattr(async_calendar.client, 'watch_events', watch_events)
+    monkeypatch.setattr(async_calendar.client, 'stop_channel', stop_channel)
+
+    channels = PushChannels(str(tmp_path / 'push.db'))
+    assert asyncio.run(channels.register(5))
+    first = channels._channels[5]['id']
+    assert asyncio.run(channels.register(5))
+    assert stopped == [first]
+
+    asyncio.run(channels.unregister(5))
+    assert stopped[-1] != first
+    assert PushChannels(str(tmp_path / 'push.db'))._channels == {}
+
+
+class _Creds:
+    def __init__(self, refresh_token):
+        self.refresh_token = refresh_token
+
+
+def _failing_watch(monkeypatch, status):
+    calls = []
+
+    async def authenticate(user_id):
+        return object()
+
+    async def watch_events(creds, body, user_id=None):
+        calls.append(user_id)
+        raise async_calendar.CalendarApiError(status, 'watch failed')
+
+    monkeypatch.setattr(async_calendar, 'authenticate_google_calendar', authenticate)
+    monkeypatch.setattr(async_calendar.client, 'watch_events', watch_events)
+    return calls
+
+
+def test_transient_failures_back_off(tmp_path, monkeypatch):
+    import calendar_push
+    _failing_watch(monkeypatch, 503)
+    monkeypatch.setattr(calendar_push.credential_store, 'cached', lambda user_id: None)
+
+    channels = PushChannels(str(tmp_path / 'push.db'))
+    now = time.time()
+    assert not asyncio.run(channels.register(7))
+    first_delay = channels._failures[7][1] - now
+    assert not asyncio.run(channels.register(7))
+    assert channels._failures[7][1] - now >= 2 * first_delay - 1
+
+    assert not asyncio.run(channels._may_retry(7, now))
+    assert asyncio.run(channels._may_retry(7, now + 24 * 3600))
+
+
+def test_permanent_failure_waits_for_new_login(tmp_path, monkeypatch):
+    import calendar_push
+    _failing_watch(monkeypatch, 403)
+    creds = {7: _Creds('old')}
+    monkeypatch.setattr(calendar_push.credential_store, 'cached', lambda user_id: creds.get(user_id))
+
+    channels = PushChannels(str(tmp_path / 'push.db'))
+    assert not asyncio.run(channels.register(7))
+    assert not asyncio.run(channels._may_retry(7, time.time() + 365 * 24 * 3600))
+
+    creds[7] = _Creds('new')
+    assert asyncio.run(channels._may_retry(7, time.time()))
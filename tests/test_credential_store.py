@@ -0,0 +1,33 @@
+from google.oauth2.credentials import Credentials
+
+from credential_store import CredentialStore
+
+
+def _creds(token):
+    return Credentials(token=token, refresh_token='refresh', client_id='id', client_secret='secret',
+                       token_uri='https://oauth2.googleapis.com/token')
+
+
+def test_cached_skips_disk_until_ttl(tmp_path):
+    store = CredentialStore(str(tmp_path / 'creds.db'), cache_ttl=60)
+    assert store.cached(1) is None
+    store.put(1, _creds('a'))
+    assert store.cached(1).token == 'a'
+
+
+def test_changes_from_other_process_are_picked_up(tmp_path):
+    path = str(tmp_path / 'creds.db')
+    bot = CredentialStore(path, cache_ttl=0)
+    worker = CredentialStore(path, cache_ttl=0)
+    bot.put(1, _creds('a'))
+    first = worker.get(1)
+    assert first.token == 'a'
+    # Запись не менялась: тот же объект
+    assert worker.get(1) is first
+
+    bot.put(1, _creds('b'))
+    assert worker.get(1).token == 'b'
+
+    bot.delete(1)
+    assert worker.get(1) is None
+    assert not worker.has(1)
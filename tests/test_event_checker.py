@@ -0,0 +1,52 @@
+import asyncio
+
+import event_checker
+from reminder_scheduler import ReminderScheduler
+
+
+def _sweep(monkeypatch, fetch, user_ids, concurrency=2, timeout=0.2):
+    scheduler = ReminderScheduler()
+    monkeypatch.setattr(event_checker, 'scheduler', scheduler)
+    monkeypatch.setattr(event_checker, 'list_user_ids', lambda: list(user_ids))
+    monkeypatch.setattr(event_checker, '_fetch_user_events', fetch)
+    monkeypatch.setattr(event_checker, 'SWEEP_CONCURRENCY', concurrency)
+    monkeypatch.setattr(event_checker, 'SWEEP_USER_TIMEOUT', timeout)
+    asyncio.run(event_checker.check_and_notify_events())
+    return scheduler
+
+
+def test_sweep_respects_concurrency(monkeypatch):
+    running = [0, 0]  # сейчас, максимум
+
+    async def fetch(user_id):
+        running[0] += 1
+        running[1] = max(running[1], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return []
+
+    scheduler = _sweep(monkeypatch, fetch, range(10), concurrency=3)
+    assert running[1] == 3
+    assert sorted(scheduler.users()) == list(range(10))
+
+
+def test_slow_user_does_not_block_others(monkeypatch):
+    async def fetch(user_id):
+        if user_id == 1:
+            await asyncio.sleep(10)
+        return []
+
+    scheduler = _sweep(monkeypatch, fetch, [1, 2, 3], concurrency=1, timeout=0.05)
+    # Пользователь 1 отвалился по таймауту, остальные спланированы
+    assert sorted(scheduler.users()) == [2, 3]
+
+
+def test_failing_user_is_isolated(monkeypatch):
+    async def fetch(user_id):
+        if user_id == 2:
+            raise ConnectionError('google unavailable')
+        return None if user_id == 3 else []
+
+    scheduler = _sweep(monkeypatch, fetch, [1, 2, 3])
+    # 2 — ошибка, 3 — без токена
+    assert scheduler.users() == [1]
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import TIMEZONE
+from event_model import AgendaSnapshot
+
+DAY = TIMEZONE.localize(datetime(2030, 3, 10))
+TOMORROW = DAY + timedelta(days=1)
+WINDOW_END = DAY + timedelta(days=2)
+
+
+def _at(hours):
+    """Момент через hours часов после начала сегодняшних суток."""
+    return (DAY + timedelta(hours=hours)).isoformat()
+
+
+def _timed(event_id, start, end):
+    return {'id': event_id, 'start': {'dateTime': _at(start)}, 'end': {'dateTime': _at(end)}}
+
+
+def _all_day(event_id, days_ahead, days=1):
+    first = DAY.date() + timedelta(days=days_ahead)
+    return {'id': event_id, 'start': {'date': first.isoformat()},
+            'end': {'date': (first + timedelta(days=days)).isoformat()}}
+
+
+EVENTS = [
+    _timed('snapshot-morning', 9, 10),
+    _timed('snapshot-late', 23, 25),  # Через полночь
+    _timed('snapshot-ends-at-midnight', 22, 24),
+    _timed('snapshot-tomorrow', 24 + 10, 24 + 11),
+    _all_day('snapshot-today-all-day', 0),
+    _all_day('snapshot-tomorrow-all-day', 1),
+    _all_day('snapshot-two-days', 0, days=2),
+]
+
+
+def _snapshot(following=None):
+    return AgendaSnapshot((DAY, TOMORROW), (TOMORROW, WINDOW_END), EVENTS, following, DAY)
+
+
+def _ids(events):
+    return sorted(event['id'] for event in events) if isinstance(events, list) else (events or {}).get('id')
+
+
+def test_today_and_tomorrow_split_by_local_midnight():
+    snapshot = _snapshot()
+    assert _ids(snapshot.today()) == [
+        'snapshot-ends-at-midnight', 'snapshot-late', 'snapshot-morning',
+        'snapshot-today-all-day', 'snapshot-two-days',
+    ]
+    assert _ids(snapshot.tomorrow()) == [
+        'snapshot-late', 'snapshot-tomorrow', 'snapshot-tomorrow-all-day', 'snapshot-two-days',
+    ]
+
+
+@pytest.mark.parametrize('hours, current, following', [
+    (8, None, 'snapshot-morning'),
+    (9, 'snapshot-morning', 'snapshot-ends-at-midnight'),
+    (10, 'snapshot-morning', 'snapshot-ends-at-midnight'),
+    (10.5, None, 'snapshot-ends-at-midnight'),
+    (22.5, 'snapshot-ends-at-midnight', 'snapshot-late'),
+    (24.5, 'snapshot-late', 'snapshot-tomorrow'),
+    (30, None, 'snapshot-tomorrow'),
+    (36, None, None),
+])
+def test_current_and_next_ignore_all_day_events(hours, current, following):
+    snapshot = _snapshot()
+    now = DAY + timedelta(hours=hours)
+    assert _ids(snapshot.current(now)) == current
+    assert _ids(snapshot.next(now)) == following
+
+
+def test_next_falls_back_to_following_event():
+    later = _timed('snapshot-next-week', 24 * 7, 24 * 7 + 1)
+    snapshot = _snapshot(following=later)
+    assert _ids(snapshot.next(DAY + timedelta(hours=36))) == 'snapshot-next-week'
+    assert snapshot.next(DAY + timedelta(days=8)) is None
+
+
+@pytest.mark.parametrize('hours, covers', [
+    (-1, False),
+    (0, True),
+    (23.9, True),
+    (24, False),
+])
+def test_covers_only_the_snapshot_day(hours, covers):
+    assert _snapshot().covers(DAY + timedelta(hours=hours)) is covers
@@ -0,0 +1,146 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from config import EVENT_STORE_WINDOW_DAYS
+from event_store import EventStore
+
+
+class _Gone(Exception):
+    status = 410
+
+
+def _event(event_id, start, hours=1, status='confirmed'):
+    return {
+        'id': event_id,
+        'status': status,
+        'start': {'dateTime': start.isoformat()},
+        'end': {'dateTime': (start + timedelta(hours=hours)).isoformat()},
+    }
+
+
+class FakeCalendar:
+    """Ответы events.list по очереди; запоминает параметры запросов."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def fetch(self, params):
+        self.requests.append(dict(params))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def _sync(store, calendar):
+    asyncio.run(store.async_sync(calendar.fetch))
+
+
+def test_full_sync_then_delta():
+    now = datetime.now(timezone.utc)
+    calendar = FakeCalendar(
+        {'items': [_event('a', now + timedelta(hours=1)), _event('b', now + timedelta(hours=2))],
+         'nextSyncToken': 't1'},
+        {'items': [_event('a', now, status='cancelled'), _event('c', now + timedelta(hours=3))],
+         'nextSyncToken': 't2'},
+    )
+    store = EventStore(1)
+    _sync(store, calendar)
+    assert 'timeMin' in calendar.requests[0] and 'syncToken' not in calendar.requests[0]
+    assert [event['id'] for event in store.upcoming(now)] == ['a', 'b']
+
+    _sync(store, calendar)
+    assert calendar.requests[1]['syncToken'] == 't1'
+    assert [event['id'] for event in store.upcoming(now)] == ['b', 'c']
+    assert store.sync_token == 't2'
+
+
+def test_pages_are_collected():
+    now = datetime.now(timezone.utc)
+    calendar = FakeCalendar(
+        {'items': [_event('a', now + timedelta(hours=1))], 'nextPageToken': 'p2'},
+        {'items': [_event('b', now + timedelta(hours=2))], 'nextSyncToken': 't1'},
+    )
+    store = EventStore(1)
+    _sync(store, calendar)
+    assert calendar.requests[1]['pageToken'] == 'p2'
+    assert len(store.upcoming(now)) == 2
+
+
+def test_expired_sync_token_triggers_full_sync():
+    now = datetime.now(timezone.utc)
+    calendar = FakeCalendar(
+        {'items': [_event('old', now + timedelta(hours=1))], 'nextSyncToken': 't1'},
+        _Gone(),
+        {'items': [_event('new', now + timedelta(hours=1))], 'nextSyncToken': 't2'},
+    )
+    store = EventStore(1)
+    _sync(store, calendar)
+    _sync(store, calendar)
+    assert 'syncToken' not in calendar.requests[2]
+    assert [event['id'] for event in store.upcoming(now)] == ['new']
+
+
+def test_reads_from_memory():
+    now = datetime.now(timezone.utc)
+    store = EventStore(1)
+    store.apply([
+        _event('current', now - timedelta(minutes=30)),
+        _event('next', now + timedelta(hours=2)),
+        _event('tomorrow', now + timedelta(days=1, hours=2)),
+    ], 't1', full=True)
+    assert store.current(now)['id'] == 'current'
+    assert store.next(now)['id'] == 'next'
+    assert [event['id'] for event in store.between(now + timedelta(hours=1), now + timedelta(hours=5))] == ['next']
+
+
+def test_watched_store_skips_sync_until_notified():
+    store = EventStore(1)
+    store.apply([], 't1', full=True)
+    store.dirty = False
+    store.watch(datetime.now(timezone.utc).timestamp() + 3600)
+    assert not store.needs_sync()
+    store.mark_dirty()
+    assert store.needs_sync()
+
+
+def test_failed_sync_keeps_store_dirty():
+    store = EventStore(1)
+    store.apply([], 't1', full=True)
+    store.dirty = False
+    store.watch(datetime.now(timezone.utc).timestamp() + 3600)
+    store.mark_dirty()
+    calendar = FakeCalendar(ConnectionError('timeout'))
+    try:
+        _sync(store, calendar)
+    except ConnectionError:
+        pass
+    assert store.needs_sync()
+
+
+def test_full_sync_is_bounded_and_window_moves():
+    now = datetime.now(timezone.utc)
+    calendar = FakeCalendar(
+        {'items': [_event('soon', now + timedelta(days=1))], 'nextSyncToken': 't1'},
+        # Изменения по syncToken не ограничены окном
+        {'items': [_event('far', now + timedelta(days=400))], 'nextSyncToken': 't2'},
+        {'items': [], 'nextSyncToken': 't3'},
+    )
+    store = EventStore(1)
+    _sync(store, calendar)
+    time_max = datetime.fromisoformat(calendar.requests[0]['timeMax'])
+    assert time_max - now < timedelta(days=EVENT_STORE_WINDOW_DAYS + 1)
+
+    _sync(store, calendar)
+    assert [event['id'] for event in store.upcoming(now)] == ['soon']
+
+    # Осталось меньше половины окна: следующая синхронизация снова полная
+    store.dirty = False
+    store.watch(now.timestamp() + 3600 * 24 * 365)
+    assert not store.needs_sync()
+    store.window_end = now + timedelta(days=1)
+    assert store.needs_sync()
+    _sync(store, calendar)
+    assert 'syncToken' not in calendar.requests[2]
+    assert 'timeMax' in calendar.requests[2]
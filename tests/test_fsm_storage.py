@@ -0,0 +1,85 @@
+import asyncio
+import importlib.util
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from fsm_storage import SQLiteStorage, create_storage
+
+
+def test_backends_by_setting():
+    assert isinstance(create_storage('memory'), MemoryStorage)
+    assert isinstance(create_storage('sqlite'), SQLiteStorage)
+    with pytest.raises(ValueError):
+        create_storage('mongodb://localhost')
+
+
+@pytest.mark.skipif(importlib.util.find_spec('redis') is not None, reason="пакет redis установлен")
+def test_missing_redis_names_the_package():
+    with pytest.raises(RuntimeError, match='pip install redis'):
+        create_storage('redis://localhost:6379/0')
+
+
+class Form(StatesGroup):
+    title = State()
+
+
+def _context(storage, user_id=1):
+    return FSMContext(storage, StorageKey(bot_id=42, chat_id=user_id, user_id=user_id))
+
+
+async def _round_trip(storage):
+    state = _context(storage)
+    await state.set_state(Form.title)
+    await state.update_data(title='Встреча', attendees=['a@example.com'])
+    assert await state.get_state() == Form.title.state
+    assert await state.get_data() == {'title': 'Встреча', 'attendees': ['a@example.com']}
+    # Другой пользователь не видит чужие данные
+    assert await _context(storage, user_id=2).get_state() is None
+    assert await _context(storage, user_id=2).get_data() == {}
+
+
+def test_sqlite_round_trip_and_clear(tmp_path):
+    path = str(tmp_path / 'fsm.db')
+
+    async def main():
+        storage = SQLiteStorage(path)
+        await _round_trip(storage)
+        await storage.close()
+
+        # Состояние переживает перезапуск
+        restarted = SQLiteStorage(path)
+        state = _context(restarted)
+        assert await state.get_state() == Form.title.state
+        assert (await state.get_data())['title'] == 'Встреча'
+
+        await state.clear()
+        assert await state.get_state() is None
+        assert await state.get_data() == {}
+        await restarted.close()
+
+        fresh = SQLiteStorage(path)
+        assert await _context(fresh).get_state() is None
+        await fresh.close()
+
+    asyncio.run(main())
+
+
+def test_redis_round_trip():
+    pytest.importorskip('redis')
+    fakeredis = pytest.importorskip('fakeredis')
+    from aiogram.fsm.storage.redis import RedisStorage
+
+    async def main():
+        storage = RedisStorage(redis=fakeredis.FakeAsyncRedis())
+        await _round_trip(storage)
+        state = _context(storage)
+        await state.clear()
+        assert await state.get_state() is None
+        assert await state.get_data() == {}
+        await storage.close()
+
+    asyncio.run(main())
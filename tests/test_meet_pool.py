@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+
+import calendar_facade
+import meet_pool as meet_pool_module
+from meet_pool import MeetPool
+
+
+def _links(monkeypatch):
+    """Подменяет создание ссылок в Google: ссылки нумеруются по порядку."""
+    created = []
+    numbers = itertools.count(1)
+
+    async def generate(user_id):
+        link = f"https://meet.google.com/link-{next(numbers)}"
+        created.append((user_id, link))
+        return link
+
+    monkeypatch.setattr(meet_pool_module.async_calendar, 'generate_google_meet_link', generate)
+    return created
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_miss_then_hit_and_refill(monkeypatch):
+    created = _links(monkeypatch)
+    pool = MeetPool(size=2, ttl=3600, users=10)
+
+    async def main():
+        # Пул пуст: ссылка создаётся сразу, затем пул пополняется
+        assert await pool.take(1) == 'https://meet.google.com/link-1'
+        await _settle()
+        assert len(pool._links[1]) == 2
+
+        assert await pool.take(1) == 'https://meet.google.com/link-2'
+        await _settle()
+        assert [link for _, link in pool._links[1]] == [
+            'https://meet.google.com/link-3', 'https://meet.google.com/link-4',
+        ]
+
+    asyncio.run(main())
+    assert len(created) == 4
+
+
+def test_expired_links_are_not_given_out(monkeypatch):
+    _links(monkeypatch)
+    pool = MeetPool(size=2, ttl=3600, users=10)
+
+    async def main():
+        pool.fill(1)
+        await _settle()
+        for index, (created_at, link) in enumerate(pool._links[1]):
+            pool._links[1][index] = (created_at - 7200, link)
+        # Обе готовые ссылки истекли: создаётся новая
+        assert await pool.take(1) == 'https://meet.google.com/link-3'
+        await _settle()
+
+    asyncio.run(main())
+
+
+def test_fill_stops_when_google_creates_no_conference(monkeypatch):
+    async def generate(user_id):
+        return "Ссылка не создана"
+
+    monkeypatch.setattr(meet_pool_module.async_calendar, 'generate_google_meet_link', generate)
+    pool = MeetPool(size=2, ttl=3600, users=10)
+
+    async def main():
+        pool.fill(1)
+        await _settle()
+        assert not pool._links[1]
+        assert 1 not in pool._filling
+
+    asyncio.run(main())
+
+
+def test_least_recent_user_is_evicted(monkeypatch):
+    _links(monkeypatch)
+    pool = MeetPool(size=1, ttl=3600, users=2)
+
+    async def main():
+        for user_id in (1, 2, 1, 3):
+            await pool.take(user_id)
+            await _settle()
+        assert list(pool._links) == [1, 3]
+
+    asyncio.run(main())
+
+
+def test_login_prewarms_pool(monkeypatch):
+    created = _links(monkeypatch)
+    pool = MeetPool(size=2, ttl=3600, users=10)
+    monkeypatch.setattr(calendar_facade, 'meet_pool', pool)
+    monkeypatch.setattr(calendar_facade.google_calendar, 'complete_authentication',
+                        lambda user_id, code, code_verifier=None: object())
+
+    async def main():
+        await calendar_facade.complete_authentication(1, 'code', 'verifier')
+        await _settle()
+        assert len(pool._links[1]) == 2
+        assert await pool.take(1) == 'https://meet.google.com/link-1'
+        await _settle()
+
+    asyncio.run(main())
+    assert len(created) == 3
@@ -0,0 +1,36 @@
+import pytest
+
+from meeting_links import find_meeting_link, get_meeting_link
+
+MEET = 'https://meet.google.com/abc-defg-hij'
+ZOOM = 'https://us02web.zoom.us/j/123456789?pwd=abc'
+TEAMS = 'https://teams.microsoft.com/l/meetup-join/19%3ameeting_x@thread.v2/0'
+CONFERENCE = {'entryPoints': [
+    {'entryPointType': 'phone', 'uri': 'tel:+1-555-0100'},
+    {'entryPointType': 'video', 'uri': 'https://meet.google.com/con-fere-nce'},
+]}
+
+
+@pytest.mark.parametrize('event, expected', [
+    ({}, None),
+    ({'hangoutLink': MEET}, MEET),
+    ({'hangoutLink': MEET, 'conferenceData': CONFERENCE}, 'https://meet.google.com/con-fere-nce'),
+    ({'conferenceData': {'entryPoints': [{'entryPointType': 'phone', 'uri': 'tel:1'}]}, 'hangoutLink': MEET}, MEET),
+    ({'hangoutLink': MEET, 'conferenceData': CONFERENCE, 'location': f'Zoom: {ZOOM}'}, ZOOM),
+    ({'hangoutLink': MEET, 'location': ZOOM, 'description': f'Ссылка: {TEAMS}.'}, TEAMS),
+    ({'hangoutLink': MEET, 'location': 'Переговорная 3', 'description': 'https://example.com/agenda'}, MEET),
+])
+def test_link_priority(event, expected):
+    assert get_meeting_link(event) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    (None, None),
+    ('без ссылок', None),
+    (f'Встреча тут: {ZOOM}, не опаздывать!', ZOOM),
+    ('https://meet.jit.si/schedio-demo.', 'https://meet.jit.si/schedio-demo'),
+    ('https://telemost.yandex.ru/j/12345678 и https://meet.google.com/x-y-z', 'https://telemost.yandex.ru/j/12345678'),
+    ('https://acme.webex.com/meet/alice;', 'https://acme.webex.com/meet/alice'),
+])
+def test_find_in_text(text, expected):
+    assert find_meeting_link(text) == expected
@@ -0,0 +1,44 @@
+from metrics import Registry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram('test_seconds', 'Задержка', ('method',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, method='events.list')
+
+    assert registry.render().splitlines() == [
+        '# HELP test_seconds Задержка',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{method="events.list",le="0.1"} 2',
+        'test_seconds_bucket{method="events.list",le="1.0"} 3',
+        'test_seconds_bucket{method="events.list",le="+Inf"} 4',
+        'test_seconds_sum{method="events.list"} 2.65',
+        'test_seconds_count{method="events.list"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    counter = registry.counter('test_total', 'Счётчик', ('handler',))
+    counter.inc(handler='a"b\\c\nd')
+    counter.inc(2, handler='a"b\\c\nd')
+    assert registry.render().splitlines()[-1] == 'test_total{handler="a\\"b\\\\c\\nd"} 3'
+
+
+def test_function_gauge_is_read_on_render():
+    registry = Registry()
+    queue = []
+    registry.gauge('test_queue', 'Длина очереди', function=lambda: len(queue))
+    assert registry.render().splitlines()[-1] == 'test_queue 0'
+    queue.extend([1, 2])
+    assert registry.render().splitlines()[-1] == 'test_queue 2'
+
+
+def test_same_name_returns_registered_metric():
+    registry = Registry()
+    first = registry.counter('test_total', 'Счётчик')
+    assert registry.counter('test_total', 'Счётчик') is first
+    first.inc()
+    assert registry.render().count('# TYPE test_total counter') == 1
+    assert registry.render().endswith('test_total 1\n')
@@ -0,0 +1,39 @@
+import time
+
+from reminder_ledger import ReminderLedger
+
+
+def test_claim_is_exclusive_and_survives_restart(tmp_path):
+    path = str(tmp_path / 'ledger.db')
+    key = (1, 'event', int(time.time()) + 600, 5)
+    ledger = ReminderLedger(path)
+    assert not ledger.seen(key)
+    assert ledger.claim(key)
+    assert ledger.seen(key)
+    assert not ledger.claim(key)
+
+    restarted = ReminderLedger(path)
+    assert restarted.seen(key)
+    assert not restarted.claim(key)
+
+
+def test_release_allows_another_attempt(tmp_path):
+    path = str(tmp_path / 'ledger.db')
+    key = (1, 'event', int(time.time()) + 600, 0)
+    ledger = ReminderLedger(path)
+    ledger.claim(key)
+    ledger.release(key)
+    assert not ledger.seen(key)
+    assert not ReminderLedger(path).seen(key)
+    assert ledger.claim(key)
+
+
+def test_expire_drops_old_events(tmp_path):
+    ledger = ReminderLedger(str(tmp_path / 'ledger.db'))
+    old = (1, 'old', int(time.time()) - 7 * 24 * 3600, 0)
+    fresh = (1, 'fresh', int(time.time()) + 600, 0)
+    ledger.claim(old)
+    ledger.claim(fresh)
+    ledger.expire()
+    assert not ledger.seen(old)
+    assert ledger.seen(fresh)
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+import reminder_scheduler
+from config import REMINDER_HORIZON_MINUTES
+from reminder_ledger import ReminderLedger
+from reminder_scheduler import ReminderScheduler
+
+
+def _event(event_id, start_ts):
+    start = datetime.fromtimestamp(start_ts, timezone.utc).isoformat()
+    return {'id': event_id, 'start': {'dateTime': start}, 'end': {'dateTime': start}, 'updated': '1'}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время для планировщика."""
+    now = [time.time()]
+    monkeypatch.setattr(reminder_scheduler.time, 'time', lambda: now[0])
+    return now
+
+
+def _planned(scheduler, user_id):
+    return sorted(key[1] for key in scheduler._user_keys.get(user_id, ()))
+
+
+def test_plan_schedules_reminders_inside_horizon(clock):
+    scheduler = ReminderScheduler()
+    events = [_event('soon', clock[0] + 600), _event('later', clock[0] + 3 * 3600)]
+    assert scheduler.plan(1, events, [0, 5])
+    assert _planned(scheduler, 1) == ['soon', 'soon']
+
+
+def test_unchanged_events_are_not_replanned(clock):
+    scheduler = ReminderScheduler()
+    events = [_event('soon', clock[0] + 600)]
+    assert scheduler.plan(1, events, [0])
+    assert not scheduler.plan(1, events, [0])
+
+
+def test_event_crossing_horizon_gets_reminder(clock):
+    """Событие, впервые увиденное за 3 часа, получает напоминание, когда входит в горизонт."""
+    scheduler = ReminderScheduler()
+    events = [_event('far', clock[0] + 3 * 3600)]
+    assert scheduler.plan(1, events, [0])
+    assert _planned(scheduler, 1) == []
+
+    # Следующие проверки до границы горизонта ничего не меняют
+    clock[0] += 30 * 60
+    assert not scheduler.plan(1, events, [0])
+
+    # Время срабатывания вошло в горизонт: те же события перепланируются
+    clock[0] += 3 * 3600 - REMINDER_HORIZON_MINUTES * 60 - 30 * 60 + 1
+    assert scheduler.plan(1, events, [0])
+    assert _planned(scheduler, 1) == ['far']
+    assert not scheduler.plan(1, events, [0])
+
+
+def test_forget_drops_user(clock):
+    scheduler = ReminderScheduler()
+    scheduler.plan(1, [_event('soon', clock[0] + 600)], [0])
+    scheduler.forget(1)
+    assert _planned(scheduler, 1) == []
+    assert scheduler.users() == []
+
+
+def test_failed_delivery_is_released_and_retried(tmp_path, monkeypatch):
+    ledger = ReminderLedger(str(tmp_path / 'ledger.db'))
+    monkeypatch.setattr(reminder_scheduler, 'reminder_ledger', ledger)
+    monkeypatch.setattr(reminder_scheduler, 'REMINDER_RETRY_SECONDS', 0)
+    attempts = []
+
+    async def deliver(bot, user_id, event, offset):
+        attempts.append(event['id'])
+        if len(attempts) == 1:
+            raise ConnectionError('telegram unavailable')
+
+    monkeypatch.setattr(reminder_scheduler, 'deliver_reminder', deliver)
+
+    async def scenario():
+        scheduler = ReminderScheduler()
+        scheduler.start(bot=None)
+        scheduler.plan(1, [_event('flaky', time.time() + 60)], [1])
+        for _ in range(100):
+            if len(attempts) == 2 and not scheduler._deliveries:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert attempts == ['flaky', 'flaky']
+    assert len(ledger._keys) == 1
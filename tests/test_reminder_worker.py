@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import reminder_worker
+from reminder_scheduler import ReminderScheduler
+from reminder_worker import ShardLeases, shard_of
+
+
+def _leases(tmp_path, worker_id, shards=8):
+    return ShardLeases(worker_id, path=str(tmp_path / 'workers.db'), shards=shards)
+
+
+def test_shard_is_stable():
+    assert shard_of(42) == shard_of(42)
+    assert 0 <= shard_of(42, 8) < 8
+
+
+def test_single_worker_owns_everything(tmp_path):
+    leases = _leases(tmp_path, 'a')
+    assert leases.heartbeat() == frozenset(range(8))
+    assert leases.owns(1)
+
+
+def test_workers_split_shards_fairly(tmp_path):
+    a, b = _leases(tmp_path, 'a'), _leases(tmp_path, 'b')
+    a.heartbeat()
+    b.heartbeat()  # Свободных частей нет: b ждёт, пока a отдаст лишние
+    owned_a = a.heartbeat()
+    owned_b = b.heartbeat()
+    assert len(owned_a) == len(owned_b) == 4
+    assert not owned_a & owned_b
+    user_id = next(user_id for user_id in range(100) if shard_of(user_id, 8) in owned_a)
+    assert a.owns(user_id) and not b.owns(user_id)
+
+
+def test_release_and_expiry_hand_shards_over(tmp_path, monkeypatch):
+    a, b = _leases(tmp_path, 'a'), _leases(tmp_path, 'b')
+    a.heartbeat()
+    a.release()
+    assert not a.owns(1)
+    assert b.heartbeat() == frozenset(range(8))
+
+    # b перестал продлевать аренду: после её истечения части забирает a
+    later = time.time() + reminder_worker.WORKER_LEASE_SECONDS + 1
+    monkeypatch.setattr(reminder_worker.time, 'time', lambda: later)
+    assert a.heartbeat() == frozenset(range(8))
+    assert not b.owns(1)
+
+
+def test_logged_out_users_are_forgotten(monkeypatch):
+    scheduler = ReminderScheduler()
+    scheduler.plan(1, [], [0])
+    scheduler.plan(2, [], [0])
+    monkeypatch.setattr(reminder_worker, 'scheduler', scheduler)
+    monkeypatch.setattr(reminder_worker, 'list_user_ids', lambda: [1])
+    asyncio.run(reminder_worker._forget_logged_out())
+    assert scheduler.users() == [1]
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from send_queue import PRIORITY_BULK, PRIORITY_REMINDER, PRIORITY_REPLY, SendQueue
+
+
+def _sender(sent, name, result=None):
+    async def send():
+        sent.append(name)
+        return result
+    return send
+
+
+def test_reminders_go_before_replies_and_bulk():
+    async def scenario():
+        queue = SendQueue(global_rate=100, chat_rate=100, chat_burst=100)
+        sent = []
+        await asyncio.gather(
+            queue.submit(1, _sender(sent, 'bulk'), priority=PRIORITY_BULK),
+            queue.submit(2, _sender(sent, 'reply'), priority=PRIORITY_REPLY),
+            queue.submit(3, _sender(sent, 'late reminder'), priority=PRIORITY_REMINDER, deadline=time.time() + 60),
+            queue.submit(4, _sender(sent, 'early reminder'), priority=PRIORITY_REMINDER, deadline=time.time()),
+        )
+        return sent
+
+    assert asyncio.run(scenario()) == ['early reminder', 'late reminder', 'reply', 'bulk']
+
+
+def test_busy_chat_does_not_hold_back_others():
+    async def scenario():
+        queue = SendQueue(global_rate=100, chat_rate=10, chat_burst=1)
+        sent = []
+        started = time.monotonic()
+        await asyncio.gather(
+            queue.submit(1, _sender(sent, '1a')),
+            queue.submit(1, _sender(sent, '1b')),
+            queue.submit(1, _sender(sent, '1c')),
+            queue.submit(2, _sender(sent, '2a')),
+        )
+        return sent, time.monotonic() - started
+
+    sent, elapsed = asyncio.run(scenario())
+    assert sent == ['1a', '2a', '1b', '1c']
+    # Чат 1: не больше 10 сообщений в секунду после первого
+    assert elapsed >= 0.18
+
+
+def test_retry_after_pauses_and_resends():
+    async def scenario():
+        queue = SendQueue(global_rate=100, chat_rate=100, chat_burst=100)
+        attempts = []
+
+        async def send():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise TelegramRetryAfter(SendMessage(chat_id=1, text='x'), 'Too Many Requests', retry_after=0.1)
+            return 'ok'
+
+        return await queue.submit(1, send), attempts
+
+    result, attempts = asyncio.run(scenario())
+    assert result == 'ok'
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.09
+
+
+def test_errors_reach_the_caller():
+    async def scenario():
+        queue = SendQueue(global_rate=100, chat_rate=100, chat_burst=100)
+
+        async def send():
+            raise ValueError('bad request')
+
+        try:
+            await queue.submit(1, send)
+        except ValueError as e:
+            return str(e)
+
+    assert asyncio.run(scenario()) == 'bad request'
@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+
+from settings_store import ReminderSettings
+
+
+class BrokenConnection:
+    """Соединение, которое не может ничего записать (например, диск заполнен)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, *args):
+        raise sqlite3.OperationalError('database or disk is full')
+
+
+def test_flush_persists_changes(tmp_path):
+    path = str(tmp_path / 'settings.db')
+    settings = ReminderSettings(path)
+    settings.toggle(1, 15)
+    assert settings.flush() == 1
+    assert 15 in ReminderSettings(path).offsets(1)
+
+
+def test_failed_flush_keeps_changes_dirty(tmp_path):
+    path = str(tmp_path / 'settings.db')
+    settings = ReminderSettings(path)
+    settings.toggle(1, 15)
+
+    connection, settings._conn = settings._conn, BrokenConnection()
+    with pytest.raises(sqlite3.OperationalError):
+        settings.flush()
+
+    settings._conn = connection
+    assert settings.flush() == 1
+    assert 15 in ReminderSettings(path).offsets(1)
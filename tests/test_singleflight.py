@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Backend:
+    """Медленный запрос, который можно отпустить вручную."""
+
+    def __init__(self, result='ok', error=None):
+        self.calls = 0
+        self.release = None
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def _run(coro_factory):
+    async def main():
+        return await coro_factory()
+    return asyncio.run(main())
+
+
+def test_concurrent_calls_share_one_request():
+    async def scenario():
+        backend = Backend()
+        backend.release = asyncio.Event()
+        flights = SingleFlight(ttl=0)
+        calls = [asyncio.create_task(flights.do('key', backend)) for _ in range(5)]
+        await asyncio.sleep(0)
+        backend.release.set()
+        results = await asyncio.gather(*calls)
+        return backend.calls, results
+
+    calls, results = _run(scenario)
+    assert calls == 1
+    assert results == ['ok'] * 5
+
+
+def test_leader_timeout_does_not_cancel_waiters():
+    async def scenario():
+        backend = Backend()
+        backend.release = asyncio.Event()
+        flights = SingleFlight(ttl=0)
+        leader = asyncio.create_task(asyncio.wait_for(flights.do('key', backend), timeout=0.01))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.do('key', backend))
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        backend.release.set()
+        return backend.calls, await waiter
+
+    assert _run(scenario) == (1, 'ok')
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    async def scenario():
+        backend = Backend(error=ValueError('boom'))
+        backend.release = asyncio.Event()
+        flights = SingleFlight(ttl=60)
+        calls = [asyncio.create_task(flights.do('key', backend)) for _ in range(3)]
+        await asyncio.sleep(0)
+        backend.release.set()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        backend.error = None
+        return results, await flights.do('key', backend), backend.calls
+
+    results, retry, calls = _run(scenario)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert (retry, calls) == ('ok', 2)
+
+
+def test_result_is_reused_within_ttl_until_forgotten():
+    async def scenario():
+        backend = Backend()
+        backend.release = asyncio.Event()
+        backend.release.set()
+        flights = SingleFlight(ttl=60)
+        await flights.do((1, 'agenda', None), backend)
+        await flights.do((1, 'agenda', None), backend)
+        reused = backend.calls
+        flights.forget(1)
+        await flights.do((1, 'agenda', None), backend)
+        return reused, backend.calls
+
+    assert _run(scenario) == (1, 2)
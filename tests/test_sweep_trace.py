@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import sweep_report
+from sweep_trace import SweepTracer, add_span, span
+
+
+def _tracer(tmp_path, **options):
+    return SweepTracer(path=str(tmp_path / 'trace.jsonl'), **{'sample': 0, 'slow': 0, 'max_bytes': 0, **options})
+
+
+def _trace_users(tracer, user_ids, slow=()):
+    run = tracer.new_run()
+    for user_id in user_ids:
+        trace = tracer.start(user_id, run)
+        if trace is not None:
+            add_span('events.list', 0.25)
+            add_span('events.list', 0.25)
+            with span('schedule'):
+                pass
+            if user_id in slow:
+                trace.started -= 10  # Будто обработка заняла 10 секунд
+        tracer.finish(trace)
+    tracer.record_run(run, len(user_ids), 1.5)
+    asyncio.run(tracer.flush())
+
+
+def _records(tmp_path, name='trace.jsonl'):
+    with open(tmp_path / name, encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_disabled_by_default(tmp_path):
+    tracer = _tracer(tmp_path)
+    assert not tracer.enabled
+    assert tracer.new_run() is None
+    assert tracer.start(1) is None
+    _trace_users(tracer, [1, 2])
+    assert not (tmp_path / 'trace.jsonl').exists()
+    # Вне трассировки этапы ничего не записывают
+    add_span('events.list', 1.0)
+    with span('schedule'):
+        pass
+
+
+def test_sample_one_traces_everyone(tmp_path):
+    tracer = _tracer(tmp_path, sample=1)
+    _trace_users(tracer, [1, 2, 3])
+    records = _records(tmp_path)
+    assert [record['user'] for record in records if record['kind'] == 'sweep'] == [1, 2, 3]
+    assert records[0]['spans']['events.list'] == [0.5, 2]
+    assert records[0]['spans']['schedule'][1] == 1
+    assert records[-1]['kind'] == 'run' and records[-1]['users'] == 3
+    assert len({record['run'] for record in records}) == 1
+
+
+def test_slow_threshold_keeps_only_slow_users(tmp_path):
+    tracer = _tracer(tmp_path, slow=5)
+    _trace_users(tracer, [1, 2, 3], slow={2})
+    traces = [record for record in _records(tmp_path) if record['kind'] == 'sweep']
+    assert [trace['user'] for trace in traces] == [2]
+    assert traces[0]['total'] >= 10
+
+
+def test_file_rotates_at_max_bytes(tmp_path):
+    tracer = _tracer(tmp_path, sample=1, max_bytes=100)
+    _trace_users(tracer, [1])
+    first = _records(tmp_path)
+    _trace_users(tracer, [2])
+    assert _records(tmp_path, 'trace.jsonl.1') == first
+    assert [record.get('user') for record in _records(tmp_path)] == [2, None]
+
+
+def test_report_aggregates_runs_stages_and_users(tmp_path, capsys):
+    tracer = _tracer(tmp_path, sample=1)
+    _trace_users(tracer, [1, 2], slow={2})
+    with open(tmp_path / 'trace.jsonl', 'a', encoding='utf-8') as file:
+        file.write('не json\n')
+
+    sweep_report.main([str(tmp_path / 'trace.jsonl'), '--top', '1'])
+    output = capsys.readouterr().out
+    assert "Прогонов: 1, пользователей в прогоне: до 2" in output
+    assert "Трассировок: 2" in output
+    assert "events.list" in output and "schedule" in output
+    assert "Статусы: ok 2" in output
+    assert "Топ-1 медленных пользователей:\n  2: max 1" in output
+    assert "events.list 0.500×2" in output
+
+
+def test_report_without_traces_of_kind(tmp_path, capsys):
+    tracer = _tracer(tmp_path, sample=1)
+    _trace_users(tracer, [1])
+    sweep_report.main([str(tmp_path / 'trace.jsonl'), '--kind', 'deliver'])
+    assert "Нет трассировок вида 'deliver'" in capsys.readouterr().out
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from google.oauth2.credentials import Credentials
+
+import async_calendar
+import token_refresher as token_refresher_module
+from token_refresher import TokenRefresher
+
+
+def _creds(refresh_token='refresh', expired=False):
+    expiry = datetime.utcnow() + timedelta(hours=-1 if expired else 1)
+    return Credentials(token='a', refresh_token=refresh_token, client_id='id', client_secret='secret',
+                       token_uri='https://oauth2.googleapis.com/token', expiry=expiry)
+
+
+def _stub_store(monkeypatch, creds):
+    monkeypatch.setattr(token_refresher_module.credential_store, 'cached', lambda user_id: creds.get(user_id))
+
+
+def test_refresh_is_scheduled_ahead_with_jitter(monkeypatch):
+    monkeypatch.setattr(token_refresher_module, 'TOKEN_REFRESH_AHEAD_SECONDS', 300)
+    monkeypatch.setattr(token_refresher_module, 'TOKEN_REFRESH_JITTER_SECONDS', 60)
+    refresher = TokenRefresher()
+    expiry = time.time() + 3600
+    for user_id in range(50):
+        refresher._track(user_id, expiry)
+
+    times = list(refresher._scheduled.values())
+    assert all(expiry - 360 <= refresh_at <= expiry - 300 for refresh_at in times)
+    assert len(set(times)) > 1
+    assert len(refresher._heap) == 50
+
+
+def test_transient_error_is_retried(monkeypatch):
+    monkeypatch.setattr(token_refresher_module, 'TOKEN_REFRESH_RETRY_SECONDS', 30)
+    _stub_store(monkeypatch, {1: _creds()})
+
+    async def refresh_token(creds, user_id=None):
+        raise async_calendar.CalendarApiError(503, 'backend error')
+
+    monkeypatch.setattr(token_refresher_module.client, 'refresh_token', refresh_token)
+    refresher = TokenRefresher()
+    asyncio.run(refresher._refresh(1, asyncio.Semaphore(1)))
+
+    assert not refresher.has_failed(1)
+    assert 25 <= refresher._scheduled[1] - time.time() <= 30
+
+
+def test_revoked_token_is_marked_until_new_login(monkeypatch):
+    _stub_store(monkeypatch, {1: _creds('revoked')})
+
+    async def refresh_token(creds, user_id=None):
+        raise async_calendar.CalendarApiError(400, 'invalid_grant')
+
+    monkeypatch.setattr(token_refresher_module.client, 'refresh_token', refresh_token)
+    refresher = TokenRefresher()
+    asyncio.run(refresher._refresh(1, asyncio.Semaphore(1)))
+
+    assert 1 not in refresher._scheduled
+    assert refresher.has_failed(1)
+    assert refresher.has_failed(1, _creds('revoked'))
+    assert not refresher.has_failed(1, _creds('new'))
+    assert not refresher.has_failed(1)
+
+
+def test_authenticate_skips_refresh_of_revoked_token(monkeypatch):
+    calls = []
+    refresher = TokenRefresher()
+    monkeypatch.setattr(token_refresher_module, 'token_refresher', refresher)
+    monkeypatch.setattr(async_calendar.credential_store, 'cached', lambda user_id: _creds('revoked', expired=True))
+
+    async def refresh_token(creds, user_id=None):
+        calls.append(user_id)
+        raise async_calendar.CalendarApiError(400, 'invalid_grant')
+
+    monkeypatch.setattr(async_calendar.client, 'refresh_token', refresh_token)
+    assert asyncio.run(async_calendar.authenticate_google_calendar(1)) is None
+    assert asyncio.run(async_calendar.authenticate_google_calendar(1)) is None
+    assert calls == [1]
+    assert refresher.has_failed(1)
+
+
+def test_coalesced_refresh_updates_every_caller(monkeypatch):
+    calls = []
+
+    async def post_token(self, creds, user_id):
+        calls.append(creds)
+        await asyncio.sleep(0.01)
+        creds.token = 'fresh'
+        creds.expiry = datetime.utcnow() + timedelta(hours=1)
+        return creds
+
+    monkeypatch.setattr(async_calendar.AsyncCalendarClient, '_refresh_token', post_token)
+    first, second = _creds(expired=True), _creds(expired=True)
+
+    async def main():
+        return await asyncio.gather(async_calendar.client.refresh_token(first, 1),
+                                    async_calendar.client.refresh_token(second, 1))
+
+    assert asyncio.run(main()) == [first, second]
+    assert len(calls) == 1
+    assert first.token == second.token == 'fresh'
+    assert second.valid
@@ -0,0 +1,77 @@
+import asyncio
+
+from aiogram import Bot
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook_server import LimitedRequestHandler
+
+SECRET = 'secret'
+
+
+class FakeDispatcher:
+    """Диспетчер, который держит обновления, пока тест их не отпустит."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.running = 0
+        self.max_running = 0
+        self.updates = []
+
+    async def feed_raw_update(self, bot, update, **kwargs):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await self.release.wait()
+            self.updates.append(update['update_id'])
+        finally:
+            self.running -= 1
+
+    @staticmethod
+    async def silent_call_request(bot, result):
+        pass
+
+
+async def _client(dispatcher, max_concurrency=2):
+    handler = LimitedRequestHandler(dispatcher, Bot(token='42:TEST'), secret_token=SECRET,
+                                    max_concurrency=max_concurrency)
+    app = web.Application()
+    handler.register(app, path='/webhook')
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    return client, handler
+
+
+def test_wrong_secret_is_rejected():
+    async def scenario():
+        dispatcher = FakeDispatcher()
+        client, handler = await _client(dispatcher)
+        try:
+            response = await client.post('/webhook', json={'update_id': 1},
+                                         headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'})
+            return response.status, len(handler._tasks)
+        finally:
+            await client.close()
+
+    assert asyncio.run(scenario()) == (401, 0)
+
+
+def test_updates_are_acknowledged_and_limited():
+    async def scenario():
+        dispatcher = FakeDispatcher()
+        client, handler = await _client(dispatcher, max_concurrency=2)
+        try:
+            headers = {'X-Telegram-Bot-Api-Secret-Token': SECRET}
+            for update_id in range(5):
+                # Telegram получает ответ, не дожидаясь обработки
+                response = await client.post('/webhook', json={'update_id': update_id}, headers=headers)
+                assert response.status == 200
+            await asyncio.sleep(0.05)
+            running = dispatcher.running
+            dispatcher.release.set()
+            await handler.drain(timeout=1)
+            return running, dispatcher.max_running, sorted(dispatcher.updates)
+        finally:
+            await client.close()
+
+    assert asyncio.run(scenario()) == (2, 2, [0, 1, 2, 3, 4])
@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+
+from async_calendar import CalendarApiError, client
+from config import (
+    TOKEN_REFRESH_AHEAD_SECONDS,
+    TOKEN_REFRESH_JITTER_SECONDS,
+    TOKEN_REFRESH_CONCURRENCY,
+    TOKEN_REFRESH_RETRY_SECONDS,
+)
+from credential_store import credential_store
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRefresher:
+    """
+    Фоновое обновление access-токенов незадолго до истечения.
+
+    Сроки действия всех токенов лежат в очереди с приоритетом, поэтому ни команда
+    пользователя, ни напоминание не ждут обращения к OAuth-серверу.
+    Неудачные обновления запоминаются, чтобы check_auth сразу предложил повторный вход.
+    """
+
+    def __init__(self):
+        self._heap = []  # (время обновления, порядковый номер, user_id)
+        self._scheduled = {}  # user_id -> время обновления (актуальная запись в куче)
+        self._failures = {}  # user_id -> (время, текст ошибки, refresh_token, который не обновился)
+        self._counter = itertools.count()
+        self._wakeup = None
+        self._loop = None
+        self._task = None
+
+    def start(self):
+        """Загружает сроки действия токенов и запускает фоновую задачу."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        credential_store.add_listener(self._on_credentials_changed)
+        for user_id, expiry in credential_store.expiries():
+            if expiry is not None:
+                self._track(user_id, expiry)
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def has_failed(self, user_id, creds=None):
+        """
+        Не удалось обновить токен: пользователю нужно авторизоваться заново.
+        Если переданы creds с другим refresh_token, пользователь уже вошёл снова
+        (возможно, в другом процессе) и ошибка забывается.
+        """
+        failure = self._failures.get(user_id)
+        if failure is None:
+            return False
+        if creds is not None and creds.refresh_token != failure[2]:
+            self._failures.pop(user_id, None)
+            return False
+        return True
+
+    def mark_failed(self, user_id, error, refresh_token=None):
+        """Запоминает, что refresh_token пользователя больше не действует."""
+        self._failures[user_id] = (time.time(), error, refresh_token)
+
+    def _on_credentials_changed(self, user_id, expiry):
+        """Подписчик хранилища: может вызываться из других потоков."""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._track, user_id, expiry)
+
+    def _track(self, user_id, expiry, delay=None):
+        """Планирует обновление токена (expiry=None — пользователь удалён)."""
+        if expiry is None and delay is None:
+            self._scheduled.pop(user_id, None)
+            self._failures.pop(user_id, None)
+            return
+
+        # Новые учетные данные сохранены — прошлые ошибки больше не актуальны
+        if delay is None:
+            self._failures.pop(user_id, None)
+            refresh_at = expiry - TOKEN_REFRESH_AHEAD_SECONDS - random.uniform(0, TOKEN_REFRESH_JITTER_SECONDS)
+        else:
+            refresh_at = time.time() + delay
+
+        self._scheduled[user_id] = refresh_at
+        heapq.heappush(self._heap, (refresh_at, next(self._counter), user_id))
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(TOKEN_REFRESH_CONCURRENCY)
+        while True:
+            try:
+                # Выбрасываем записи, которые были перепланированы
+                while self._heap and self._scheduled.get(self._heap[0][2]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+
+                self._wakeup.clear()
+                if not self._heap:
+                    await self._wakeup.wait()
+                    continue
+
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                _, _, user_id = heapq.heappop(self._heap)
+                self._scheduled.pop(user_id, None)
+                asyncio.create_task(self._refresh(user_id, semaphore))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в фоновом обновлении токенов: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def _refresh(self, user_id, semaphore):
+        async with semaphore:
+            creds = credential_store.cached(user_id) or await asyncio.to_thread(credential_store.get, user_id)
+            if creds is None:
+                return
+            if not creds.refresh_token:
+                self.mark_failed(user_id, "нет refresh_token")
+                return
+            try:
+                # Новый срок действия попадёт в очередь через подписку на хранилище
+                await client.refresh_token(creds, user_id)
+                logger.debug(f"Токен пользователя {user_id} обновлён заранее")
+            except CalendarApiError as e:
+                if e.status in (400, 401):
+                    # invalid_grant: доступ отозван, повторять бессмысленно
+                    self.mark_failed(user_id, str(e), creds.refresh_token)
+                    logger.warning(f"Токен пользователя {user_id} больше не обновляется: {str(e)}")
+                else:
+                    self._track(user_id, None, delay=TOKEN_REFRESH_RETRY_SECONDS)
+            except Exception as e:
+                logger.warning(f"Временная ошибка обновления токена пользователя {user_id}: {str(e)}")
+                self._track(user_id, None, delay=TOKEN_REFRESH_RETRY_SECONDS)
+
+
+# Общий обработчик процесса
+token_refresher = TokenRefresher()
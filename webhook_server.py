@@ -0,0 +1,143 @@
+import asyncio
+import hmac
+import json
+import logging
+import signal
+import sys
+
+from aiohttp import ClientSession, web
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import setup_application
+
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_MAX_CONCURRENCY,
+    WEBHOOK_SHUTDOWN_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler:
+    """
+    Приём обновлений Telegram через webhook.
+
+    Telegram получает ответ сразу, а обновления обрабатываются в фоне,
+    но не больше WEBHOOK_MAX_CONCURRENCY одновременно. При остановке
+    начатые обновления дорабатываются. Используется только публичный API
+    диспетчера (feed_raw_update), а не внутренности SimpleRequestHandler.
+    """
+
+    def __init__(self, dispatcher, bot, secret_token=WEBHOOK_SECRET, max_concurrency=WEBHOOK_MAX_CONCURRENCY, **data):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.data = data
+        self._secret_token = secret_token
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()  # Принятые, но ещё не обработанные обновления
+
+    def register(self, app, path):
+        app.router.add_post(path, self.handle)
+        app.on_shutdown.append(self._on_shutdown)
+
+    async def handle(self, request):
+        token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if self._secret_token and not hmac.compare_digest(token, self._secret_token):
+            return web.Response(body="Unauthorized", status=401)
+        update = await request.json(loads=self.bot.session.json_loads)
+        task = asyncio.create_task(self._feed_update(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({}, dumps=self.bot.session.json_dumps)
+
+    async def _feed_update(self, update):
+        async with self._semaphore:
+            try:
+                result = await self.dispatcher.feed_raw_update(self.bot, update, **self.data)
+                # Ответ обработчика в виде метода API отправляем отдельным запросом
+                if isinstance(result, TelegramMethod):
+                    await self.dispatcher.silent_call_request(self.bot, result)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке обновления {update.get('update_id')}: {str(e)}")
+
+    async def drain(self, timeout=WEBHOOK_SHUTDOWN_TIMEOUT):
+        """Ждёт завершения уже принятых обновлений (не дольше timeout секунд)."""
+        tasks = set(self._tasks)
+        if not tasks:
+            return
+        logger.info(f"Дорабатываем принятые обновления: {len(tasks)}")
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"Не успели обработать обновлений: {len(pending)}")
+
+    async def close(self):
+        await self.drain()
+        await self.bot.session.close()
+
+    async def _on_shutdown(self, app):
+        await self.close()
+
+
+def create_app(dp, bot):
+    """aiohttp-приложение с обработчиком webhook; к нему же можно подключить другие маршруты."""
+    app = web.Application()
+    LimitedRequestHandler(dp, bot).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)  # startup/shutdown диспетчера вместе с приложением
+    return app
+
+
+async def run_webhook(app, dp, bot):
+    """
+    Регистрирует webhook в Telegram и обслуживает приложение до SIGINT/SIGTERM.
+    Webhook при остановке не удаляется: за балансировщиком могут работать другие процессы.
+    """
+    await bot.set_webhook(
+        url=WEBHOOK_URL,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    logger.info(f"Webhook слушает http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Останавливаем webhook")
+        # Сначала закрываются сокеты, затем on_shutdown дорабатывает принятые обновления
+        await runner.cleanup()
+
+
+async def _post_update(path):
+    """
+    Локальная проверка: отправляет записанный Update (JSON) так же, как это делает Telegram.
+    """
+    with open(path, encoding='utf-8') as file:
+        update = json.load(file)
+    headers = {'X-Telegram-Bot-Api-Secret-Token': WEBHOOK_SECRET}
+    async with ClientSession() as session:
+        async with session.post(f"http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}", json=update, headers=headers) as response:
+            print(f"{response.status} {await response.text()}")
+
+
+if __name__ == '__main__':
+    # Использование: python webhook_server.py <update.json>
+    if len(sys.argv) < 2:
+        print("Использование: python webhook_server.py <update.json>")
+        sys.exit(1)
+    asyncio.run(_post_update(sys.argv[1]))